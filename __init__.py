@@ -2,4 +2,5 @@
 # Part of Odoo. See LICENSE file for full copyright and licensing details.
 
 from . import models
-from . import controllers 
\ No newline at end of file
+from . import controllers
+from . import wizard 
\ No newline at end of file
@@ -3,7 +3,7 @@
 
 {
     'name': 'POS Project Integration',
-    'version': '1.0',
+    'version': '1.2',
     'category': 'Sales/Point of Sale',
     'sequence': 6,
     'summary': 'Integración del POS con Proyectos',
@@ -17,9 +17,15 @@ desde las órdenes del Punto de Venta.
     'author': 'Ing Daril Diaz V1.0.1, Claude',
     'depends': ['point_of_sale', 'project'],
     'data': [
+        'security/ir.model.access.csv',
+        'data/ir_cron_data.xml',
         'views/pos_config_views.xml',
         'views/res_config_settings_views.xml',
         'views/pos_printer_views.xml',
+        'views/pos_project_task_job_views.xml',
+        'views/project_task_views.xml',
+        'views/pos_project_task_history_views.xml',
+        'wizard/pos_project_task_backfill_views.xml',
     ],
     'installable': True,
     'auto_install': False,
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+"""
+``pos.order.project_task_ids`` pasa de Many2many a One2many sobre
+``project.task.pos_order_id``: se copian los vínculos de la tabla de relación
+a la nueva columna y se elimina la tabla.
+
+Además se rellena ``pos_task_key`` de las tareas existentes que deben ser
+únicas (la de cada orden y la de cada estación en modo incremental), para que
+las nuevas peticiones las encuentren en lugar de crear otra.
+"""
+
+import logging
+
+from odoo.tools.sql import table_exists
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    if table_exists(cr, 'pos_order_project_task_rel'):
+        _migrate_order_links(cr)
+    _fill_task_keys(cr)
+
+
+def _migrate_order_links(cr):
+    # Si una tarea estaba vinculada a varias órdenes se conserva la más reciente
+    cr.execute("""
+        UPDATE project_task t
+           SET pos_order_id = r.pos_order_id
+          FROM (SELECT project_task_id, MAX(pos_order_id) AS pos_order_id
+                  FROM pos_order_project_task_rel
+              GROUP BY project_task_id) r
+         WHERE r.project_task_id = t.id
+           AND t.pos_order_id IS NULL
+    """)
+    _logger.info("Tareas vinculadas a su orden POS: %s", cr.rowcount)
+    cr.execute("DROP TABLE pos_order_project_task_rel")
+
+
+def _fill_task_keys(cr):
+    # Tarea de cada orden: la primera vinculada a ella que no es de una estación
+    cr.execute("""
+        UPDATE project_task t
+           SET pos_task_key = 'order:' || k.pos_order_id
+          FROM (SELECT DISTINCT ON (pos_order_id) id, pos_order_id
+                  FROM project_task
+                 WHERE pos_order_id IS NOT NULL
+                   AND pos_printer_id IS NULL
+              ORDER BY pos_order_id, id) k
+         WHERE k.id = t.id
+           AND t.pos_task_key IS NULL
+    """)
+    # Tarea de cada orden en las estaciones en modo incremental: la más reciente,
+    # que es la que recibía los cambios
+    cr.execute("""
+        UPDATE project_task t
+           SET pos_task_key = 'station:' || k.pos_order_uuid || ':' || k.pos_printer_id
+          FROM (SELECT DISTINCT ON (task.pos_order_uuid, task.pos_printer_id)
+                       task.id, task.pos_order_uuid, task.pos_printer_id
+                  FROM project_task task
+                  JOIN pos_printer printer ON printer.id = task.pos_printer_id
+                 WHERE task.pos_order_uuid IS NOT NULL
+                   AND printer.project_incremental_tasks
+              ORDER BY task.pos_order_uuid, task.pos_printer_id, task.id DESC) k
+         WHERE k.id = t.id
+           AND t.pos_task_key IS NULL
+    """)
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+"""
+Las tareas del POS guardan la referencia del recibo en la columna indexada
+``pos_order_reference``: se rellena en las tareas existentes a partir de su
+nombre ("Order 00001-001-0001"). Los nombres generados sin referencia
+("Order 250317-1430-1234", con la hora y un número aleatorio) no se copian.
+
+El histórico de la retención guarda la clave de la tarea original
+(``pos_task_key``) para que el backfill no vuelva a crear la tarea de una orden
+ya atendida. En las filas existentes se rellena la de las tareas de orden:
+las que tienen orden y no son de una estación.
+"""
+
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    cr.execute(r"""
+        UPDATE project_task
+           SET pos_order_reference = substring(name from '(\d+-\d+-\d+)')
+         WHERE pos_order_reference IS NULL
+           AND (pos_order_uuid IS NOT NULL OR pos_order_id IS NOT NULL)
+           AND name ~ '\d+-\d+-\d+'
+           AND name !~ '^Order \d{6}-\d{4}-\d{4}'
+    """)
+    _logger.info("Referencias POS copiadas a las tareas existentes: %s", cr.rowcount)
+
+    cr.execute("""
+        UPDATE pos_project_task_history
+           SET pos_task_key = 'order:' || order_id
+         WHERE pos_task_key IS NULL
+           AND order_id IS NOT NULL
+           AND pos_printer_id IS NULL
+    """)
+    _logger.info("Claves de tarea copiadas al histórico: %s", cr.rowcount)
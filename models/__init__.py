@@ -1,6 +1,14 @@
 # -*- coding: utf-8 -*-
 # Part of Odoo. See LICENSE file for full copyright and licensing details.
 
+from . import pos_category
 from . import pos_config
 from . import pos_order
-from . import pos_printer 
\ No newline at end of file
+from . import pos_printer
+from . import pos_project_task_job
+from . import project_task
+from . import pos_project_ticket
+from . import pos_project_ticket_buffer
+from . import pos_project_task_history
+from . import pos_project_task_service
+from . import ir_websocket
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+import re
+
+from odoo import models
+
+from .project_task import KITCHEN_CHANNEL
+
+KITCHEN_CHANNEL_RE = re.compile(rf'^{KITCHEN_CHANNEL}_(\d+)$')
+
+
+class IrWebsocket(models.AbstractModel):
+    _inherit = 'ir.websocket'
+
+    def _build_bus_channel_list(self, channels):
+        """
+        Traduce los canales ``pos_project_kitchen_<id de proyecto>`` que piden las
+        pantallas de cocina al canal del proyecto, solo para los proyectos que el
+        usuario puede leer.
+        """
+        project_ids = set()
+        other_channels = []
+        for channel in channels:
+            match = isinstance(channel, str) and KITCHEN_CHANNEL_RE.match(channel)
+            if match:
+                project_ids.add(int(match.group(1)))
+            else:
+                other_channels.append(channel)
+        if project_ids and self.env.user and not self.env.user._is_public():
+            projects = self.env['project.project'].search([('id', 'in', list(project_ids))])
+            other_channels.extend((project, KITCHEN_CHANNEL) for project in projects)
+        return super()._build_bus_channel_list(other_channels)
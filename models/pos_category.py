@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+from odoo import api, models
+
+
+class PosCategory(models.Model):
+    _inherit = 'pos.category'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        categories = super().create(vals_list)
+        # Las tablas de rutas incluyen las subcategorías de las categorías de cada impresora
+        if any(vals.get('parent_id') for vals in vals_list):
+            self.env['pos.config']._invalidate_project_routing()
+        return categories
+
+    def write(self, vals):
+        result = super().write(vals)
+        if 'parent_id' in vals:
+            self.env['pos.config']._invalidate_project_routing()
+        return result
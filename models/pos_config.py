@@ -1,7 +1,12 @@
 # -*- coding: utf-8 -*-
 # Part of Odoo. See LICENSE file for full copyright and licensing details.
 
-from odoo import fields, models, api
+import hashlib
+import json
+
+from odoo import fields, models, api, tools
+from odoo.exceptions import MissingError
+from odoo.tools import SQL, frozendict
 
 class PosConfig(models.Model):
     _inherit = 'pos.config'
@@ -18,7 +23,198 @@ class PosConfig(models.Model):
         help="Proyecto donde se crearán las tarjetas desde las órdenes del POS"
     )
     
-    def _loader_params_pos_config(self):
-        result = super()._loader_params_pos_config()
-        result['search_params']['fields'].extend(['enable_project_integration', 'project_id'])
-        return result 
\ No newline at end of file
+    project_task_retention_days = fields.Integer(
+        string='Retención de tareas (días)',
+        default=0,
+        help="Días que se conservan las tareas cerradas de los proyectos de este TPV antes de "
+             "archivarlas o moverlas al histórico. 0 desactiva la retención."
+    )
+    
+    project_task_retention_mode = fields.Selection(
+        [('archive', 'Archivar'), ('history', 'Mover al histórico')],
+        string='Acción de retención',
+        default='archive',
+        required=True,
+        help="Archivar oculta las tareas; mover al histórico las sustituye por una fila compacta "
+             "vinculada a la orden y elimina la tarea"
+    )
+    
+    project_fast_tasks = fields.Boolean(
+        string='Tareas rápidas',
+        default=False,
+        help="Crea las tareas sin seguimiento de cambios, sin mensajes en el chatter, sin "
+             "seguidores y sin correos de asignación. Pensado para comandas de vida corta."
+    )
+    
+    project_coalesce_seconds = fields.Integer(
+        string='Ventana de agrupación (segundos)',
+        default=0,
+        help="Los tickets de cambios de una orden que llegan a una estación dentro de esta ventana "
+             "se agrupan en uno solo, sumando las cantidades de cada producto; las líneas añadidas "
+             "y canceladas dentro de la ventana se anulan. 0 envía cada ticket al momento."
+    )
+    
+    project_sequence_id = fields.Many2one(
+        'ir.sequence',
+        string='Secuencia de tickets',
+        readonly=True,
+        copy=False,
+        help="Numera las tareas de las órdenes de este TPV y las de los tickets sin impresora de "
+             "preparación; se crea con la primera tarea"
+    )
+    
+    project_metadata_version = fields.Char(
+        string='Versión de los datos de proyectos',
+        compute='_compute_project_metadata_version',
+        help="Sello de la tabla de rutas de proyectos. La sesión del POS solo carga los datos de "
+             "proyectos al imprimir el primer ticket y los reutiliza mientras no cambie este sello"
+    )
+    
+    project_routing_version = fields.Integer(
+        string='Versión de la tabla de rutas',
+        readonly=True,
+        copy=False,
+        default=0,
+        help="Se incrementa al modificar las impresoras, las categorías POS o la configuración de "
+             "proyectos del TPV; forma parte de la clave de la tabla de rutas en caché"
+    )
+    
+    # Campos cuyo cambio invalida la tabla de rutas de proyectos
+    _PROJECT_ROUTING_FIELDS = {
+        'project_id', 'enable_project_integration', 'printer_ids', 'project_fast_tasks', 'project_coalesce_seconds',
+    }
+    
+    def init(self):
+        super().init()
+        self.env.cr.execute("CREATE SEQUENCE IF NOT EXISTS pos_config_project_routing_version_seq")
+    
+    def _compute_project_metadata_version(self):
+        for config in self:
+            config.project_metadata_version = config._get_project_routing()['version']
+    
+    def _get_project_routing_version(self):
+        """Versión de la tabla de rutas del TPV en esta transacción, o False si no existe"""
+        try:
+            return self.sudo().project_routing_version
+        except MissingError:
+            return False
+    
+    @api.model
+    def _invalidate_project_routing(self, configs=None):
+        """
+        Invalida las tablas de rutas en caché dándoles una versión nueva, sin
+        vaciar las demás cachés del registro. El cambio es transaccional: los
+        demás workers ven la nueva versión junto con los datos que la provocan.
+        Las versiones salen de una secuencia de PostgreSQL y no se reutilizan,
+        así que una tabla calculada en una transacción revertida no se confunde
+        con la de un cambio posterior.
+        
+        :param configs: TPV afectados; por defecto todos
+        """
+        if configs is not None and not configs:
+            return
+        self.flush_model(['project_routing_version'])
+        where = SQL("WHERE id IN %s", tuple(configs.ids)) if configs is not None else SQL()
+        self.env.cr.execute(SQL(
+            "UPDATE pos_config SET project_routing_version = nextval('pos_config_project_routing_version_seq') %s",
+            where,
+        ))
+        self.invalidate_model(['project_routing_version', 'project_metadata_version'])
+    
+    @tools.ormcache('self.id', 'self._get_project_routing_version()')
+    def _get_project_routing(self):
+        """
+        Tabla de rutas de proyectos del TPV, calculada una vez por worker y
+        versión (ver ``_invalidate_project_routing``): se recalcula al modificar
+        impresoras, categorías POS o la configuración del TPV.
+        
+        Las claves son cadenas para poder serializarse tal cual:
+        
+        - ``version``: sello del contenido de la tabla
+        - ``default_project_id``: proyecto de las órdenes finalizadas
+        - ``fast_tasks``: crear las tareas de las órdenes en modo rápido
+        - ``printers``: {id de impresora: {project_id, stage_id,
+          incremental, fast, coalesce_seconds}}
+        - ``categories``: {id de categoría POS: [ids de impresora]}, incluyendo
+          las subcategorías de las categorías de cada impresora
+        
+        :return: frozendict, no debe modificarse
+        """
+        config = self.sudo().exists()
+        if not config:
+            return frozendict({
+                'version': False, 'default_project_id': False, 'fast_tasks': False,
+                'printers': frozendict(), 'categories': frozendict(),
+            })
+        
+        printers = self.env['pos.printer'].sudo().search([
+            ('id', 'in', config.printer_ids.ids if 'printer_ids' in config._fields else []),
+            ('printer_type', '=', 'project'),
+            ('project_id', '!=', False),
+        ])
+        routes = {}
+        for printer in printers:
+            routes[str(printer.id)] = frozendict({
+                'project_id': printer.project_id.id,
+                'stage_id': printer.project_stage_id.id or False,
+                'incremental': printer.project_incremental_tasks,
+                'fast': printer.project_fast_tasks or config.project_fast_tasks,
+                'coalesce_seconds': config.project_coalesce_seconds,
+            })
+        
+        # Subcategorías de las categorías de todas las impresoras con una sola lectura:
+        # una categoría pertenece a una impresora si alguno de sus ancestros es de ella
+        categ_ids = printers.product_categories_ids.ids
+        categories = {}
+        if categ_ids:
+            printers_by_categ = {}
+            for printer in printers:
+                for categ in printer.product_categories_ids:
+                    printers_by_categ.setdefault(str(categ.id), []).append(printer.id)
+            for categ in self.env['pos.category'].sudo().search_read([('id', 'child_of', categ_ids)], ['parent_path']):
+                printer_ids = {
+                    printer_id
+                    for ancestor_id in categ['parent_path'].strip('/').split('/')
+                    for printer_id in printers_by_categ.get(ancestor_id, ())
+                }
+                if printer_ids:
+                    categories[str(categ['id'])] = tuple(sorted(printer_ids))
+        
+        routing = {
+            'default_project_id': config.project_id.id if config.enable_project_integration else False,
+            'fast_tasks': config.project_fast_tasks,
+            'printers': frozendict(routes),
+            'categories': frozendict(categories),
+        }
+        routing['version'] = hashlib.sha1(json.dumps(routing, sort_keys=True).encode()).hexdigest()[:16]
+        return frozendict(routing)
+    
+    def _get_project_metadata(self):
+        """
+        Datos de proyectos que necesita la sesión del POS: el proyecto de cada
+        impresora y si trabaja en modo incremental. La sesión los pide al
+        imprimir el primer ticket y los guarda junto con su ``version``.
+        
+        :return: diccionario con ``version``, ``default_project_id`` y ``printers``
+        """
+        self.ensure_one()
+        routing = self._get_project_routing()
+        return {
+            'version': routing['version'],
+            'default_project_id': routing['default_project_id'],
+            'printers': {
+                printer_id: {'project_id': route['project_id'], 'incremental': route['incremental']}
+                for printer_id, route in routing['printers'].items()
+            },
+        }
+    
+    def _get_project_printer_route(self, printer_id):
+        """Ruta de una impresora de tipo proyecto del TPV, o None si no existe"""
+        self.ensure_one()
+        return self._get_project_routing()['printers'].get(str(printer_id))
+    
+    def write(self, vals):
+        result = super().write(vals)
+        if self._PROJECT_ROUTING_FIELDS.intersection(vals):
+            self._invalidate_project_routing(self)
+        return result
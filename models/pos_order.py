@@ -1,12 +1,24 @@
 # -*- coding: utf-8 -*-
 # Part of Odoo. See LICENSE file for full copyright and licensing details.
 
-from odoo import models, api, fields, _
+import hashlib
+import json
+import logging
+
+from odoo import models, api, fields
+
+from ..tools import metrics, task_description
+
+_logger = logging.getLogger(__name__)
+
+# Parámetro del sistema con la última orden procesada de cada backfill, para reanudarlo
+BACKFILL_PARAM = 'pos_project_integration.backfill_last_order_id.%s'
 
 class PosOrder(models.Model):
     _inherit = 'pos.order'
 
-    project_task_ids = fields.Many2many('project.task', string='Tareas Creadas', readonly=True)
+    project_task_ids = fields.One2many('project.task', 'pos_order_id', string='Tareas Creadas', readonly=True)
+    project_task_history_ids = fields.One2many('pos.project.task.history', 'order_id', string='Tareas archivadas', readonly=True)
     
     @api.model
     def _process_order(self, order, draft, existing_order):
@@ -15,56 +27,173 @@ class PosOrder(models.Model):
         
         if result:
             order_id = self.browse(result)
-            if order_id.config_id.enable_project_integration and order_id.config_id.project_id:
-                self._create_project_task(order_id)
+            routing = order_id.config_id._get_project_routing()
+            if routing['default_project_id'] or routing['printers']:
+                # La tarea de la orden se crea, y las tareas de preparación enviadas
+                # antes de sincronizarla se vinculan, fuera de la sincronización
+                # para no añadir latencia ni arriesgar el rollback de la venta
+                self.env['pos.project.task.job'].sudo()._enqueue(order_id)
                 
         return result
     
-    def _create_project_task(self, order):
+    def _link_project_preparation_tasks(self):
+        """Vincula a las órdenes, por su UUID, las tareas de preparación creadas antes de sincronizarlas"""
+        order_ids_by_uuid = {order.uuid: order.id for order in self if order.uuid}
+        if not order_ids_by_uuid:
+            return
+        tasks = self.env['project.task'].sudo().with_context(active_test=False).search([
+            ('pos_order_uuid', 'in', list(order_ids_by_uuid)), ('pos_order_id', '=', False),
+        ])
+        for order_id, order_tasks in tasks.grouped(lambda task: order_ids_by_uuid[task.pos_order_uuid]).items():
+            order_tasks.write({'pos_order_id': order_id})
+    
+    def _create_project_task(self, order, description=None):
         """Crea una tarea en el proyecto configurado con la información de la orden"""
-        if not order or not order.config_id.enable_project_integration or not order.config_id.project_id:
+        if not order:
             return
-            
-        # Preparar descripción de la tarea
-        description = self._prepare_task_description(order)
+        results = self.env['pos.project.task.service']._create_tasks_for_orders(
+            order, descriptions=None if description is None else {order.id: description},
+        )
+        return results[order.id].get('task_id') or False
+    
+    @api.model
+    def _get_project_backfill_domain(self, config_ids=None, session_ids=None, date_from=None, date_to=None):
+        """Dominio de las órdenes confirmadas de los TPV con proyecto por defecto"""
+        config_domain = [('enable_project_integration', '=', True)]
+        if config_ids:
+            config_domain.append(('id', 'in', list(config_ids)))
+        configs = self.env['pos.config'].sudo().search(config_domain).filtered(
+            lambda config: config._get_project_routing()['default_project_id']
+        )
+        domain = [('config_id', 'in', configs.ids), ('state', 'not in', ('draft', 'cancel'))]
+        if session_ids:
+            domain.append(('session_id', 'in', list(session_ids)))
+        if date_from:
+            domain.append(('date_order', '>=', date_from))
+        if date_to:
+            domain.append(('date_order', '<=', date_to))
+        return domain
+    
+    @api.model
+    def _backfill_project_tasks(self, config_ids=None, session_ids=None, date_from=None, date_to=None,
+                                chunk_size=500, auto_commit=True):
+        """
+        Crea las tareas que faltan de las órdenes ya registradas, por ejemplo al
+        activar la integración en un TPV con sesiones abiertas. Pensado para
+        ``odoo-bin shell``::
         
-        # Crear la tarea
-        task = self.env['project.task'].create({
-            'name': _('Pedido %s', order.name),
-            'project_id': order.config_id.project_id.id,
-            'description': description,
-            'user_id': self.env.user.id,
-            'date_deadline': fields.Date.today(),
-            'partner_id': order.partner_id and order.partner_id.id or False,
-        })
+            env['pos.order']._backfill_project_tasks(date_from='2024-01-01', date_to='2024-06-30')
         
-        # Actualizar la orden con la tarea creada
-        order.write({'project_task_ids': [(4, task.id)]})
+        Recorre las órdenes por id en bloques de ``chunk_size``, crea en bloque
+        las tareas de cada bloque y confirma la transacción tras cada uno. El
+        último id procesado se guarda en un parámetro del sistema: si se
+        interrumpe, la misma llamada continúa donde se quedó.
         
-        return task.id
+        :return: número de tareas creadas
+        """
+        domain = self._get_project_backfill_domain(config_ids, session_ids, date_from, date_to)
+        run_key = json.dumps([sorted(config_ids or []), sorted(session_ids or []), str(date_from or ''), str(date_to or '')])
+        param = BACKFILL_PARAM % hashlib.sha1(run_key.encode()).hexdigest()[:16]
+        ICP = self.env['ir.config_parameter'].sudo()
+        last_id = int(ICP.get_param(param, 0))
+        if last_id:
+            _logger.info("Backfill de tareas POS: se reanuda tras la orden %s", last_id)
+        
+        Orders = self.sudo()
+        Service = self.env['pos.project.task.service'].sudo()
+        total = Orders.search_count(domain + [('id', '>', last_id)])
+        done = created = 0
+        while True:
+            orders = Orders.search(domain + [('id', '>', last_id)], order='id', limit=chunk_size)
+            if not orders:
+                break
+            results = Service._create_tasks_for_orders(orders, backfill=True)
+            created += sum(1 for result in results.values() if result['success'] and not result.get('duplicate'))
+            last_id = orders.ids[-1]
+            done += len(orders)
+            ICP.set_param(param, last_id)
+            if auto_commit:
+                self.env.cr.commit()
+            # Vaciar la caché del bloque para que la memoria no crezca con el número de órdenes
+            self.env.invalidate_all()
+            _logger.info("Backfill de tareas POS: %s/%s órdenes, %s tareas creadas", done, total, created)
+        
+        ICP.set_param(param, False)
+        if auto_commit:
+            self.env.cr.commit()
+        return created
     
     def _prepare_task_description(self, order):
         """Prepara la descripción detallada para la tarea"""
-        description = _('<h3>Pedido: %s</h3>', order.name)
+        return order._prepare_task_descriptions()[order.id]
+    
+    def _prepare_task_descriptions(self):
+        """
+        Prepara la descripción de las tareas de todas las órdenes del recordset
+        
+        :return: diccionario {id de orden: descripción HTML}
+        """
+        labels = task_description.get_labels(self.env)
+        data_by_order = self._get_task_description_data()
+        with metrics.timer('render'):
+            return {
+                order_id: task_description.render_order(data, labels)
+                for order_id, data in data_by_order.items()
+            }
+    
+    def _get_task_description_data(self):
+        """
+        Lee en bloque los datos de las órdenes y de sus líneas que necesita la
+        descripción de la tarea, como diccionarios planos.
         
-        # Información del cliente
-        if order.partner_id:
-            description += _('<p><strong>Cliente:</strong> %s</p>', order.partner_id.name)
+        El número de consultas es fijo, independiente del número de órdenes y de
+        líneas: una lectura de las órdenes (más los nombres de sus relaciones) y
+        una de las líneas. Los nombres de producto salen de ``full_product_name``
+        y solo se leen del producto cuando la línea no lo tiene.
         
-        # Fecha y hora
-        description += _('<p><strong>Fecha:</strong> %s</p>', fields.Datetime.to_string(order.date_order))
+        :return: diccionario {id de orden: datos}
+        """
+        if not self:
+            return {}
         
-        # Productos
-        description += _('<h4>Productos:</h4><ul>')
-        for line in order.lines:
-            note = ''
-            if line.note:
-                note = _(' - Nota: %s', line.note)
-            description += _('<li>%s x %s%s</li>', line.qty, line.product_id.name, note)
-        description += _('</ul>')
+        order_fields = ['name', 'user_id', 'partner_id', 'date_order', 'amount_total']
+        order_fields += [name for name in ('table_id', 'note') if name in self._fields]
         
-        # Notas generales
-        if order.note:
-            description += _('<h4>Notas adicionales:</h4><p>%s</p>', order.note)
-            
-        return description 
\ No newline at end of file
+        OrderLine = self.env['pos.order.line']
+        line_fields = ['order_id', 'product_id', 'full_product_name', 'qty', 'price_subtotal_incl']
+        line_fields += [name for name in ('note',) if name in OrderLine._fields]
+        
+        result = {}
+        for values in self.read(order_fields):
+            result[values['id']] = {
+                'name': values['name'],
+                'table': values['table_id'] and values['table_id'][1] if 'table_id' in values else False,
+                'user': values['user_id'] and values['user_id'][1],
+                'customer': values['partner_id'] and values['partner_id'][1],
+                'note': values.get('note') or False,
+                'date_order': values['date_order'],
+                'amount_total': values['amount_total'],
+                'lines': [],
+            }
+        
+        lines = OrderLine.search_read(
+            [('order_id', 'in', self.ids)], line_fields, order='order_id, id', load=None,
+        )
+        
+        # Nombres de producto solo para las líneas sin full_product_name
+        missing_product_ids = {line['product_id'] for line in lines if not line['full_product_name']}
+        product_names = {}
+        if missing_product_ids:
+            product_names = {
+                product['id']: product['display_name']
+                for product in self.env['product.product'].browse(missing_product_ids).read(['display_name'])
+            }
+        
+        for line in lines:
+            result[line['order_id']]['lines'].append({
+                'product_name': line['full_product_name'] or product_names.get(line['product_id'], ''),
+                'qty': line['qty'],
+                'price_subtotal_incl': line['price_subtotal_incl'],
+                'note': line.get('note') or False,
+            })
+        return result
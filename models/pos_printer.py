@@ -12,103 +12,140 @@ class PosPrinter(models.Model):
     printer_type = fields.Selection(selection_add=[('project', 'Use a project')])
     project_id = fields.Many2one('project.project', string='Project', 
                                 help="Project where tasks will be created from POS orders")
+    project_stage_id = fields.Many2one(
+        'project.task.type', string='Etapa inicial',
+        domain="[('project_ids', 'in', project_id)]",
+        help="Etapa en la que se crean las tareas de esta impresora")
+    project_incremental_tasks = fields.Boolean(
+        string='Actualizar tarea existente',
+        help="Los tickets de cambios de una orden se añaden a la tarea ya creada para esa "
+             "orden en esta impresora, en lugar de crear una tarea nueva por ticket")
+    project_fast_tasks = fields.Boolean(
+        string='Tareas rápidas',
+        help="Crea las tareas de esta impresora sin seguimiento, chatter, seguidores ni correos, "
+             "aunque el TPV no tenga activado el modo rápido")
+    project_sequence_id = fields.Many2one(
+        'ir.sequence', string='Secuencia de tickets', readonly=True, copy=False,
+        help="Numera las tareas de esta estación; se crea con la primera tarea")
     
-    @api.model
-    def _load_pos_data_fields(self, config_id):
-        fields_list = super()._load_pos_data_fields(config_id)
-        fields_list.append('project_id')
-        _logger.info("Campos cargados para impresoras POS: %s", fields_list)
-        return fields_list
+    # Campos cuyo cambio invalida las tablas de rutas de proyectos de los TPV
+    _PROJECT_ROUTING_FIELDS = {
+        'printer_type', 'project_id', 'project_stage_id', 'project_incremental_tasks', 'project_fast_tasks',
+        'product_categories_ids',
+    }
+    
+    @api.model_create_multi
+    def create(self, vals_list):
+        printers = super().create(vals_list)
+        if any(printer.printer_type == 'project' for printer in printers):
+            self.env['pos.config']._invalidate_project_routing()
+        return printers
     
-    def _prepare_printer_data(self):
-        data = super()._prepare_printer_data()
-        if self.printer_type == 'project' and self.project_id:
-            data['project_id'] = self.project_id.read(['id', 'name'])[0]
-            _logger.info("Datos de proyecto para impresora %s: %s", self.name, data['project_id'])
-        return data
+    def write(self, vals):
+        # Solo los cambios de campos de rutas en impresoras que son o pasan a ser de proyecto
+        routing = self._PROJECT_ROUTING_FIELDS.intersection(vals) and (
+            vals.get('printer_type') == 'project' or any(printer.printer_type == 'project' for printer in self)
+        )
+        result = super().write(vals)
+        if routing:
+            self.env['pos.config']._invalidate_project_routing()
+        return result
+    
+    def unlink(self):
+        routing = any(printer.printer_type == 'project' for printer in self)
+        result = super().unlink()
+        if routing:
+            self.env['pos.config']._invalidate_project_routing()
+        return result
     
     @api.model
     def check_project_printers(self):
-        """Verifica y corrige las impresoras de tipo proyecto sin proyecto asignado"""
-        project_printers = self.search([('printer_type', '=', 'project')])
-        _logger.info("Verificando %s impresoras de tipo proyecto", len(project_printers))
-        
-        for printer in project_printers:
-            _logger.info("Impresora %s (ID: %s) - Tipo: %s - Proyecto: %s", 
-                         printer.name, printer.id, printer.printer_type, printer.project_id and printer.project_id.name or "No configurado")
-            
-            if not printer.project_id:
-                # Buscar un proyecto por defecto
-                default_project = self.env['project.project'].search([], limit=1)
-                if default_project:
-                    _logger.info("Asignando proyecto por defecto %s a la impresora %s", 
-                                default_project.name, printer.name)
-                    printer.project_id = default_project.id
-                else:
-                    _logger.warning("No se encontró ningún proyecto para asignar a la impresora %s", printer.name)
-        
-        return {
-            'type': 'ir.actions.client',
-            'tag': 'display_notification',
-            'params': {
-                'title': 'Verificación completada',
-                'message': f'Se verificaron {len(project_printers)} impresoras de tipo proyecto',
-                'sticky': False,
-                'type': 'success',
-            }
-        }
+        """Informa, sin modificar nada, de las impresoras de tipo proyecto sin proyecto asignado"""
+        return self._repair_project_printers(dry_run=True)
     
     @api.model
     def fix_project_printers_in_database(self):
-        """Corrige directamente en la base de datos las impresoras de tipo proyecto"""
-        self.env.cr.execute("""
-            SELECT id, name, printer_type, project_id
-            FROM pos_printer
-            WHERE printer_type = 'project'
-        """)
-        printers = self.env.cr.dictfetchall()
-        _logger.info("Encontradas %s impresoras de tipo proyecto en la base de datos", len(printers))
+        """Asigna un proyecto por defecto a las impresoras de tipo proyecto que no lo tienen"""
+        return self._repair_project_printers()
+    
+    @api.model
+    def _repair_project_printers(self, dry_run=False):
+        """
+        Asigna en una sola sentencia SQL un proyecto por defecto a todas las
+        impresoras de tipo proyecto sin proyecto. El proyecto por defecto es el
+        primer proyecto activo de la compañía de la impresora (o compartido si la
+        compañía no tiene ninguno), según su secuencia.
         
-        # Buscar un proyecto por defecto
-        self.env.cr.execute("SELECT id FROM project_project LIMIT 1")
-        project_result = self.env.cr.fetchone()
+        No confirma la transacción: la corrección se guarda junto con el resto de
+        la petición, o se revierte con ella.
         
-        if not project_result:
-            _logger.warning("No se encontró ningún proyecto en la base de datos")
-            return {
-                'type': 'ir.actions.client',
-                'tag': 'display_notification',
-                'params': {
-                    'title': 'Error',
-                    'message': 'No se encontró ningún proyecto en la base de datos',
-                    'sticky': False,
-                    'type': 'danger',
-                }
-            }
+        :param dry_run: si es True solo calcula el informe, sin modificar nada
+        :return: acción de notificación con el informe
+        """
+        company_clause = "pp.company_id = p.company_id OR pp.company_id IS NULL" if 'company_id' in self._fields else "TRUE"
+        candidates_query = f"""
+            SELECT p.id AS printer_id,
+                   (SELECT pp.id
+                      FROM project_project pp
+                     WHERE pp.active AND ({company_clause})
+                  ORDER BY pp.company_id IS NULL, pp.sequence, pp.id
+                     LIMIT 1) AS project_id
+              FROM pos_printer p
+             WHERE p.printer_type = 'project'
+               AND p.project_id IS NULL
+        """
+        self.flush_model(['printer_type', 'project_id'])
+        if dry_run:
+            self.env.cr.execute(candidates_query)
+        else:
+            self.env.cr.execute(f"""
+                WITH candidates AS ({candidates_query})
+                UPDATE pos_printer p
+                   SET project_id = c.project_id,
+                       write_uid = %s,
+                       write_date = now() at time zone 'UTC'
+                  FROM candidates c
+                 WHERE p.id = c.printer_id
+                   AND c.project_id IS NOT NULL
+             RETURNING p.id, p.project_id
+            """, (self.env.uid,))
+        rows = self.env.cr.fetchall()
         
-        default_project_id = project_result[0]
-        _logger.info("Proyecto por defecto ID: %s", default_project_id)
+        if dry_run:
+            fixable = [row for row in rows if row[1]]
+            unresolved = len(rows) - len(fixable)
+        else:
+            fixable = rows
+            self.env.cr.execute("""
+                SELECT COUNT(*) FROM pos_printer WHERE printer_type = 'project' AND project_id IS NULL
+            """)
+            unresolved = self.env.cr.fetchone()[0]
+            if fixable:
+                # Mantener coherentes la caché del ORM y las tablas de rutas
+                self.invalidate_model(['project_id', 'write_uid', 'write_date'])
+                self.env['pos.config']._invalidate_project_routing()
         
-        # Actualizar las impresoras sin proyecto
-        for printer in printers:
-            if not printer['project_id']:
-                _logger.info("Actualizando impresora %s (ID: %s) con proyecto por defecto", 
-                            printer['name'], printer['id'])
-                self.env.cr.execute("""
-                    UPDATE pos_printer
-                    SET project_id = %s
-                    WHERE id = %s
-                """, (default_project_id, printer['id']))
+        _logger.info(
+            "Impresoras de tipo proyecto sin proyecto: %s %s, %s sin proyecto disponible",
+            len(fixable), "corregibles" if dry_run else "corregidas", unresolved,
+        )
         
-        self.env.cr.commit()
+        if dry_run:
+            title = 'Verificación completada'
+            message = f'{len(fixable)} impresoras de tipo proyecto sin proyecto pueden corregirse'
+        else:
+            title = 'Corrección completada'
+            message = f'Se asignó un proyecto por defecto a {len(fixable)} impresoras de tipo proyecto'
+        if unresolved:
+            message += f'; {unresolved} no tienen ningún proyecto disponible en su compañía'
         
         return {
             'type': 'ir.actions.client',
             'tag': 'display_notification',
             'params': {
-                'title': 'Corrección completada',
-                'message': f'Se corrigieron las impresoras de tipo proyecto en la base de datos',
+                'title': title,
+                'message': message,
                 'sticky': False,
-                'type': 'success',
+                'type': 'warning' if unresolved else 'success',
             }
-        } 
\ No newline at end of file
+        }
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+from datetime import timedelta
+import logging
+
+from odoo import api, fields, models
+
+from ..tools.task_description import format_qty
+from .project_task import CLOSED_TASK_STATES
+
+_logger = logging.getLogger(__name__)
+
+# Contexto de las escrituras masivas de la retención: sin seguimiento ni avisos a cocina
+RETENTION_CONTEXT = {
+    'active_test': False,
+    'tracking_disable': True,
+    'mail_notrack': True,
+    'pos_project_no_notify': True,
+}
+
+
+class PosProjectTaskHistory(models.Model):
+    _name = 'pos.project.task.history'
+    _description = 'Histórico de tareas de proyecto del POS'
+    _order = 'closed_date desc, id desc'
+
+    task_ref = fields.Integer(string='ID de la tarea original', readonly=True, index=True)
+    name = fields.Char(string='Tarea', readonly=True)
+    project_id = fields.Many2one('project.project', string='Proyecto', readonly=True, index=True, ondelete='cascade')
+    stage_name = fields.Char(string='Etapa', readonly=True)
+    order_id = fields.Many2one('pos.order', string='Orden', readonly=True, index='btree_not_null', ondelete='set null')
+    pos_order_uuid = fields.Char(string='UUID de la orden POS', readonly=True, index='btree_not_null')
+    # Clave única de la tarea original, para no volver a crear la tarea de una orden ya atendida
+    pos_task_key = fields.Char(string='Clave de tarea POS', readonly=True, index='btree_not_null')
+    pos_printer_id = fields.Many2one('pos.printer', string='Impresora de preparación', readonly=True, ondelete='set null')
+    partner_id = fields.Many2one('res.partner', string='Cliente', readonly=True, ondelete='set null')
+    task_create_date = fields.Datetime(string='Creada el', readonly=True)
+    closed_date = fields.Datetime(string='Cerrada el', readonly=True)
+    summary = fields.Text(string='Productos', readonly=True)
+
+    @api.model
+    def _cron_apply_retention(self, batch_size=1000, auto_commit=True):
+        """
+        Aplica la retención configurada en los TPV a las tareas cerradas de sus
+        proyectos, por lotes y confirmando cada lote por separado.
+
+        :return: número de tareas archivadas o movidas al histórico
+        """
+        processed = 0
+        for project_id, (days, mode) in self._get_retention_policies().items():
+            limit_date = fields.Datetime.now() - timedelta(days=days)
+            while True:
+                tasks = self._fetch_expired_tasks(project_id, limit_date, batch_size, archived=mode == 'history')
+                if not tasks:
+                    break
+                if mode == 'history':
+                    self._move_to_history(tasks)
+                else:
+                    tasks.write({'active': False})
+                processed += len(tasks)
+                if auto_commit:
+                    self.env.cr.commit()
+                if len(tasks) < batch_size:
+                    break
+        if processed:
+            _logger.info("Retención de tareas POS: %s tareas procesadas", processed)
+        return processed
+
+    @api.model
+    def _get_retention_policies(self):
+        """
+        Retención por proyecto a partir de los TPV que lo usan. Si varios TPV
+        comparten un proyecto se aplica la política más conservadora: el mayor
+        número de días y el archivado antes que el histórico.
+
+        :return: diccionario {id de proyecto: (días, modo)}
+        """
+        policies = {}
+        configs = self.env['pos.config'].sudo().search([('project_task_retention_days', '>', 0)])
+        for config in configs:
+            routing = config._get_project_routing()
+            project_ids = {route['project_id'] for route in routing['printers'].values()}
+            if routing['default_project_id']:
+                project_ids.add(routing['default_project_id'])
+            for project_id in project_ids:
+                days, mode = policies.get(project_id, (0, 'history'))
+                policies[project_id] = (
+                    max(days, config.project_task_retention_days),
+                    'archive' if 'archive' in (mode, config.project_task_retention_mode) else 'history',
+                )
+        return policies
+
+    @api.model
+    def _fetch_expired_tasks(self, project_id, limit_date, limit, archived=False):
+        """Tareas del POS cerradas antes de ``limit_date``, las más antiguas primero"""
+        Task = self.env['project.task']
+        has_state = 'state' in Task._fields
+        Task.flush_model(
+            ['project_id', 'stage_id', 'active', 'pos_order_uuid', 'pos_order_id', 'date_last_stage_update']
+            + (['state'] if has_state else [])
+        )
+        closed = "(s.fold OR t.state IN %(closed_states)s)" if has_state else "s.fold"
+        self.env.cr.execute(f"""
+            SELECT t.id
+              FROM project_task t
+         LEFT JOIN project_task_type s ON s.id = t.stage_id
+             WHERE t.project_id = %(project_id)s
+               AND {closed}
+               AND (t.active OR %(archived)s)
+               AND COALESCE(t.date_last_stage_update, t.write_date) < %(limit_date)s
+               AND (t.pos_order_uuid IS NOT NULL OR t.pos_order_id IS NOT NULL)
+          ORDER BY t.id
+             LIMIT %(limit)s
+        """, {
+            'project_id': project_id,
+            'archived': archived,
+            'limit_date': limit_date,
+            'limit': limit,
+            'closed_states': CLOSED_TASK_STATES,
+        })
+        return Task.with_context(**RETENTION_CONTEXT).browse([row[0] for row in self.env.cr.fetchall()])
+
+    @api.model
+    def _move_to_history(self, tasks):
+        """Copia las tareas a filas compactas del histórico y las elimina"""
+        tasks_data = tasks.read(
+            ['name', 'project_id', 'stage_id', 'partner_id', 'pos_order_id', 'pos_order_uuid', 'pos_printer_id',
+             'pos_task_key', 'create_date', 'date_last_stage_update', 'write_date'],
+        )
+
+        # Orden de cada tarea: por su vínculo o, si aún no lo tiene, por su UUID
+        uuids = {data['pos_order_uuid'] for data in tasks_data if data['pos_order_uuid'] and not data['pos_order_id']}
+        order_by_uuid = {}
+        if uuids:
+            order_by_uuid = {
+                order['uuid']: order['id']
+                for order in self.env['pos.order'].sudo().search_read([('uuid', 'in', list(uuids))], ['uuid'])
+            }
+
+        summaries = {}
+        for line in self.env['pos.project.ticket.line'].sudo().search_read(
+            [('task_id', 'in', tasks.ids)], ['task_id', 'product_name', 'qty'], order='id', load=None,
+        ):
+            summaries.setdefault(line['task_id'], []).append(f"{format_qty(line['qty'])}x {line['product_name']}")
+
+        self.create([{
+            'task_ref': data['id'],
+            'name': data['name'],
+            'project_id': data['project_id'] and data['project_id'][0],
+            'stage_name': data['stage_id'] and data['stage_id'][1],
+            'order_id': (data['pos_order_id'] and data['pos_order_id'][0]) or order_by_uuid.get(data['pos_order_uuid']) or False,
+            'pos_order_uuid': data['pos_order_uuid'],
+            'pos_task_key': data['pos_task_key'],
+            'pos_printer_id': data['pos_printer_id'] and data['pos_printer_id'][0],
+            'partner_id': data['partner_id'] and data['partner_id'][0],
+            'task_create_date': data['create_date'],
+            'closed_date': data['date_last_stage_update'] or data['write_date'],
+            'summary': '\n'.join(summaries.get(data['id'], [])) or False,
+        } for data in tasks_data])
+        tasks.unlink()
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+from datetime import timedelta
+import logging
+
+from odoo import api, fields, models
+from odoo.tools import SQL
+
+from ..tools import metrics
+
+_logger = logging.getLogger(__name__)
+
+# Reintentos con espera exponencial: 1, 2, 4, 8... minutos, con un máximo de una hora
+MAX_ATTEMPTS = 8
+BACKOFF_BASE_SECONDS = 60
+BACKOFF_MAX_SECONDS = 3600
+
+
+class PosProjectTaskJob(models.Model):
+    _name = 'pos.project.task.job'
+    _description = 'Cola de creación de tareas desde el POS'
+    _order = 'next_attempt_date, id'
+    _rec_name = 'order_id'
+
+    order_id = fields.Many2one('pos.order', string='Orden', required=True, index=True, ondelete='cascade')
+    config_id = fields.Many2one(related='order_id.config_id', string='Punto de Venta')
+    user_id = fields.Many2one('res.users', string='Usuario', default=lambda self: self.env.user, ondelete='set null')
+    state = fields.Selection([
+        ('pending', 'Pendiente'),
+        ('failed', 'Reintentando'),
+        ('done', 'Procesado'),
+        ('dead', 'Descartado'),
+    ], string='Estado', default='pending', required=True, index=True)
+    attempts = fields.Integer(string='Intentos', default=0, readonly=True)
+    next_attempt_date = fields.Datetime(string='Próximo intento', default=fields.Datetime.now, index=True)
+    last_error = fields.Text(string='Último error', readonly=True)
+    task_id = fields.Many2one('project.task', string='Tarea', readonly=True, ondelete='set null')
+    backfill = fields.Boolean(
+        string='Orden anterior', readonly=True,
+        help="Encolado por el backfill: la tarea se crea ya cerrada, en modo rápido y sin avisar a cocina")
+
+    @api.model
+    def _enqueue(self, orders):
+        """Encola la creación de tareas para las órdenes indicadas"""
+        if not orders:
+            return self.browse()
+        queued = self.search([('order_id', 'in', orders.ids), ('state', 'in', ('pending', 'failed'))])
+        queued_order_ids = set(queued.order_id.ids)
+        jobs = self.create([
+            {'order_id': order.id}
+            for order in orders
+            if order.id not in queued_order_ids
+        ])
+        if jobs:
+            # Despertar al worker sin esperar a la siguiente ejecución programada
+            self.env.ref('pos_project_integration.ir_cron_process_project_task_jobs')._trigger()
+        return jobs
+
+    @api.model
+    def _enqueue_domain(self, domain, backfill=False):
+        """
+        Encola en una sola consulta las órdenes del dominio que no tienen tarea
+        de orden, ni en las tareas ni en el histórico de la retención, ni
+        trabajo pendiente, sin cargarlas en memoria.
+
+        :param backfill: órdenes anteriores, ver ``_create_tasks_for_orders``
+        :return: número de trabajos encolados
+        """
+        query = self.env['pos.order'].sudo()._search(domain)
+        self.flush_model(['order_id', 'state'])
+        self.env['project.task'].flush_model(['pos_task_key'])
+        self.env['pos.project.task.history'].flush_model(['pos_task_key'])
+        self.env.cr.execute(SQL("""
+            INSERT INTO pos_project_task_job
+                   (order_id, user_id, state, attempts, next_attempt_date, backfill,
+                    create_uid, create_date, write_uid, write_date)
+            SELECT o.id, o.user_id, 'pending', 0, now() at time zone 'UTC', %(backfill)s,
+                   %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+              FROM pos_order o
+             WHERE o.id IN %(order_ids)s
+               AND NOT EXISTS (
+                       SELECT 1 FROM pos_project_task_job j
+                        WHERE j.order_id = o.id AND j.state IN ('pending', 'failed'))
+               AND NOT EXISTS (
+                       SELECT 1 FROM project_task t
+                        WHERE t.pos_task_key = 'order:' || o.id)
+               AND NOT EXISTS (
+                       SELECT 1 FROM pos_project_task_history h
+                        WHERE h.pos_task_key = 'order:' || o.id)
+        """, uid=self.env.uid, backfill=bool(backfill), order_ids=query.subselect()))
+        count = self.env.cr.rowcount
+        if count:
+            self.env.ref('pos_project_integration.ir_cron_process_project_task_jobs')._trigger()
+        return count
+
+    @api.model
+    def _cron_process_jobs(self, batch_size=100, auto_commit=True):
+        """Procesa la cola de tareas por lotes, con reintentos y descarte definitivo"""
+        processed = 0
+        while True:
+            jobs = self._fetch_due_jobs(batch_size)
+            if not jobs:
+                break
+            jobs._process()
+            processed += len(jobs)
+            if auto_commit:
+                self.env.cr.commit()
+            if len(jobs) < batch_size:
+                break
+        if processed:
+            _logger.info("Cola de tareas POS: %s trabajos procesados", processed)
+        return processed
+
+    def _fetch_due_jobs(self, limit):
+        # SKIP LOCKED permite ejecutar varios workers en paralelo sin procesar dos veces un trabajo
+        self.env.cr.execute("""
+            SELECT id
+              FROM pos_project_task_job
+             WHERE state IN ('pending', 'failed')
+               AND next_attempt_date <= (now() at time zone 'UTC')
+             ORDER BY next_attempt_date, id
+             LIMIT %s
+               FOR UPDATE SKIP LOCKED
+        """, (limit,))
+        return self.browse([row[0] for row in self.env.cr.fetchall()])
+
+    def _process(self):
+        # Vincular en bloque las tareas de preparación enviadas antes de sincronizar cada orden
+        self.order_id._link_project_preparation_tasks()
+
+        # Los TPV sin proyecto por defecto solo encolan las órdenes para vincular sus tareas de preparación
+        without_project = self.filtered(lambda job: not job.config_id._get_project_routing()['default_project_id'])
+        without_project.write({'state': 'done', 'attempts': 1, 'last_error': False})
+
+        # Las tareas se crean en nombre del usuario que sincronizó cada orden,
+        # con una llamada al servicio por usuario y tipo de trabajo para todo su lote
+        for (user, backfill), jobs in (self - without_project).grouped(lambda job: (job.user_id, job.backfill)).items():
+            Service = self.env['pos.project.task.service'].with_user(user or self.env.user).sudo()
+            try:
+                with self.env.cr.savepoint():
+                    results = Service._create_tasks_for_orders(jobs.order_id.with_env(Service.env), backfill=backfill)
+            except Exception as e:
+                # Si falla el lote, reintentar orden a orden para que el intento
+                # solo cuente en el trabajo que falla
+                _logger.warning("Error al crear las tareas del lote, reintentando una a una: %s", str(e))
+                results = {}
+                for order in jobs.order_id.with_env(Service.env):
+                    try:
+                        with self.env.cr.savepoint():
+                            results.update(Service._create_tasks_for_orders(order, backfill=backfill))
+                    except Exception as error:
+                        results[order.id] = {'success': False, 'message': str(error)}
+
+            for job in jobs:
+                result = results.get(job.order_id.id) or {'success': False, 'message': 'Orden no procesada'}
+                if not result['success']:
+                    _logger.warning("Error al crear la tarea de la orden %s: %s", job.order_id.name, result['message'])
+                    job._schedule_retry(result['message'])
+                    continue
+                metrics.increment('success', job.config_id.id)
+                job.write({
+                    'state': 'done',
+                    'attempts': job.attempts + 1,
+                    'task_id': result.get('task_id') or False,
+                    'last_error': False,
+                })
+
+    def _schedule_retry(self, error):
+        self.ensure_one()
+        attempts = self.attempts + 1
+        if attempts >= MAX_ATTEMPTS:
+            _logger.error("Trabajo %s descartado tras %s intentos: %s", self.id, attempts, error)
+            metrics.increment('failure', self.config_id.id)
+            self.write({'state': 'dead', 'attempts': attempts, 'last_error': error})
+            return
+        metrics.increment('retry', self.config_id.id)
+        delay = min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS)
+        self.write({
+            'state': 'failed',
+            'attempts': attempts,
+            'last_error': error,
+            'next_attempt_date': fields.Datetime.now() + timedelta(seconds=delay),
+        })
+
+    def action_retry(self):
+        """Vuelve a encolar los trabajos seleccionados"""
+        self.filtered(lambda job: job.state in ('failed', 'dead')).write({
+            'state': 'pending',
+            'attempts': 0,
+            'next_attempt_date': fields.Datetime.now(),
+        })
+        self.env.ref('pos_project_integration.ir_cron_process_project_task_jobs')._trigger()
+
+    @api.autovacuum
+    def _gc_done_jobs(self):
+        limit_date = fields.Datetime.now() - timedelta(days=7)
+        self.search([('state', '=', 'done'), ('write_date', '<', limit_date)]).unlink()
@@ -0,0 +1,792 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+from datetime import datetime
+import logging
+import re
+import time
+
+from psycopg2.errors import UniqueViolation
+
+from odoo import api, models, _
+from odoo.exceptions import ConcurrencyError
+
+from ..tools import metrics
+from .pos_project_ticket import _to_float
+from .project_task import CLOSED_TASK_STATES
+
+_logger = logging.getLogger(__name__)
+
+# Referencia del recibo del POS ("Order 00001-001-0001") en el nombre de la orden
+ORDER_REF_RE = re.compile(r'(\d+-\d+-\d+)')
+# Números de ticket de cada estación: fecha del día y contador de la secuencia ("250317-0042")
+TICKET_NUMBER_PREFIX = '%(y)s%(month)s%(day)s-'
+TICKET_NUMBER_PADDING = 4
+ORDER_READ_FIELDS = ['name', 'pos_reference', 'partner_id', 'config_id', 'uuid', 'user_id', 'date_order']
+
+
+class PosProjectTaskService(models.AbstractModel):
+    """
+    Punto único de creación de las tareas del POS: las de las órdenes (cola,
+    botón *Crear Tarea* y backfill) y las de los tickets de preparación. Las
+    rutas del controlador, la cola y ``pos.order`` solo llaman a este servicio.
+
+    Todos los métodos trabajan por lotes y se llaman con ``sudo()``; el
+    usuario del entorno es el responsable de las tareas creadas.
+    """
+    _name = 'pos.project.task.service'
+    _description = 'Creación de tareas de proyecto desde el POS'
+
+    # ------------------------------------------------------------------
+    # Órdenes
+    # ------------------------------------------------------------------
+
+    @api.model
+    def _create_tasks_for_orders(self, orders, project_id=None, descriptions=None, backfill=False):
+        """
+        Crea la tarea de cada orden, salvo las que ya la tienen o cuya tarea
+        pasó al histórico de la retención, con un número fijo de consultas para
+        todo el lote.
+
+        :param orders: recordset de ``pos.order``
+        :param project_id: proyecto explícito; por defecto el del TPV de cada orden
+        :param descriptions: descripciones ya preparadas {id de orden: HTML}
+        :param backfill: órdenes pasadas: el responsable es el vendedor de la
+                         orden, se crean en modo rápido y ya cerradas, no se
+                         avisa a cocina y las tareas creadas en paralelo se
+                         saltan sin repetir
+        :return: diccionario {id de orden: resultado}
+        """
+        Task = self.env['project.task']
+        results = {}
+        keys = {order.id: Task._pos_order_task_key(order) for order in orders}
+        existing = {
+            task.pos_task_key: task
+            for task in Task.with_context(active_test=False).search([('pos_task_key', 'in', list(keys.values()))])
+        }
+        archived_keys = set()
+        missing_keys = set(keys.values()) - set(existing)
+        if missing_keys:
+            archived_keys = {
+                history['pos_task_key']
+                for history in self.env['pos.project.task.history'].search_read(
+                    [('pos_task_key', 'in', list(missing_keys))], ['pos_task_key'],
+                )
+            }
+        for order in orders:
+            task = existing.get(keys[order.id])
+            if task:
+                results[order.id] = self._order_task_result(task, duplicate=True)
+            elif keys[order.id] in archived_keys:
+                results[order.id] = {
+                    'success': True,
+                    'message': 'La tarea de la orden está en el histórico',
+                    'task_id': False,
+                    'duplicate': True,
+                }
+        orders = orders.filtered(lambda order: order.id not in results)
+        if not orders:
+            return results
+
+        if descriptions is None:
+            descriptions = self._get_order_descriptions(orders)
+        orders_data = orders.read(ORDER_READ_FIELDS, load=None)
+        project_ids = {}
+        fast_by_order = {}
+        for values in orders_data:
+            routing = self.env['pos.config'].browse(values['config_id'])._get_project_routing()
+            project_ids[values['id']] = project_id or routing['default_project_id']
+            fast_by_order[values['id']] = backfill or routing['fast_tasks']
+        valid_project_ids = set(self.env['project.project'].browse(set(filter(None, project_ids.values()))).exists().ids)
+
+        valid_orders_data = []
+        for values in orders_data:
+            order_project_id = project_ids[values['id']]
+            if not order_project_id:
+                results[values['id']] = {'success': False, 'message': 'No hay proyecto configurado'}
+            elif order_project_id not in valid_project_ids:
+                results[values['id']] = {'success': False, 'message': 'Proyecto no encontrado'}
+            else:
+                valid_orders_data.append(values)
+
+        # Las tareas de las órdenes se numeran con la secuencia de su TPV
+        numbers = self._get_ticket_numbers([
+            self.env['pos.config'].browse(values['config_id']) for values in valid_orders_data
+        ])
+        # Las tareas de órdenes pasadas no son comandas pendientes para la cocina
+        closed_vals = self._get_closed_task_vals({project_ids[values['id']] for values in valid_orders_data}) if backfill else {}
+        vals_list = []
+        pending = []
+        for values, number in zip(valid_orders_data, numbers):
+            user = self.env['res.users'].browse(values['user_id']) if backfill else self.env.user
+            vals = self._prepare_order_task_vals(
+                values, project_ids[values['id']], descriptions.get(values['id']), user, number=number,
+            )
+            vals['pos_task_key'] = keys[values['id']]
+            vals.update(closed_vals.get(project_ids[values['id']], {}))
+            vals_list.append(vals)
+            pending.append(values['id'])
+
+        with metrics.timer('create'):
+            created = self._create_task_batch(
+                vals_list, [fast_by_order[order_id] for order_id in pending], skip_conflicts=backfill,
+            )
+        for order_id, task in zip(pending, created):
+            if isinstance(task, Exception):
+                results[order_id] = {'success': False, 'message': str(task)}
+            elif task is None:
+                results[order_id] = {'success': True, 'message': 'La orden ya tenía una tarea', 'task_id': False, 'duplicate': True}
+            else:
+                results[order_id] = self._order_task_result(task)
+
+        if not backfill:
+            Task.browse([
+                result['task_id'] for result in results.values() if result['success'] and not result.get('duplicate')
+            ])._pos_kitchen_notify()
+        return results
+
+    @api.model
+    def _get_order_descriptions(self, orders):
+        """Descripciones de las órdenes en bloque, o una mínima si falla su preparación"""
+        try:
+            return orders._prepare_task_descriptions()
+        except Exception as e:
+            _logger.warning("Error al preparar las descripciones del lote: %s", str(e))
+            return {order.id: f"<p>Pedido: {order.name}</p>" for order in orders}
+
+    @api.model
+    def _prepare_order_task_vals(self, values, project_id, description, user, number=False):
+        """
+        Valores de creación de la tarea de una orden
+
+        :param values: datos de la orden leídos con ``ORDER_READ_FIELDS``
+        :param user: responsable de la tarea
+        :param number: número de ticket de la secuencia del TPV
+        """
+        Task = self.env['project.task']
+        reference = self._get_order_reference(values['pos_reference'] or values['name'])
+        vals = {
+            'name': self._get_task_name(reference, number, _('Pedido %s', values['name'])),
+            'pos_order_reference': reference,
+            'pos_ticket_number': number,
+            'project_id': project_id,
+            'description': description,
+            'partner_id': values['partner_id'],
+            'pos_order_uuid': values['uuid'],
+            'pos_order_id': values['id'],
+        }
+        vals.update(Task._pos_assignee_vals(user))
+        vals.update(Task._pos_deadline_vals(values['date_order'] and values['date_order'].date()))
+        return vals
+
+    @api.model
+    def _get_closed_task_vals(self, project_ids):
+        """
+        Valores que crean las tareas ya cerradas: la primera etapa plegada de
+        cada proyecto y, en las versiones que lo tienen, el estado hecho. Las
+        pantallas de cocina no muestran estas tareas como pendientes.
+
+        :return: diccionario {id de proyecto: valores}
+        """
+        Task = self.env['project.task']
+        stages = self.env['project.task.type'].search(
+            [('project_ids', 'in', list(project_ids)), ('fold', '=', True)], order='sequence, id',
+        )
+        result = {}
+        for project_id in project_ids:
+            vals = {}
+            stage = next((stage for stage in stages if project_id in stage.project_ids.ids), None)
+            if stage:
+                vals['stage_id'] = stage.id
+            if 'state' in Task._fields:
+                vals['state'] = CLOSED_TASK_STATES[0]
+            result[project_id] = vals
+        return result
+
+    def _order_task_result(self, task, duplicate=False):
+        if duplicate:
+            return {'success': True, 'message': 'La orden ya tenía una tarea', 'task_id': task.id, 'duplicate': True}
+        return {'success': True, 'message': 'Se creó la tarea correctamente', 'task_id': task.id}
+
+    # ------------------------------------------------------------------
+    # Tickets de preparación
+    # ------------------------------------------------------------------
+
+    @api.model
+    def _create_tasks_for_tickets(self, orders_data):
+        """
+        Crea o actualiza las tareas de preparación de una lista de tickets
+
+        Los tickets marcados con ``fan_out`` contienen la orden completa de un
+        TPV con sus cambios marcados: sus líneas se reparten en una sola pasada
+        entre todas las impresoras de tipo proyecto del TPV según sus
+        categorías (ver ``_fan_out_preparation_ticket``), y se crea una tarea
+        por estación dentro de la misma transacción.
+
+        :param orders_data: lista de diccionarios ``order_data``
+        :return: lista de resultados, uno por ticket y en el mismo orden
+        """
+        tickets = []
+        origins = []
+        fan_out_indexes = set()
+        results = [None] * len(orders_data)
+        for index, order_data in enumerate(orders_data):
+            if isinstance(order_data, dict) and order_data.get('fan_out'):
+                fan_out_indexes.add(index)
+                station_tickets = self._fan_out_preparation_ticket(order_data)
+                if not station_tickets:
+                    results[index] = {
+                        'success': True,
+                        'message': 'Ninguna estación de preparación recibe productos de este ticket',
+                        'task_ids': [],
+                    }
+                tickets.extend(station_tickets)
+                origins.extend([index] * len(station_tickets))
+            else:
+                tickets.append(order_data)
+                origins.append(index)
+
+        # Resolver nombres, atributos y precios del formato compacto en bloque
+        with metrics.timer('parse'):
+            self.env['pos.project.ticket']._resolve_order_data(tickets)
+
+        # Emitir antes los tickets agrupados ya vencidos de estas mismas órdenes y
+        # estaciones, para conservar el orden de sus cambios; los de las demás
+        # los emite la acción planificada
+        self.env['pos.project.ticket.buffer']._flush(keys=self._get_buffer_keys(tickets))
+
+        station_results = {}
+        for index, result in zip(origins, self._process_preparation_tickets(tickets)):
+            station_results.setdefault(index, []).append(result)
+
+        for index, index_results in station_results.items():
+            if index not in fan_out_indexes:
+                results[index] = index_results[0]
+                continue
+            failed = [result for result in index_results if not result['success']]
+            task_ids = [result['task_id'] for result in index_results if result.get('task_id')]
+            results[index] = {
+                'success': not failed,
+                'message': failed[0]['message'] if failed else 'Se procesaron las tareas de todas las estaciones',
+                'task_id': task_ids[0] if task_ids else False,
+                'task_ids': task_ids,
+            }
+        return results
+
+    @api.model
+    def _get_buffer_keys(self, orders_data):
+        """Órdenes y estaciones (``buffer_key``) de los tickets que indican las dos"""
+        Task = self.env['project.task']
+        keys = set()
+        for order_data in orders_data:
+            if not isinstance(order_data, dict) or not order_data.get('order_uid'):
+                continue
+            try:
+                printer_id = int(order_data.get('printer_id') or 0)
+            except (TypeError, ValueError):
+                continue
+            if printer_id:
+                keys.add(Task._pos_station_task_key(order_data['order_uid'], printer_id))
+        return keys
+
+    @api.model
+    def _fan_out_preparation_ticket(self, order_data):
+        """
+        Reparte las líneas de un ticket de orden completa entre las impresoras de
+        tipo proyecto del TPV, con una búsqueda por línea en la tabla de rutas y
+        una sola lectura de las categorías de todos los productos.
+
+        Las líneas llevan la cantidad de la orden (``qty``) y, las que
+        cambiaron, el tipo y la cantidad del cambio (``change_type``,
+        ``change_qty``). Solo reciben el ticket las estaciones con algún cambio
+        en sus productos: las que están en modo incremental, solo los cambios;
+        las demás, como al imprimir, la orden completa sin marcas de cambio y
+        como pedido nuevo, para que no se agrupe con otros cambios.
+
+        :param order_data: diccionario ``order_data`` con ``config_id``
+        :return: lista de tickets, uno por impresora que recibe alguna línea
+        """
+        try:
+            config_id = int(order_data.get('config_id') or 0)
+        except (TypeError, ValueError):
+            config_id = 0
+        if not config_id:
+            return []
+        routing = self.env['pos.config'].browse(config_id)._get_project_routing()
+        lines = [line for line in order_data.get('order_lines') or [] if isinstance(line, dict)]
+
+        product_ids = {line.get('product_id') for line in lines if isinstance(line.get('product_id'), int)}
+        product_ids.discard(0)
+        categories_by_product = {
+            product['id']: product['pos_categ_ids']
+            for product in self.env['product.product'].browse(product_ids).exists().read(['pos_categ_ids'])
+        }
+
+        lines_by_printer = {}
+        for line in lines:
+            printer_ids = {
+                printer_id
+                for categ_id in categories_by_product.get(line.get('product_id'), [])
+                for printer_id in routing['categories'].get(str(categ_id), ())
+            }
+            for printer_id in printer_ids:
+                lines_by_printer.setdefault(printer_id, []).append(line)
+
+        tickets = []
+        for printer_id, printer_lines in lines_by_printer.items():
+            if not any(line.get('change_type') for line in printer_lines):
+                continue
+            route = routing['printers'][str(printer_id)]
+            ticket = dict(order_data, printer_id=printer_id, project_id=route['project_id'])
+            if route['incremental']:
+                ticket['order_lines'] = [
+                    dict(line, qty=line.get('change_qty', line.get('qty')))
+                    for line in printer_lines if line.get('change_type')
+                ]
+            else:
+                ticket.update(is_new_order=True, is_change_order=False, is_added_order=False, order_lines=[
+                    dict(line, change_type=None) for line in printer_lines if _to_float(line.get('qty')) > 0
+                ])
+            if not ticket['order_lines']:
+                continue
+            ticket.pop('fan_out')
+            if order_data.get('request_key'):
+                ticket['request_key'] = f"{order_data['request_key']}:{printer_id}"
+            tickets.append(ticket)
+        return tickets
+
+    @api.model
+    def _process_preparation_tickets(self, orders_data, coalesced=False):
+        """
+        Crea o actualiza las tareas de preparación de una lista de tickets de
+        una sola estación
+
+        Los tickets de impresoras en modo incremental se añaden a la tarea ya
+        existente para la misma orden e impresora, localizada por su
+        ``pos_task_key``. Los tickets reenviados con una ``request_key`` ya
+        recibida devuelven la tarea existente sin crear otra. Los tickets de
+        cambios de un TPV con ventana de agrupación quedan en espera (ver
+        ``pos.project.ticket.buffer``).
+
+        :param orders_data: lista de diccionarios ``order_data``
+        :param coalesced: los tickets son ya el resultado de agrupar otros y no
+                          vuelven a quedar en espera
+        :return: lista de resultados, uno por ticket y en el mismo orden
+        """
+        start = time.perf_counter()
+        results = [None] * len(orders_data)
+        Task = self.env['project.task']
+
+        # Resolver las impresoras, desde la tabla de rutas en caché de cada TPV, y los proyectos
+        project_ids = {}
+        routes = {}
+        for index, order_data in enumerate(orders_data):
+            if not order_data or not isinstance(order_data, dict):
+                results[index] = {'success': False, 'message': 'No se proporcionaron datos de orden'}
+                continue
+            routes[index] = route = self._get_preparation_route(order_data)
+            project_id = self._get_preparation_project_id(order_data) or (route and route['project_id'])
+            if not project_id:
+                results[index] = {'success': False, 'message': 'No se proporcionó ID de proyecto'}
+                continue
+            project_ids[index] = project_id
+
+        # Descartar los tickets ya recibidos, en peticiones anteriores o repetidos en este lote
+        Ticket = self.env['pos.project.ticket']
+        request_keys = {
+            index: orders_data[index]['request_key']
+            for index in project_ids
+            if orders_data[index].get('request_key')
+        }
+        replayed = Ticket._get_task_ids_by_request_key(set(request_keys.values()))
+        repeated = {}
+        first_index_by_key = {}
+        for index, request_key in request_keys.items():
+            if request_key in replayed:
+                results[index] = self._replayed_ticket_result(replayed[request_key])
+                del project_ids[index]
+            elif request_key in first_index_by_key:
+                repeated[index] = first_index_by_key[request_key]
+                del project_ids[index]
+            else:
+                first_index_by_key[request_key] = index
+
+        # Validar todos los proyectos y las impresoras con una sola consulta cada uno
+        projects = self.env['project.project'].browse(set(project_ids.values())).exists()
+        projects_by_id = {project.id: project for project in projects}
+        for index, project_id in list(project_ids.items()):
+            if project_id not in projects_by_id:
+                results[index] = {'success': False, 'message': 'Proyecto no encontrado'}
+                del project_ids[index]
+
+
+        # Registrar los tickets, reservando sus claves de idempotencia, antes de crear nada
+        indexes = list(project_ids)
+        claimed = Ticket._claim([
+            Ticket._prepare_ticket_vals(orders_data[index], request_keys.get(index), routes[index])
+            for index in indexes
+        ])
+        tickets_by_index = {}
+        for index, ticket in zip(indexes, claimed):
+            if ticket:
+                tickets_by_index[index] = ticket
+            else:
+                results[index] = self._replayed_ticket_result(False)
+                del project_ids[index]
+
+        # Dejar en espera los tickets de cambios que se agrupan con los siguientes de su orden y estación
+        if not coalesced:
+            buffered = [
+                index for index in project_ids
+                if routes[index] and routes[index]['coalesce_seconds'] and orders_data[index].get('order_uid')
+                and (orders_data[index].get('is_change_order') or orders_data[index].get('is_added_order'))
+            ]
+            if buffered:
+                self.env['pos.project.ticket.buffer']._add([
+                    (tickets_by_index.pop(index), orders_data[index], routes[index]) for index in buffered
+                ])
+                for index in buffered:
+                    results[index] = {
+                        'success': True,
+                        'message': 'El ticket se agrupará con los siguientes cambios de la orden',
+                        'task_id': False,
+                        'buffered': True,
+                    }
+                    del project_ids[index]
+
+        # Localizar las tareas existentes de las impresoras en modo incremental
+        incremental_keys = {}
+        for index in project_ids:
+            route = routes[index]
+            if route and route['incremental'] and orders_data[index].get('order_uid'):
+                incremental_keys[index] = Task._pos_station_task_key(orders_data[index]['order_uid'], route['printer_id'])
+        tasks_by_key = {}
+        if incremental_keys:
+            existing_tasks = Task.with_context(active_test=False).search([
+                ('pos_task_key', 'in', list(set(incremental_keys.values()))),
+            ])
+            tasks_by_key = {task.pos_task_key: task for task in existing_tasks}
+
+        # Órdenes ya sincronizadas de los tickets, para vincular sus tareas
+        order_uids = {
+            orders_data[index]['order_uid'] for index in project_ids if orders_data[index].get('order_uid')
+        }
+        orders_by_uuid = {}
+        if order_uids:
+            orders_by_uuid = {
+                order['uuid']: order['id']
+                for order in self.env['pos.order'].search_read([('uuid', 'in', list(order_uids))], ['uuid'])
+            }
+
+        # Un ticket incremental cuya tarea ya existe, o se crea en este mismo lote, se añade a ella
+        to_create = []
+        pending_keys = set()
+        appends = []
+        for index in project_ids:
+            key = incremental_keys.get(index)
+            if key and (key in tasks_by_key or key in pending_keys):
+                appends.append((index, key))
+                continue
+            to_create.append((index, key))
+            if key:
+                pending_keys.add(key)
+
+        # Numerar las tareas nuevas con la secuencia de su estación y una sola
+        # marca de tiempo para las fechas límite de todo el lote
+        numbers = self._get_ticket_numbers([
+            self._get_ticket_station(orders_data[index], routes[index]) for index, _key in to_create
+        ])
+        now = datetime.now()
+        pending = []
+        vals_list = []
+        for (index, key), number in zip(to_create, numbers):
+            try:
+                task_vals = self._prepare_preparation_task_vals(
+                    orders_data[index], project_ids[index], routes[index], now, number=number,
+                )
+                task_vals['pos_order_id'] = orders_by_uuid.get(orders_data[index].get('order_uid'), False)
+                task_vals['pos_task_key'] = key or False
+                vals_list.append(task_vals)
+                pending.append((index, key))
+            except Exception as e:
+                _logger.error("Error al preparar la tarea de preparación %s: %s", index, str(e))
+                results[index] = {'success': False, 'message': str(e)}
+
+        # Las impresoras en modo rápido crean sus tareas sin la maquinaria de mail
+        created = self._create_task_batch(
+            vals_list, [bool(routes[index] and routes[index]['fast']) for index, _key in pending],
+        )
+        for (index, key), task in zip(pending, created):
+            if isinstance(task, Exception):
+                results[index] = {'success': False, 'message': str(task)}
+                continue
+            results[index] = self._preparation_task_result(task)
+            if key:
+                tasks_by_key.setdefault(key, task)
+
+        # Los tickets incrementales solo añaden sus líneas a la tarea existente
+        for index, key in appends:
+            task = tasks_by_key.get(key)
+            if task:
+                results[index] = dict(self._preparation_task_result(task), updated=True)
+            else:
+                results[index] = {'success': False, 'message': 'No se pudo crear la tarea de preparación'}
+
+        metrics.observe('create', time.perf_counter() - start)
+
+        # Guardar las líneas de los tickets en sus tareas y liberar las claves de los que fallaron
+        with metrics.timer('link'):
+            Ticket._link_tasks([
+                (ticket, orders_data[index], results[index]['success'] and results[index]['task_id'])
+                for index, ticket in tickets_by_index.items()
+            ])
+
+        # Avisar a las pantallas de cocina de las tareas nuevas o actualizadas
+        Task.browse({
+            results[index]['task_id'] for index in tickets_by_index if results[index]['success']
+        })._pos_kitchen_notify()
+
+        for index, first_index in repeated.items():
+            results[index] = dict(results[first_index], duplicate=True)
+
+        for index, result in enumerate(results):
+            if not result.get('duplicate') and not result.get('buffered'):
+                route = routes.get(index)
+                metrics.increment(
+                    'success' if result['success'] else 'failure',
+                    int(orders_data[index]['config_id']) if route else None,
+                    route and route['printer_id'],
+                )
+
+        return results
+
+    def _replayed_ticket_result(self, task_id):
+        return {
+            'success': True,
+            'message': 'El ticket ya había sido procesado',
+            'task_id': task_id,
+            'duplicate': True,
+        }
+
+    def _preparation_task_result(self, task):
+        return {
+            'success': True,
+            'message': 'Se creó la tarea de preparación correctamente',
+            'task_id': task.id
+        }
+
+    @api.model
+    def _get_preparation_project_id(self, order_data):
+        """Obtiene el ID del proyecto a partir de los datos de la orden de preparación."""
+        project_id = order_data.get('project_id')
+        if not project_id:
+            return None
+
+        # Intentar convertir a entero si es un diccionario
+        if isinstance(project_id, dict) and 'id' in project_id:
+            project_id = project_id['id']
+
+        # Intentar convertir a entero si es una cadena
+        if isinstance(project_id, str):
+            try:
+                project_id = int(project_id)
+            except ValueError:
+                _logger.warning("No se pudo convertir project_id a entero: %s", project_id)
+                return None
+
+        return project_id
+
+    @api.model
+    def _get_preparation_route(self, order_data):
+        """
+        Obtiene la ruta de la impresora que emitió el ticket desde la tabla de
+        rutas en caché del TPV, sin consultar la base de datos.
+
+        :return: diccionario con ``printer_id``, ``project_id``, ``stage_id``,
+                 ``incremental`` y ``fast``, o None si el ticket no indica un
+                 TPV y una impresora de tipo proyecto válidos
+        """
+        try:
+            config_id = int(order_data.get('config_id') or 0)
+            printer_id = int(order_data.get('printer_id') or 0)
+        except (TypeError, ValueError):
+            return None
+        if not config_id or not printer_id:
+            return None
+        route = self.env['pos.config'].browse(config_id)._get_project_printer_route(printer_id)
+        return route and dict(route, printer_id=printer_id)
+
+    @api.model
+    def _get_ticket_station(self, order_data, route):
+        """Estación que numera la tarea de un ticket: su impresora de preparación o, sin ella, su TPV"""
+        if route:
+            return self.env['pos.printer'].browse(route['printer_id'])
+        try:
+            config_id = int(order_data.get('config_id') or 0)
+        except (TypeError, ValueError):
+            return None
+        return self.env['pos.config'].browse(config_id) if config_id else None
+
+    @api.model
+    def _prepare_preparation_task_vals(self, order_data, project_id, route=None, now=None, number=False):
+        """
+        Prepara los valores de creación de una tarea de preparación
+
+        :param order_data: Diccionario con los datos del ticket
+        :param project_id: ID del proyecto ya validado
+        :param route: Ruta de la impresora que emitió el ticket, si se conoce
+        :param now: marca de tiempo del lote
+        :param number: número de ticket de la secuencia de la estación
+        :return: Diccionario de valores para project.task
+        """
+        now = now or datetime.now()
+        order_name = order_data.get('name') or ''
+        reference = self._get_order_reference(order_name)
+        task_vals = {
+            'name': self._get_task_name(
+                reference, number, order_name or _('Ticket POS'),
+                reprint=order_data.get('reprint') or '(Reimpresión)' in order_name,
+                added=order_data.get('is_added_order') or '(Agregado)' in order_name,
+            ),
+            'pos_order_reference': reference,
+            'pos_ticket_number': number,
+            'project_id': project_id,
+            'partner_id': (order_data.get('customer') or {}).get('id', False),
+            'pos_order_uuid': order_data.get('order_uid') or False,
+            'pos_printer_id': route['printer_id'] if route else False,
+        }
+        if route and route['stage_id']:
+            task_vals['stage_id'] = route['stage_id']
+
+        # Añadir responsable y fecha límite según la versión de Odoo
+        Task = self.env['project.task']
+        task_vals.update(Task._pos_assignee_vals(self.env.user))
+        task_vals.update(Task._pos_deadline_vals(now.date()))
+        return task_vals
+
+    # ------------------------------------------------------------------
+    # Comunes
+    # ------------------------------------------------------------------
+
+    @api.model
+    def _get_order_reference(self, order_name):
+        """Referencia del recibo ("00001-001-0001") contenida en el nombre de la orden, o False"""
+        match = ORDER_REF_RE.search(order_name or '')
+        return match.group(1) if match else False
+
+    @api.model
+    def _get_task_name(self, reference, number, fallback, reprint=False, added=False):
+        """
+        Nombre de la tarea: "Order" con la referencia del recibo o, si no la
+        tiene, con el número de ticket de la estación; ``fallback`` si no tiene
+        ninguno. Incluye los indicadores de reimpresión y de pedido agregado.
+        """
+        task_name = f"Order {reference or number}" if reference or number else fallback
+        if reprint:
+            task_name += " (Reimpresión)"
+        if added:
+            task_name += " (Agregado)"
+        return task_name
+
+    @api.model
+    def _get_ticket_numbers(self, stations):
+        """
+        Números de ticket de las tareas, de la secuencia de su estación
+        (impresora de preparación o TPV), con una consulta por estación
+
+        :param stations: lista con la estación de cada tarea, o None
+        :return: lista con el número de cada tarea, o False si no tiene estación
+        """
+        numbers = [False] * len(stations)
+        positions_by_station = {}
+        for position, station in enumerate(stations):
+            if station:
+                positions_by_station.setdefault(station, []).append(position)
+        for station, positions in positions_by_station.items():
+            if not station.exists():
+                continue
+            sequence = self._get_station_sequence(station)
+            for position, number in zip(positions, self._next_sequence_numbers(sequence, len(positions))):
+                numbers[position] = number
+        return numbers
+
+    @api.model
+    def _get_station_sequence(self, station):
+        """
+        Secuencia de tickets de una estación, creada con su primera tarea. Es
+        estándar (``no_gap`` desactivado): cada número sale de una secuencia de
+        PostgreSQL sin bloquear la fila, a costa de posibles huecos.
+
+        Si dos workers crean a la vez la primera tarea de una estación, la
+        escritura del segundo falla por la actualización concurrente y Odoo
+        repite la petición, que ya encuentra la secuencia.
+        """
+        station = station.sudo()
+        if not station.project_sequence_id:
+            station.project_sequence_id = self.env['ir.sequence'].sudo().create({
+                'name': _('Tickets de proyecto: %s', station.display_name),
+                'implementation': 'standard',
+                'prefix': TICKET_NUMBER_PREFIX,
+                'padding': TICKET_NUMBER_PADDING,
+            })
+        return station.project_sequence_id
+
+    @api.model
+    def _next_sequence_numbers(self, sequence, count):
+        """``count`` números consecutivos de la secuencia, pedidos en una sola consulta"""
+        sequence = sequence.sudo()
+        if sequence.implementation != 'standard' or sequence.use_date_range:
+            return [sequence.next_by_id() for _index in range(count)]
+        self.env.cr.execute(
+            "SELECT nextval(%s) FROM generate_series(1, %s)", ('ir_sequence_%03d' % sequence.id, count),
+        )
+        return [sequence.get_next_char(row[0]) for row in self.env.cr.fetchall()]
+
+    @api.model
+    def _create_task_batch(self, vals_list, fast, skip_conflicts=False):
+        """
+        Crea las tareas con un ``create`` por modo (rápido o normal) y, si falla,
+        una a una para aislar el error.
+
+        La unicidad de las tareas con ``pos_task_key`` la garantiza su índice
+        único. Si otro worker crea la misma tarea después de la instantánea de
+        esta transacción, la inserción espera a que confirme y falla por la
+        clave duplicada; como la tarea no es visible en esta instantánea, se
+        lanza ``ConcurrencyError`` para que Odoo repita la petición, que
+        entonces encuentra la tarea.
+
+        :param vals_list: valores de creación de las tareas
+        :param fast: lista con el modo rápido de cada tarea
+        :param skip_conflicts: en lugar de lanzar ``ConcurrencyError``, devolver
+                               None para las tareas creadas en paralelo
+        :return: lista con la tarea creada, None o la excepción de cada valor,
+                 en el mismo orden
+        """
+        Task = self.env['project.task']
+        tasks = [None] * len(vals_list)
+        if not vals_list:
+            return tasks
+        try:
+            with self.env.cr.savepoint():
+                for flag in set(fast):
+                    positions = [position for position, value in enumerate(fast) if value == flag]
+                    group = Task._with_pos_fast_context(flag).create([vals_list[position] for position in positions])
+                    for position, task in zip(positions, group):
+                        tasks[position] = task
+            return tasks
+        except Exception as e:
+            # Si falla la creación masiva, reintentar tarea a tarea para aislar el error
+            _logger.warning("Error en la creación masiva de tareas, reintentando una a una: %s", str(e))
+
+        for position, (vals, flag) in enumerate(zip(vals_list, fast)):
+            try:
+                with self.env.cr.savepoint():
+                    tasks[position] = Task._with_pos_fast_context(flag).create(vals)
+            except UniqueViolation as e:
+                if not skip_conflicts:
+                    raise ConcurrencyError(f"Tarea POS creada en paralelo: {vals.get('pos_task_key')}") from e
+                tasks[position] = None
+            except Exception as e:
+                _logger.error("Error al crear la tarea POS %s: %s", vals.get('name'), str(e))
+                tasks[position] = e
+        return tasks
@@ -0,0 +1,353 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+import uuid
+
+from odoo import api, fields, models
+
+from ..tools.task_description import format_qty
+
+CHANGE_TYPES = [
+    ('new', 'Nuevo'),
+    ('cancelled', 'Cancelado'),
+    ('note_only', 'Solo nota'),
+]
+
+
+def _to_int(value):
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _to_float(value, default=0.0):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class PosProjectTicket(models.Model):
+    _name = 'pos.project.ticket'
+    _description = 'Ticket de preparación recibido del POS'
+    _order = 'id desc'
+    _rec_name = 'request_key'
+
+    request_key = fields.Char(string='Clave de idempotencia', required=True, readonly=True, copy=False)
+    task_id = fields.Many2one('project.task', string='Tarea', readonly=True, index='btree_not_null', ondelete='cascade')
+    order_uuid = fields.Char(string='UUID de la orden POS', readonly=True)
+    printer_id = fields.Many2one('pos.printer', string='Impresora de preparación', readonly=True, ondelete='set null')
+    name = fields.Char(string='Orden', readonly=True)
+    table_name = fields.Char(string='Mesa', readonly=True)
+    server_name = fields.Char(string='Camarero', readonly=True)
+    customer_name = fields.Char(string='Cliente', readonly=True)
+    note = fields.Text(string='Nota general', readonly=True)
+    kind = fields.Selection([
+        ('new', 'Nuevo pedido'),
+        ('added', 'Pedido agregado'),
+        ('change', 'Cambio en el pedido'),
+    ], string='Tipo', readonly=True)
+    line_ids = fields.One2many('pos.project.ticket.line', 'ticket_id', string='Líneas', readonly=True)
+
+    _sql_constraints = [
+        ('request_key_uniq', 'unique(request_key)', 'La clave de idempotencia del ticket debe ser única.'),
+    ]
+
+    # Columnas que registra _claim, con su tipo SQL
+    _CLAIM_COLUMNS = [
+        ('request_key', 'varchar'),
+        ('order_uuid', 'varchar'),
+        ('printer_id', 'int'),
+        ('name', 'varchar'),
+        ('table_name', 'varchar'),
+        ('server_name', 'varchar'),
+        ('customer_name', 'varchar'),
+        ('note', 'text'),
+        ('kind', 'varchar'),
+    ]
+
+    @api.model
+    def _prepare_ticket_vals(self, order_data, request_key=None, route=None):
+        """Valores de cabecera del ticket a partir de los datos enviados por el POS"""
+        if order_data.get('is_change_order'):
+            kind = 'change'
+        elif order_data.get('is_added_order'):
+            kind = 'added'
+        else:
+            kind = 'new'
+        return {
+            'request_key': request_key,
+            'order_uuid': order_data.get('order_uid'),
+            'printer_id': route and route['printer_id'],
+            'name': order_data.get('name'),
+            'table_name': order_data.get('table') and str(order_data['table']),
+            'server_name': order_data.get('server') and str(order_data['server']),
+            'customer_name': (order_data.get('customer') or {}).get('name'),
+            'note': order_data.get('note'),
+            'kind': kind,
+        }
+
+    @api.model
+    def _resolve_order_data(self, orders_data):
+        """
+        Completa en el servidor los tickets en formato compacto: el POS solo
+        envía IDs de producto, de atributos y de línea, cantidades, notas,
+        extras y el precio unitario con impuestos de cada línea (con la tarifa,
+        la posición fiscal y el descuento de la orden), y los nombres y
+        atributos se leen aquí en bloque, con un número fijo de consultas para
+        todo el lote. Las líneas ya sincronizadas toman el nombre y el precio
+        de la orden.
+
+        Las líneas hijas de un combo se agrupan en su línea padre cuando ambas
+        viajan en el mismo ticket.
+
+        :param orders_data: lista de diccionarios ``order_data``; se modifican
+                            en el sitio
+        """
+        orders_data = [order_data for order_data in orders_data if isinstance(order_data, dict)]
+        lines = [
+            line
+            for order_data in orders_data
+            for line in order_data.get('order_lines') or []
+            if isinstance(line, dict)
+        ]
+
+        # Líneas ya sincronizadas: nombre completo y precio reales de la orden
+        OrderLine = self.env['pos.order.line']
+        line_uuids = {line['uuid'] for line in lines if line.get('uuid')}
+        synced = {}
+        if line_uuids and 'uuid' in OrderLine._fields:
+            synced = {
+                values['uuid']: values
+                for values in OrderLine.search_read(
+                    [('uuid', 'in', list(line_uuids))],
+                    ['uuid', 'full_product_name', 'qty', 'price_subtotal_incl', 'attribute_value_ids'],
+                    load=None,
+                )
+            }
+
+        product_ids = {_to_int(line.get('product_id')) for line in lines} - {0}
+        product_names = {
+            product['id']: product['display_name']
+            for product in self.env['product.product'].browse(product_ids).exists().read(['display_name'])
+        }
+
+        attribute_ids = {
+            value_id
+            for line in lines
+            for value_id in (synced.get(line.get('uuid'), {}).get('attribute_value_ids') or line.get('attribute_value_ids') or [])
+            if isinstance(value_id, int)
+        }
+        attribute_names = {
+            value.id: value.name
+            for value in self.env['product.template.attribute.value'].browse(attribute_ids).exists()
+        }
+
+        partner_ids = {
+            _to_int(order_data.get('customer_id') or (order_data.get('customer') or {}).get('id'))
+            for order_data in orders_data
+        } - {0}
+        partner_names = {partner.id: partner.name for partner in self.env['res.partner'].browse(partner_ids).exists()}
+
+        for order_data in orders_data:
+            partner_id = _to_int(order_data.pop('customer_id', None) or (order_data.get('customer') or {}).get('id'))
+            order_data['customer'] = {'id': partner_id, 'name': partner_names[partner_id]} if partner_id in partner_names else False
+
+            resolved = []
+            by_uuid = {}
+            for line in order_data.get('order_lines') or []:
+                if not isinstance(line, dict):
+                    continue
+                product_id = _to_int(line.get('product_id'))
+                if product_id not in product_names:
+                    product_id = 0
+                qty = _to_float(line.get('qty'), 1.0)
+                synced_line = synced.get(line.get('uuid'))
+                if synced_line and synced_line['qty']:
+                    name = synced_line['full_product_name'] or product_names.get(product_id, '')
+                    price = synced_line['price_subtotal_incl'] / synced_line['qty'] * abs(qty)
+                    value_ids = synced_line['attribute_value_ids']
+                else:
+                    # Sin producto conocido solo se conserva el nombre enviado
+                    name = product_names.get(product_id) or line.get('product_name') or ''
+                    price = _to_float(line.get('price_unit')) * abs(qty)
+                    value_ids = line.get('attribute_value_ids') or []
+                sides = line.get('sides') if isinstance(line.get('sides'), list) else []
+                values = {
+                    'product_id': product_id or False,
+                    'product_name': name,
+                    'qty': qty,
+                    'price': price,
+                    'note': line.get('note') or '',
+                    'change_type': line.get('change_type'),
+                    'attributes': [
+                        attribute_names[value_id] for value_id in value_ids
+                        if isinstance(value_id, int) and value_id in attribute_names
+                    ],
+                    'combo_items': [],
+                    'sides': [side for side in sides if isinstance(side, str) and side],
+                }
+                parent = by_uuid.get(line.get('combo_parent_uuid'))
+                if parent is not None:
+                    parent['combo_items'].append(f"{format_qty(qty)}x {name}")
+                    continue
+                if line.get('uuid'):
+                    by_uuid[line['uuid']] = values
+                resolved.append(values)
+            order_data['order_lines'] = resolved
+
+    @api.model
+    def _get_task_ids_by_request_key(self, request_keys):
+        """Devuelve {clave: id de tarea} de los tickets ya recibidos con esas claves"""
+        if not request_keys:
+            return {}
+        tickets = self.search_read([('request_key', 'in', list(request_keys))], ['request_key', 'task_id'], load=None)
+        return {ticket['request_key']: ticket['task_id'] for ticket in tickets}
+
+    @api.model
+    def _claim(self, vals_list):
+        """
+        Registra los tickets reservando sus claves de idempotencia con un único
+        ``INSERT ... ON CONFLICT DO NOTHING``. Las claves que ya pertenecen a otro
+        ticket no se devuelven; si ese ticket es de una transacción concurrente
+        PostgreSQL aborta con un error de serialización y Odoo reintenta la
+        petición, que entonces encuentra el ticket existente.
+
+        :param vals_list: lista de diccionarios de :meth:`_prepare_ticket_vals`;
+                          se genera una clave para los que no la traen
+        :return: lista paralela a ``vals_list`` con el ticket reservado o un
+                 recordset vacío si la clave ya existía
+        """
+        if not vals_list:
+            return []
+        keys = [vals.get('request_key') or str(uuid.uuid4()) for vals in vals_list]
+        columns = [name for name, _type in self._CLAIM_COLUMNS]
+        arrays = {name: [vals.get(name) or None for vals in vals_list] for name in columns}
+        arrays['request_key'] = keys
+        self.env.cr.execute(f"""
+            INSERT INTO pos_project_ticket ({', '.join(columns)},
+                                            create_uid, write_uid, create_date, write_date)
+                 SELECT t.*, %(uid)s, %(uid)s, now() at time zone 'UTC', now() at time zone 'UTC'
+                   FROM unnest({', '.join(f'%({name})s::{sql_type}[]' for name, sql_type in self._CLAIM_COLUMNS)})
+                        AS t({', '.join(columns)})
+            ON CONFLICT (request_key) DO NOTHING
+              RETURNING id, request_key
+        """, dict(arrays, uid=self.env.uid))
+        ids_by_key = {key: ticket_id for ticket_id, key in self.env.cr.fetchall()}
+        return [self.browse(ids_by_key.get(key, [])) for key in keys]
+
+    @api.model
+    def _link_tasks(self, items):
+        """
+        Vincula los tickets con sus tareas y guarda sus líneas normalizadas con un
+        único ``create``. Los tickets sin tarea se eliminan para liberar su clave
+        y permitir que el POS los reenvíe.
+
+        :param items: lista de tuplas ``(ticket, order_data, task_id o False)``
+        """
+        failed = self.browse()
+        ticket_ids_by_task = {}
+        line_vals_list = []
+        for ticket, order_data, task_id in items:
+            if not task_id:
+                failed |= ticket
+                continue
+            ticket_ids_by_task.setdefault(task_id, []).append(ticket.id)
+            line_vals_list.extend(
+                self.env['pos.project.ticket.line']._prepare_line_vals(line, ticket.id, task_id)
+                for line in order_data.get('order_lines') or []
+            )
+        for task_id, ticket_ids in ticket_ids_by_task.items():
+            self.browse(ticket_ids).write({'task_id': task_id})
+        if line_vals_list:
+            self.env['pos.project.ticket.line'].create(line_vals_list)
+        failed.unlink()
+
+    def _get_render_data(self):
+        """Reconstruye los datos del ticket con la forma que esperan los renderizadores"""
+        self.ensure_one()
+        return {
+            'customer': {'name': self.customer_name} if self.customer_name else False,
+            'table': self.table_name,
+            'server': self.server_name,
+            'note': self.note,
+            'is_change_order': self.kind == 'change',
+            'is_added_order': self.kind == 'added',
+            'order_lines': [line._get_render_data() for line in self.line_ids.sorted('id')],
+        }
+
+
+class PosProjectTicketLine(models.Model):
+    _name = 'pos.project.ticket.line'
+    _description = 'Línea de ticket de preparación'
+    _order = 'ticket_id, id'
+
+    ticket_id = fields.Many2one('pos.project.ticket', string='Ticket', required=True, index=True, ondelete='cascade')
+    task_id = fields.Many2one('project.task', string='Tarea', required=True, index=True, ondelete='cascade')
+    product_id = fields.Many2one('product.product', string='Producto', index='btree_not_null', ondelete='set null')
+    product_name = fields.Char(string='Nombre del producto')
+    qty = fields.Float(string='Cantidad', digits='Product Unit of Measure')
+    price = fields.Float(string='Precio')
+    note = fields.Text(string='Nota')
+    change_type = fields.Selection(CHANGE_TYPES, string='Tipo de cambio')
+    # Listas de nombres separados por saltos de línea
+    sides = fields.Text(string='Extras')
+    combo_items = fields.Text(string='Combo')
+    attributes = fields.Text(string='Atributos')
+
+    @api.model
+    def _prepare_line_vals(self, line, ticket_id, task_id):
+        """Normaliza una línea del ticket enviada por el POS"""
+        product_id = line.get('product_id')
+        try:
+            qty = float(line.get('qty', 1))
+        except (TypeError, ValueError):
+            qty = 1.0
+        try:
+            price = float(line.get('price') or 0.0)
+        except (TypeError, ValueError):
+            price = 0.0
+        return {
+            'ticket_id': ticket_id,
+            'task_id': task_id,
+            'product_id': product_id if isinstance(product_id, int) and product_id > 0 else False,
+            'product_name': line.get('product_name'),
+            'qty': qty,
+            'price': price,
+            'note': line.get('note') or False,
+            'change_type': line.get('change_type') if line.get('change_type') in dict(CHANGE_TYPES) else False,
+            'sides': self._join_names(line.get('sides'), 'name', 'product_name'),
+            'combo_items': self._join_names(line.get('combo_items'), quantity=True),
+            'attributes': self._join_names(line.get('attributes')),
+        }
+
+    @api.model
+    def _join_names(self, items, *keys, quantity=False):
+        if not items:
+            return False
+        if not isinstance(items, list):
+            return str(items)
+        names = []
+        for item in items:
+            if isinstance(item, str):
+                names.append(item)
+            elif isinstance(item, dict):
+                name = item.get('name') or next((item[key] for key in keys if item.get(key)), None)
+                if name:
+                    names.append(f"{item.get('quantity', 1)}x {name}" if quantity else name)
+        return '\n'.join(names) or False
+
+    def _get_render_data(self):
+        self.ensure_one()
+        return {
+            'product_id': self.product_id.id,
+            'product_name': self.product_name,
+            'qty': self.qty,
+            'price': self.price,
+            'note': self.note or '',
+            'change_type': self.change_type or None,
+            'sides': self.sides.split('\n') if self.sides else [],
+            'combo_items': self.combo_items.split('\n') if self.combo_items else [],
+            'attributes': self.attributes.split('\n') if self.attributes else [],
+        }
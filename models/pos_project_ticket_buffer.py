@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+from datetime import timedelta
+import logging
+
+from odoo import api, fields, models
+from odoo.exceptions import ConcurrencyError
+
+_logger = logging.getLogger(__name__)
+
+# Espera antes de reintentar un grupo cuyo ticket agrupado no se pudo procesar
+RETRY_SECONDS = 60
+
+
+class PosProjectTicketBuffer(models.Model):
+    _name = 'pos.project.ticket.buffer'
+    _description = 'Ticket de cambios en espera de agruparse'
+    _order = 'flush_after, id'
+
+    buffer_key = fields.Char(string='Orden y estación', required=True, readonly=True, index=True)
+    ticket_id = fields.Many2one('pos.project.ticket', string='Ticket', required=True, readonly=True, ondelete='cascade')
+    order_data = fields.Json(string='Datos del ticket', required=True, readonly=True)
+    flush_after = fields.Datetime(string='Emitir a partir de', required=True, readonly=True, index=True)
+    # Usuario que envió el ticket: responsable de la tarea del ticket agrupado
+    user_id = fields.Many2one('res.users', string='Usuario', readonly=True, ondelete='set null')
+
+    @api.model
+    def _add(self, items):
+        """
+        Deja en espera los tickets de cambios. La ventana de cada orden y
+        estación empieza con su primer ticket en espera, de modo que una ráfaga
+        de cambios no retrasa indefinidamente la tarea.
+
+        :param items: lista de tuplas ``(ticket, order_data, ruta)`` con la ruta
+                      de la impresora, que incluye ``coalesce_seconds``
+        """
+        Task = self.env['project.task']
+        keys = [Task._pos_station_task_key(order_data['order_uid'], route['printer_id']) for _ticket, order_data, route in items]
+        flush_after_by_key = {}
+        for row in self.search_read([('buffer_key', 'in', list(set(keys)))], ['buffer_key', 'flush_after'], order='flush_after'):
+            flush_after_by_key.setdefault(row['buffer_key'], row['flush_after'])
+        now = fields.Datetime.now()
+        vals_list = []
+        for key, (ticket, order_data, route) in zip(keys, items):
+            flush_after = flush_after_by_key.setdefault(key, now + timedelta(seconds=route['coalesce_seconds']))
+            vals_list.append({
+                'buffer_key': key,
+                'ticket_id': ticket.id,
+                'order_data': order_data,
+                'flush_after': flush_after,
+                'user_id': self.env.uid,
+            })
+        buffers = self.create(vals_list)
+        self.env.ref('pos_project_integration.ir_cron_flush_ticket_buffers')._trigger(min(buffers.mapped('flush_after')))
+        return buffers
+
+    @api.model
+    def _cron_flush(self):
+        self._flush()
+
+    @api.model
+    def _flush(self, keys=None, force=False):
+        """
+        Emite como un solo ticket los tickets en espera de cada orden y estación
+        cuya ventana ha vencido, o todos con ``force``. Las filas se bloquean con
+        ``SKIP LOCKED`` para que dos workers no emitan el mismo grupo.
+
+        La tarea de cada ticket agrupado se crea en nombre del usuario que envió
+        su último ticket, y los grupos de cada usuario se procesan en su propio
+        punto de guardado, de modo que un grupo que falla no afecta al resto.
+
+        :param keys: emitir solo los grupos de estas órdenes y estaciones
+                     (``buffer_key``); por defecto todos
+        :return: número de tickets agrupados emitidos
+        """
+        if keys is not None and not keys:
+            return 0
+        self.flush_model()
+        self.env.cr.execute("""
+            SELECT id
+              FROM pos_project_ticket_buffer
+             WHERE buffer_key IN (
+                       SELECT buffer_key
+                         FROM pos_project_ticket_buffer
+                        WHERE (%(force)s OR flush_after <= (now() at time zone 'UTC'))
+                          AND (%(all_keys)s OR buffer_key = ANY(%(keys)s)))
+             ORDER BY id
+               FOR UPDATE SKIP LOCKED
+        """, {'force': force, 'all_keys': keys is None, 'keys': list(keys or [])})
+        buffers = self.browse([row[0] for row in self.env.cr.fetchall()])
+        if not buffers:
+            return 0
+
+        groups = list(buffers.grouped('buffer_key').values())
+        merged = [self._merge_order_data(group.mapped('order_data')) for group in groups]
+        emit = [(group, order_data) for group, order_data in zip(groups, merged) if order_data['order_lines']]
+
+        emit_by_user = {}
+        for group, order_data in emit:
+            emit_by_user.setdefault(group[-1].user_id, []).append((group, order_data))
+        emitted = []
+        for user, user_emit in emit_by_user.items():
+            Service = self.env['pos.project.task.service'].with_user(user or self.env.user).sudo()
+            orders_data = [order_data for _group, order_data in user_emit]
+            try:
+                with self.env.cr.savepoint():
+                    results = Service._process_preparation_tickets(orders_data, coalesced=True)
+            except ConcurrencyError:
+                raise
+            except Exception as e:
+                _logger.warning("Error al emitir los tickets agrupados: %s", str(e))
+                results = [{'success': False, 'message': str(e)}] * len(orders_data)
+            emitted.extend(zip(user_emit, results))
+
+        done = buffers
+        for (group, _order_data), result in emitted:
+            if result['success']:
+                # Las reimpresiones de los tickets originales devuelven la tarea del ticket
+                # agrupado; sin líneas propias, la comanda y la cocina no los muestran
+                group.ticket_id.write({'task_id': result.get('task_id') or False})
+            else:
+                _logger.warning("No se pudo emitir el ticket agrupado %s: %s", group[0].buffer_key, result['message'])
+                group.write({'flush_after': fields.Datetime.now() + timedelta(seconds=RETRY_SECONDS)})
+                done -= group
+        done.unlink()
+        return len(emit)
+
+    @api.model
+    def _merge_order_data(self, orders_data):
+        """
+        Agrupa los tickets de cambios de una orden y estación en uno solo. La
+        cabecera es la del último ticket; las líneas del mismo producto, con los
+        mismos atributos, combo, extras y nota se suman como variaciones de
+        cantidad (las canceladas restan) y las que se anulan desaparecen.
+
+        :param orders_data: tickets ya resueltos, del más antiguo al más reciente
+        :return: diccionario ``order_data`` del ticket agrupado
+        """
+        merged_lines = {}
+        for order_data in orders_data:
+            for line in order_data.get('order_lines') or []:
+                key = (
+                    line.get('product_id'),
+                    line.get('product_name'),
+                    tuple(line.get('attributes') or ()),
+                    tuple(line.get('combo_items') or ()),
+                    tuple(line.get('sides') or ()),
+                    line.get('note') or '',
+                )
+                qty = abs(line.get('qty') or 0.0)
+                entry = merged_lines.setdefault(key, {'line': line, 'delta': 0.0, 'unit_price': 0.0, 'note_only': False})
+                if line.get('change_type') == 'note_only':
+                    entry['note_only'] = True
+                    continue
+                entry['delta'] += -qty if line.get('change_type') == 'cancelled' else qty
+                if qty and line.get('price'):
+                    entry['unit_price'] = line['price'] / qty
+
+        lines = []
+        for entry in merged_lines.values():
+            delta = entry['delta']
+            if delta:
+                change_type = 'new' if delta > 0 else 'cancelled'
+                qty = abs(delta)
+            elif entry['note_only']:
+                change_type = 'note_only'
+                qty = abs(entry['line'].get('qty') or 0.0)
+            else:
+                continue
+            lines.append(dict(entry['line'], qty=qty, price=entry['unit_price'] * qty, change_type=change_type))
+
+        result = dict(orders_data[-1], order_lines=lines, request_key=False)
+        result['is_change_order'] = any(order_data.get('is_change_order') for order_data in orders_data)
+        result['is_added_order'] = any(order_data.get('is_added_order') for order_data in orders_data)
+        result['is_new_order'] = False
+        return result
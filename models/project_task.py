@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+from datetime import datetime, time
+import re
+
+from odoo import api, fields, models, tools, Command
+from odoo.osv import expression
+from odoo.tools import frozendict
+from odoo.tools.sql import create_index
+
+from ..tools import metrics, task_description
+
+# Subcanal del bus por proyecto al que se suscriben las pantallas de cocina
+KITCHEN_CHANNEL = 'pos_project_kitchen'
+# Contexto de creación de las tareas en modo rápido: sin seguimiento, mensajes,
+# seguidores (ni el usuario ni el cliente) ni correos de asignación
+FAST_TASK_CONTEXT = {
+    'tracking_disable': True,
+    'mail_create_nolog': True,
+    'mail_create_nosubscribe': True,
+    'mail_notrack': True,
+    'mail_auto_subscribe_no_notify': True,
+}
+# Referencia del recibo ("Order 00001-001-0001") o número de ticket ("250317-0042") buscado
+POS_REFERENCE_RE = re.compile(r'\s*(?:order\s+)?(\d+(?:-\d+)+)\b', re.IGNORECASE)
+# Estados que cierran la tarea, en las versiones de Odoo que los tienen
+CLOSED_TASK_STATES = ('1_done', '1_canceled')
+KITCHEN_LINE_FIELDS = ['task_id', 'product_id', 'product_name', 'qty', 'note', 'change_type', 'sides', 'combo_items', 'attributes']
+
+
+class ProjectTask(models.Model):
+    _inherit = 'project.task'
+
+    pos_order_uuid = fields.Char(string='UUID de la orden POS', readonly=True, copy=False)
+    pos_printer_id = fields.Many2one('pos.printer', string='Impresora de preparación', readonly=True, copy=False, ondelete='set null')
+    pos_order_id = fields.Many2one('pos.order', string='Orden POS', readonly=True, copy=False, index='btree_not_null', ondelete='set null')
+    # Clave de las tareas que deben ser únicas: la de la orden y la de cada estación en modo incremental
+    pos_task_key = fields.Char(string='Clave de tarea POS', readonly=True, copy=False)
+    # Referencia del recibo y número de ticket de la estación, para localizar
+    # las tareas por igualdad sobre un índice en lugar de por su nombre
+    pos_order_reference = fields.Char(string='Referencia POS', readonly=True, copy=False, index='btree_not_null')
+    pos_ticket_number = fields.Char(string='Número de ticket POS', readonly=True, copy=False, index='btree_not_null')
+    pos_reference_search = fields.Char(
+        string='Referencia o ticket POS', compute='_compute_pos_reference_search', search='_search_pos_reference',
+    )
+    pos_ticket_ids = fields.One2many('pos.project.ticket', 'task_id', string='Tickets POS', readonly=True)
+    pos_ticket_line_ids = fields.One2many('pos.project.ticket.line', 'task_id', string='Líneas POS', readonly=True)
+    pos_ticket_html = fields.Html(string='Comanda', compute='_compute_pos_ticket_html', sanitize=False)
+
+    _sql_constraints = [
+        ('pos_task_key_uniq', 'unique(pos_task_key)', 'Ya existe una tarea para esta orden y estación.'),
+    ]
+
+    def init(self):
+        super().init()
+        # Localiza la tarea de una orden e impresora sin recorrer la tabla
+        create_index(
+            self.env.cr, 'project_task_pos_order_printer_idx', self._table,
+            ['pos_order_uuid', 'pos_printer_id'], where='pos_order_uuid IS NOT NULL',
+        )
+        # Cursor de las pantallas de cocina: rango por proyecto ordenado por
+        # (write_date, id), que devuelve también las tareas que salen de las
+        # etapas abiertas para que la pantalla las retire
+        create_index(
+            self.env.cr, 'project_task_pos_kitchen_cursor_idx', self._table,
+            ['project_id', 'write_date', 'id'], where='pos_order_uuid IS NOT NULL',
+        )
+
+    def write(self, vals):
+        res = super().write(vals)
+        if ('stage_id' in vals or 'active' in vals) and not self.env.context.get('pos_project_no_notify'):
+            self.filtered('pos_order_uuid')._pos_kitchen_notify()
+        return res
+
+    def _compute_pos_reference_search(self):
+        for task in self:
+            task.pos_reference_search = task.pos_order_reference or task.pos_ticket_number
+
+    def _search_pos_reference(self, operator, value):
+        """
+        Busca por la referencia del recibo o el número de ticket con igualdad,
+        aceptando el texto del nombre de la tarea ("Order 250317-0042").
+        """
+        reference = self._parse_pos_reference(value)
+        if not reference:
+            return expression.TRUE_DOMAIN if operator in expression.NEGATIVE_TERM_OPERATORS else expression.FALSE_DOMAIN
+        domain = ['|', ('pos_order_reference', '=', reference), ('pos_ticket_number', '=', reference)]
+        if operator in expression.NEGATIVE_TERM_OPERATORS:
+            return ['!'] + domain
+        return domain
+
+    @api.model
+    def _parse_pos_reference(self, value):
+        """Referencia o número de ticket contenido al inicio de ``value``, o None"""
+        match = isinstance(value, str) and POS_REFERENCE_RE.match(value)
+        return match.group(1) if match else None
+
+    @api.model
+    def _name_search(self, name, domain=None, operator='ilike', limit=100, order=None):
+        # Las tareas del POS se buscan por sus columnas indexadas; si ninguna
+        # coincide, se sigue con la búsqueda por nombre
+        if operator in ('=', 'ilike', '=ilike', 'like', '=like') and self._parse_pos_reference(name):
+            task_ids = list(self._search(
+                expression.AND([domain or [], self._search_pos_reference('=', name)]), limit=limit, order=order,
+            ))
+            if task_ids:
+                return task_ids
+        return super()._name_search(name, domain, operator, limit, order)
+
+    def _compute_pos_ticket_html(self):
+        """
+        Renderiza la comanda a partir de los tickets y líneas guardados solo cuando
+        se muestra la tarea. El primer ticket genera la comanda completa y los
+        siguientes se añaden como secciones de cambios. Los tickets de cambios
+        agrupados en otro (ver ``pos.project.ticket.buffer``) no tienen líneas
+        y no se muestran.
+        """
+        tickets = self.env['pos.project.ticket'].sudo().search(
+            [('task_id', 'in', self.ids), ('line_ids', '!=', False)], order='id',
+        )
+        tickets.line_ids.fetch(['product_id', 'product_name', 'qty', 'price', 'note', 'change_type', 'sides', 'combo_items', 'attributes'])
+        tickets_by_task = {}
+        for ticket in tickets:
+            tickets_by_task.setdefault(ticket.task_id.id, []).append(ticket)
+        labels = task_description.get_labels(self.env)
+        with metrics.timer('render'):
+            for task in self:
+                parts = []
+                for ticket in tickets_by_task.get(task.id, []):
+                    render = task_description.render_preparation_changes if parts else task_description.render_preparation
+                    parts.append(render(ticket._get_render_data(), labels, now=ticket.create_date))
+                task.pos_ticket_html = ''.join(parts) or False
+
+    @api.model
+    def _pos_order_task_key(self, order):
+        """Clave de la tarea de una orden finalizada"""
+        return f"order:{order.id}"
+
+    @api.model
+    def _pos_station_task_key(self, order_uid, printer_id):
+        """Clave de la tarea de una orden en una estación en modo incremental"""
+        return f"station:{order_uid}:{printer_id}"
+
+    @api.model
+    def _with_pos_fast_context(self, fast=True):
+        """Las mismas tareas con el contexto del modo rápido si ``fast``"""
+        return self.with_context(**FAST_TASK_CONTEXT) if fast else self
+
+    @api.model
+    def _get_pos_kitchen_tickets(self, project_id, cursor=None, limit=200):
+        """
+        Devuelve las tareas de preparación de un proyecto que cambiaron desde el
+        cursor, sin la descripción HTML. Sin cursor devuelve solo las abiertas.
+
+        ``write_date`` es la hora de inicio de la transacción, por lo que una
+        transacción larga puede confirmar cambios por detrás del cursor: esos
+        cambios llegan a la pantalla por la notificación del bus, que se envía
+        al confirmar.
+
+        :param project_id: ID del proyecto de la pantalla de cocina
+        :param cursor: cursor ``"write_date|id"`` devuelto por la llamada anterior
+        :param limit: número máximo de tareas por llamada
+        :return: diccionario con ``tickets``, ``cursor`` y ``has_more``
+        """
+        has_state = 'state' in self._fields
+        self.flush_model(['project_id', 'stage_id', 'active', 'pos_order_uuid', 'write_date'] + (['state'] if has_state else []))
+        if cursor:
+            write_date, task_id = self._parse_pos_kitchen_cursor(cursor)
+            self.env.cr.execute("""
+                SELECT id, write_date
+                  FROM project_task
+                 WHERE project_id = %s
+                   AND pos_order_uuid IS NOT NULL
+                   AND (write_date, id) > (%s, %s)
+              ORDER BY write_date, id
+                 LIMIT %s
+            """, (project_id, write_date, task_id, limit))
+        else:
+            open_state = "AND t.state NOT IN %(closed_states)s" if has_state else ""
+            self.env.cr.execute(f"""
+                SELECT t.id, t.write_date
+                  FROM project_task t
+             LEFT JOIN project_task_type s ON s.id = t.stage_id
+                 WHERE t.project_id = %(project_id)s
+                   AND t.pos_order_uuid IS NOT NULL
+                   AND t.active
+                   AND NOT COALESCE(s.fold, FALSE)
+                   {open_state}
+              ORDER BY t.write_date, t.id
+                 LIMIT %(limit)s
+            """, {'project_id': project_id, 'limit': limit, 'closed_states': CLOSED_TASK_STATES})
+        rows = self.env.cr.fetchall()
+        if rows:
+            cursor = f"{rows[-1][1].isoformat()}|{rows[-1][0]}"
+        # Los IDs vienen del SQL: se filtran por las reglas de acceso del usuario
+        # conservando el orden del cursor
+        task_ids = [row[0] for row in rows]
+        allowed_ids = set(self.with_context(active_test=False).search([('id', 'in', task_ids)]).ids)
+        tasks = self.with_context(active_test=False).browse([task_id for task_id in task_ids if task_id in allowed_ids])
+        return {
+            'tickets': tasks._get_pos_kitchen_data(),
+            'cursor': cursor or False,
+            'has_more': len(rows) == limit,
+        }
+
+    @api.model
+    def _parse_pos_kitchen_cursor(self, cursor):
+        write_date, _sep, task_id = str(cursor).partition('|')
+        try:
+            return datetime.fromisoformat(write_date), int(task_id)
+        except ValueError:
+            raise ValueError(f"Cursor de cocina inválido: {cursor!r}")
+
+    def _get_pos_kitchen_data(self):
+        """
+        Datos mínimos de las tareas para una pantalla de cocina: cabecera del
+        primer ticket y líneas normalizadas, con un número fijo de consultas.
+
+        :return: lista de diccionarios, uno por tarea, en el orden del recordset
+        """
+        if not self:
+            return []
+        self.fetch(['name', 'stage_id', 'active', 'priority', 'pos_order_uuid', 'pos_printer_id', 'write_date'])
+        tickets = self.env['pos.project.ticket'].search_read(
+            [('task_id', 'in', self.ids), ('line_ids', '!=', False)],
+            ['task_id', 'name', 'table_name', 'server_name'], order='id', load=None,
+        )
+        headers = {}
+        for ticket in tickets:
+            headers.setdefault(ticket['task_id'], ticket)
+        lines_by_task = {}
+        for line in self.env['pos.project.ticket.line'].search_read(
+            [('task_id', 'in', self.ids)], KITCHEN_LINE_FIELDS, order='id', load=None,
+        ):
+            lines_by_task.setdefault(line.pop('task_id'), []).append(line)
+
+        # Las versiones con estado cierran también las tareas hechas o canceladas
+        has_state = 'state' in self._fields
+        result = []
+        for task in self:
+            header = headers.get(task.id, {})
+            result.append({
+                'id': task.id,
+                'name': task.name,
+                'order_name': header.get('name') or False,
+                'table': header.get('table_name') or False,
+                'server': header.get('server_name') or False,
+                'stage_id': task.stage_id.id,
+                'stage_name': task.stage_id.name or False,
+                'open': task.active and not task.stage_id.fold and not (has_state and task.state in CLOSED_TASK_STATES),
+                'priority': task.priority,
+                'order_uuid': task.pos_order_uuid,
+                'printer_id': task.pos_printer_id.id,
+                'write_date': task.write_date,
+                'lines': lines_by_task.get(task.id, []),
+            })
+        return result
+
+    def _pos_kitchen_notify(self):
+        """Envía por el bus los cambios de las tareas a las pantallas de cocina de su proyecto"""
+        if not self:
+            return
+        tasks = self.sudo().with_context(active_test=False)
+        for project, project_tasks in tasks.grouped('project_id').items():
+            if project:
+                self.env['bus.bus']._sendone(
+                    (project, KITCHEN_CHANNEL), 'pos_project_kitchen/tickets',
+                    {'project_id': project.id, 'tickets': project_tasks._get_pos_kitchen_data()},
+                )
+
+    @api.model
+    @tools.ormcache('lang')
+    def _get_pos_description_labels(self, lang):
+        """
+        Etiquetas de las descripciones traducidas a ``lang``, resueltas una
+        sola vez por worker e idioma. Como la caché pertenece al registro, es
+        propia de cada base de datos y se invalida al cargar traducciones o
+        actualizar módulos.
+
+        :return: frozendict con las etiquetas, ver ``tools.task_description``
+        """
+        return frozendict(task_description.build_labels(self.with_context(lang=lang).env))
+
+    @api.model
+    @tools.ormcache()
+    def _get_pos_task_capabilities(self):
+        """
+        Resuelve una sola vez por worker los campos de project.task que cambian
+        entre versiones de Odoo. La caché pertenece al registro, por lo que se
+        invalida al instalar o actualizar módulos.
+
+        :return: frozendict con las claves ``assignee_field``, ``assignee_many``
+                 y ``deadline_type``
+        """
+        assignee_field = next(
+            (name for name in ('user_ids', 'user_id', 'person_id') if name in self._fields),
+            None,
+        )
+        deadline_field = self._fields.get('date_deadline')
+        return frozendict({
+            'assignee_field': assignee_field,
+            'assignee_many': bool(assignee_field) and self._fields[assignee_field].type == 'many2many',
+            'deadline_type': deadline_field.type if deadline_field else None,
+        })
+
+    @api.model
+    def _pos_assignee_vals(self, user):
+        """Valores para asignar el responsable según la versión de Odoo"""
+        capabilities = self._get_pos_task_capabilities()
+        field_name = capabilities['assignee_field']
+        if not field_name or not user:
+            return {}
+        if capabilities['assignee_many']:
+            return {field_name: [Command.link(user.id)]}
+        return {field_name: user.id}
+
+    @api.model
+    def _pos_deadline_vals(self, deadline):
+        """Valores para la fecha límite según el tipo del campo en esta versión de Odoo"""
+        deadline_type = self._get_pos_task_capabilities()['deadline_type']
+        if not deadline_type or not deadline:
+            return {}
+        if deadline_type == 'datetime' and not isinstance(deadline, datetime):
+            deadline = datetime.combine(deadline, time.max.replace(microsecond=0))
+        elif deadline_type == 'date' and isinstance(deadline, datetime):
+            deadline = deadline.date()
+        return {'date_deadline': deadline}
@@ -1,3 +1,4 @@
 /** @odoo-module */
 
-import "./project_task_button/project_task_button_adapter"; 
\ No newline at end of file
+import "./project_task_button/project_task_button_adapter";
+import "./project_outbox_status/navbar_patch";
@@ -0,0 +1,6 @@
+/** @odoo-module */
+
+import { Navbar } from "@point_of_sale/app/navbar/navbar";
+import { ProjectOutboxStatus } from "./project_outbox_status";
+
+Navbar.components = { ...Navbar.components, ProjectOutboxStatus };
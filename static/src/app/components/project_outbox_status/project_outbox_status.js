@@ -0,0 +1,30 @@
+/** @odoo-module */
+
+import { Component, onWillUnmount, useState } from "@odoo/owl";
+import { usePos } from "@point_of_sale/app/store/pos_hook";
+
+/**
+ * Indicador en la barra de estado del POS con los tickets de cocina pendientes
+ * de enviar y la antigüedad del más antiguo, y con los tickets apartados por
+ * errores del servidor
+ */
+export class ProjectOutboxStatus extends Component {
+    static template = "pos_project_integration.ProjectOutboxStatus";
+    static props = {};
+
+    setup() {
+        this.pos = usePos();
+        this.outbox = useState(this.pos.projectTicketOutbox.state);
+        this.clock = useState({ now: Date.now() });
+        const interval = setInterval(() => (this.clock.now = Date.now()), 5000);
+        onWillUnmount(() => clearInterval(interval));
+    }
+
+    get oldestAge() {
+        if (!this.outbox.oldestCreatedAt) {
+            return "";
+        }
+        const seconds = Math.max(0, Math.round((this.clock.now - this.outbox.oldestCreatedAt) / 1000));
+        return seconds < 60 ? `${seconds}s` : `${Math.floor(seconds / 60)}m`;
+    }
+}
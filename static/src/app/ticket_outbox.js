@@ -0,0 +1,314 @@
+/** @odoo-module */
+
+import { reactive } from "@odoo/owl";
+import { _t } from "@web/core/l10n/translation";
+import { ConnectionLostError, rpc } from "@web/core/network/rpc";
+
+const DB_NAME = "pos_project_integration";
+const DB_VERSION = 1;
+const STORE_NAME = "ticket_outbox";
+const BATCH_SIZE = 20;
+const BASE_DELAY = 1000;
+const MAX_DELAY = 60000;
+// Errores temporales del servidor (conflictos entre transacciones) que se
+// resuelven reintentando el mismo lote tras una espera
+const TRANSIENT_ERRORS = new Set([
+    "odoo.exceptions.ConcurrencyError",
+    "psycopg2.errors.SerializationFailure",
+    "psycopg2.errors.DeadlockDetected",
+    "psycopg2.errors.LockNotAvailable",
+    "psycopg2.extensions.TransactionRollbackError",
+]);
+const MAX_TRANSIENT_ATTEMPTS = 5;
+
+/**
+ * Cola persistente de tickets de preparación pendientes de enviar al servidor.
+ *
+ * Los tickets se guardan en IndexedDB en el momento de imprimir, de modo que la
+ * interfaz del cajero nunca espera a la red, y se conservan aunque se recargue
+ * la página. Un proceso en segundo plano los envía por lotes al endpoint
+ * `create_preparation_tasks`, con espera exponencial si el servidor no responde
+ * o devuelve un error temporal, como un conflicto de concurrencia. Cada ticket
+ * lleva su `request_key`, por lo que los reenvíos no duplican tareas.
+ *
+ * Si el servidor rechaza un lote con otra excepción, el lote se divide hasta
+ * aislar el ticket que la provoca. Ese ticket, y los que el servidor devuelve
+ * sin éxito (proyecto o impresora no válidos...), quedan apartados (`dead`) en
+ * la cola con su mensaje y se muestran en la barra de estado para reintentarlos
+ * o descartarlos, sin bloquear los tickets siguientes. Ningún ticket se borra
+ * sin que el servidor lo haya aceptado o el cajero lo descarte.
+ */
+export class TicketOutbox {
+    /**
+     * @param {Object} pos - Instancia del POS
+     */
+    constructor(pos) {
+        this.pos = pos;
+        this.state = reactive({ depth: 0, dead: 0, oldestCreatedAt: null, flushing: false, offline: false });
+        this.attempt = 0;
+        this.batchSize = BATCH_SIZE;
+        this.timer = null;
+        // Respaldo en memoria si el navegador no permite usar IndexedDB
+        this.memoryStore = new Map();
+        this.dbPromise = this._openDb();
+        window.addEventListener("online", () => this.schedule(0));
+    }
+
+    /**
+     * Recupera los tickets guardados en sesiones anteriores y empieza a enviarlos
+     */
+    async start() {
+        await this._refreshState();
+        if (this.state.depth) {
+            this.schedule(0);
+        }
+    }
+
+    /**
+     * Añade un ticket a la cola y programa su envío
+     * @param {Object} orderData - Datos del ticket, con su `request_key`
+     */
+    async enqueue(orderData) {
+        await this._put({
+            request_key: orderData.request_key,
+            created_at: Date.now(),
+            order_data: orderData,
+        });
+        await this._refreshState();
+        this.schedule(0);
+    }
+
+    schedule(delay) {
+        if (this.timer) {
+            clearTimeout(this.timer);
+        }
+        this.timer = setTimeout(() => {
+            this.timer = null;
+            this.flush();
+        }, delay);
+    }
+
+    async flush() {
+        if (this.state.flushing) {
+            return;
+        }
+        this.state.flushing = true;
+        try {
+            const tickets = (await this._getPending()).slice(0, this.batchSize);
+            if (!tickets.length) {
+                return;
+            }
+
+            let response;
+            try {
+                response = await rpc("/pos_project_integration/create_preparation_tasks", {
+                    orders_data: tickets.map((ticket) => ticket.order_data),
+                });
+            } catch (error) {
+                if (error instanceof ConnectionLostError) {
+                    this._onNetworkError(error);
+                } else if (TRANSIENT_ERRORS.has(error.data?.name) && this.attempt < MAX_TRANSIENT_ATTEMPTS) {
+                    this._onTransientError(error);
+                } else {
+                    await this._onServerError(tickets, error);
+                }
+                return;
+            }
+
+            const results = response.results || [];
+            const sentKeys = [];
+            const rejected = [];
+            tickets.forEach((ticket, index) => {
+                const result = results[index];
+                if (!result) {
+                    return;
+                }
+                // Los errores de negocio no se resuelven reintentando solos: el ticket
+                // queda apartado con su mensaje hasta que el cajero lo reintente o descarte
+                if (result.success) {
+                    sentKeys.push(ticket.request_key);
+                } else {
+                    rejected.push({ ...ticket, error: result.message || _t("Error al crear la tarea de preparación") });
+                }
+            });
+            await this._delete(sentKeys);
+            await this._markDead(rejected);
+
+            this.attempt = 0;
+            this.batchSize = BATCH_SIZE;
+            this.state.offline = false;
+            await this._refreshState();
+            if (this.state.depth) {
+                this.schedule(0);
+            }
+        } finally {
+            this.state.flushing = false;
+        }
+    }
+
+    _onNetworkError(error) {
+        console.warn("No se pudieron enviar los tickets de preparación, se reintentará:", error);
+        if (!this.state.offline) {
+            this.pos.notification.add(
+                _t("Sin conexión con el servidor: los tickets de cocina quedan en cola"),
+                { type: "warning" }
+            );
+        }
+        this.state.offline = true;
+        this._retryLater();
+    }
+
+    _onTransientError(error) {
+        console.warn("Conflicto temporal en el servidor, se reintentará el lote:", error);
+        this._retryLater();
+    }
+
+    _retryLater() {
+        const delay = Math.min(BASE_DELAY * 2 ** this.attempt, MAX_DELAY);
+        this.attempt += 1;
+        this.schedule(delay);
+    }
+
+    /**
+     * El servidor rechazó el lote con una excepción que no se resuelve
+     * esperando (o un error temporal que persiste tras los reintentos): se
+     * divide el lote hasta aislar el ticket que la provoca y ese ticket se
+     * aparta para que la cola siga avanzando.
+     */
+    async _onServerError(tickets, error) {
+        console.warn("El servidor rechazó el lote de tickets de preparación:", error);
+        this.attempt = 0;
+        if (tickets.length > 1) {
+            this.batchSize = Math.max(1, Math.floor(tickets.length / 2));
+        } else {
+            const message = error.data?.message || error.message || String(error);
+            this.batchSize = BATCH_SIZE;
+            await this._markDead([{ ...tickets[0], error: message }]);
+        }
+        this.schedule(0);
+    }
+
+    /**
+     * Aparta los tickets con su mensaje de error y avisa al cajero
+     * @param {Object[]} tickets - Tickets de la cola, con su `error`
+     */
+    async _markDead(tickets) {
+        if (!tickets.length) {
+            return;
+        }
+        for (const ticket of tickets) {
+            await this._put({ ...ticket, dead: true });
+        }
+        await this._refreshState();
+        const message = tickets.length === 1
+            ? _t("Un ticket de cocina no se pudo enviar y queda apartado: %s", tickets[0].error)
+            : _t("%s tickets de cocina no se pudieron enviar y quedan apartados", tickets.length);
+        this.pos.notification.add(message, { type: "danger", sticky: true });
+    }
+
+    /**
+     * Muestra los tickets apartados, con la opción de reintentarlos o descartarlos
+     */
+    async showDead() {
+        const dead = await this._getDead();
+        if (!dead.length) {
+            return;
+        }
+        const details = dead.map((ticket) => `${ticket.order_data.name || ticket.request_key}: ${ticket.error}`);
+        this.pos.notification.add(details.join("\n"), {
+            title: _t("Tickets de cocina sin enviar"),
+            type: "danger",
+            sticky: true,
+            buttons: [
+                { name: _t("Reintentar"), primary: true, onClick: () => this.retryDead() },
+                { name: _t("Descartar"), onClick: () => this.discardDead() },
+            ],
+        });
+    }
+
+    async retryDead() {
+        for (const ticket of await this._getDead()) {
+            await this._put({ ...ticket, dead: false, error: false });
+        }
+        await this._refreshState();
+        this.schedule(0);
+    }
+
+    async discardDead() {
+        await this._delete((await this._getDead()).map((ticket) => ticket.request_key));
+        await this._refreshState();
+    }
+
+    async _refreshState() {
+        const tickets = await this._getAll();
+        const pending = tickets.filter((ticket) => !ticket.dead);
+        this.state.depth = pending.length;
+        this.state.dead = tickets.length - pending.length;
+        this.state.oldestCreatedAt = pending.length ? pending[0].created_at : null;
+    }
+
+    async _getPending() {
+        return (await this._getAll()).filter((ticket) => !ticket.dead);
+    }
+
+    async _getDead() {
+        return (await this._getAll()).filter((ticket) => ticket.dead);
+    }
+
+    // Acceso a IndexedDB
+
+    _openDb() {
+        return new Promise((resolve) => {
+            if (!window.indexedDB) {
+                resolve(null);
+                return;
+            }
+            const request = window.indexedDB.open(DB_NAME, DB_VERSION);
+            request.onupgradeneeded = () => {
+                const store = request.result.createObjectStore(STORE_NAME, { keyPath: "request_key" });
+                store.createIndex("created_at", "created_at");
+            };
+            request.onsuccess = () => resolve(request.result);
+            request.onerror = () => {
+                console.warn("IndexedDB no disponible, la cola de tickets será solo en memoria:", request.error);
+                resolve(null);
+            };
+        });
+    }
+
+    async _transaction(mode, callback) {
+        const db = await this.dbPromise;
+        return new Promise((resolve, reject) => {
+            const transaction = db.transaction(STORE_NAME, mode);
+            const result = callback(transaction.objectStore(STORE_NAME));
+            transaction.oncomplete = () => resolve(result && result.result);
+            transaction.onerror = () => reject(transaction.error);
+        });
+    }
+
+    async _put(ticket) {
+        if (!(await this.dbPromise)) {
+            this.memoryStore.set(ticket.request_key, ticket);
+            return;
+        }
+        await this._transaction("readwrite", (store) => store.put(ticket));
+    }
+
+    async _getAll() {
+        if (!(await this.dbPromise)) {
+            return [...this.memoryStore.values()].sort((a, b) => a.created_at - b.created_at);
+        }
+        return (await this._transaction("readonly", (store) => store.index("created_at").getAll())) || [];
+    }
+
+    async _delete(requestKeys) {
+        if (!requestKeys.length) {
+            return;
+        }
+        if (!(await this.dbPromise)) {
+            requestKeys.forEach((key) => this.memoryStore.delete(key));
+            return;
+        }
+        await this._transaction("readwrite", (store) => requestKeys.forEach((key) => store.delete(key)));
+    }
+}
@@ -2,14 +2,22 @@
 
 import { PosStore } from "@point_of_sale/app/store/pos_store";
 import { ProjectTaskCreator } from "@pos_project_integration/app/project_task_creator";
+import { TicketOutbox } from "@pos_project_integration/app/ticket_outbox";
 import { patch } from "@web/core/utils/patch";
 import { _t } from "@web/core/l10n/translation";
+import { uuidv4 } from "@point_of_sale/utils";
 import { rpc } from "@web/core/network/rpc";
 
+const PROJECT_METADATA_KEY = "pos_project_integration.metadata";
+
 patch(PosStore.prototype, {
     setup() {
         super.setup(...arguments);
         this.projectTaskCreator = null;
+        this._projectMetadataPromise = null;
+        // Cola persistente de tickets de preparación; reanuda los envíos pendientes tras recargar
+        this.projectTicketOutbox = new TicketOutbox(this);
+        this.projectTicketOutbox.start();
     },
 
     async afterLoad() {
@@ -38,438 +46,249 @@ patch(PosStore.prototype, {
         }
     },
 
+    /**
+     * Envía un único ticket con la orden completa y sus cambios marcados para
+     * todas las impresoras de tipo proyecto; el servidor reparte las líneas por
+     * estación según sus categorías. El resto de impresoras imprime como siempre.
+     */
+    async printChanges(order, orderChange) {
+        const printers = this.unwatched.printers;
+        const projectPrinters = printers.filter((printer) => printer.isProjectPrinter);
+        if (!projectPrinters.length) {
+            return super.printChanges(...arguments);
+        }
+        
+        await this.projectTicketOutbox.enqueue(this._prepareProjectFanOutTicket(order, orderChange));
+        
+        this.unwatched.printers = printers.filter((printer) => !printer.isProjectPrinter);
+        try {
+            return await super.printChanges(...arguments);
+        } finally {
+            this.unwatched.printers = printers;
+        }
+    },
+
+    /**
+     * Datos de proyectos del TPV (proyecto y modo de cada impresora). No se
+     * cargan al arrancar la sesión: se piden al imprimir el primer ticket y se
+     * guardan en el navegador mientras no cambie su versión.
+     */
+    getProjectMetadata() {
+        if (!this._projectMetadataPromise) {
+            this._projectMetadataPromise = this._loadProjectMetadata().catch((error) => {
+                this._projectMetadataPromise = null;
+                throw error;
+            });
+        }
+        return this._projectMetadataPromise;
+    },
+
+    async _loadProjectMetadata() {
+        const storageKey = `${PROJECT_METADATA_KEY}.${this.config.id}`;
+        const version = this.config.project_metadata_version;
+        try {
+            const cached = JSON.parse(localStorage.getItem(storageKey) || "null");
+            if (cached && version && cached.version === version) {
+                return cached;
+            }
+        } catch {
+            // Caché ilegible: se vuelve a pedir
+        }
+        const metadata = await rpc("/pos_project_integration/metadata", { config_id: this.config.id });
+        try {
+            localStorage.setItem(storageKey, JSON.stringify(metadata));
+        } catch {
+            // Sin espacio en el navegador: se usa solo en memoria
+        }
+        return metadata;
+    },
+
+    _prepareProjectFanOutTicket(order, orderChange) {
+        const previousLines = (order.last_order_preparation_change || {}).lines || {};
+        const isChange = Object.keys(previousLines).length > 0;
+        return Object.assign(this._prepareProjectTicketHeader(order), {
+            fan_out: true,
+            is_added_order: isChange,
+            is_change_order: isChange,
+            is_new_order: !isChange,
+            order_lines: this._prepareProjectFanOutLines(order, orderChange),
+        });
+    },
+
+    /**
+     * Líneas de un ticket de reparto: la orden completa, con el tipo y la
+     * cantidad del cambio (`change_type`, `change_qty`) en las líneas que
+     * cambiaron, más los cambios sin línea en la orden, como las líneas
+     * canceladas, con cantidad 0. El servidor envía solo los cambios a las
+     * estaciones en modo incremental y la orden completa al resto.
+     */
+    _prepareProjectFanOutLines(order, orderChange) {
+        const lines = order.get_orderlines()
+            .filter((line) => line.get_quantity() > 0)
+            .map((line) => this._prepareProjectWireLine(line));
+        const linesByUuid = new Map(lines.filter((line) => line.uuid).map((line) => [line.uuid, line]));
+        for (const change of this._prepareProjectChangeLines(orderChange, order)) {
+            const line = linesByUuid.get(change.uuid);
+            if (line && !line.change_type) {
+                Object.assign(line, { change_type: change.change_type, change_qty: change.qty });
+            } else {
+                lines.push(Object.assign(change, { qty: 0, change_qty: change.qty }));
+            }
+        }
+        return lines;
+    },
+
+    /**
+     * Cabecera compacta de un ticket de preparación. Los nombres de productos,
+     * atributos y precios los resuelve el servidor a partir de los IDs.
+     */
+    _prepareProjectTicketHeader(order) {
+        const partner = order && order.get_partner();
+        const cashier = this.get_cashier();
+        return {
+            // Clave de idempotencia: los reenvíos del mismo ticket no duplican la tarea
+            request_key: uuidv4(),
+            config_id: this.config.id,
+            order_uid: (order && order.uuid) || null,
+            name: (order && order.name) || "",
+            table: order && order.table_id ? order.table_id.table_number || order.table_id.name : null,
+            server: cashier ? cashier.name : null,
+            customer_id: partner ? partner.id : null,
+            note: (order && order.general_note) || "",
+            is_change_order: false,
+            is_added_order: false,
+            is_new_order: true,
+        };
+    },
+
+    /**
+     * Líneas de los cambios de preparación. Los cambios no llevan precio ni
+     * extras: se toman de la línea de la orden con el mismo `uuid`, si sigue en ella.
+     */
+    _prepareProjectChangeLines(changes, order = null) {
+        const orderLines = new Map((order ? order.get_orderlines() : []).map((line) => [line.uuid, line]));
+        const lines = [];
+        const changeGroups = [
+            [changes.new, "new"],
+            [changes.cancelled, "cancelled"],
+            [changes.noteUpdated, "note_only"],
+        ];
+        for (const [changeLines, changeType] of changeGroups) {
+            for (const line of changeLines || []) {
+                const wireLine = this._prepareProjectWireLine(line, changeType);
+                const orderLine = orderLines.get(line.uuid);
+                if (orderLine) {
+                    wireLine.price_unit = this._getProjectLinePriceUnit(orderLine);
+                    wireLine.sides = this._getProjectLineSides(orderLine);
+                }
+                lines.push(wireLine);
+            }
+        }
+        return lines;
+    },
+
+    /**
+     * Línea del formato de envío: producto, cantidad (o variación), nota,
+     * precio unitario, extras y los identificadores que el servidor necesita
+     * para resolver el resto. Acepta tanto líneas de la orden como líneas de
+     * cambios de preparación.
+     */
+    _prepareProjectWireLine(line, changeType = null) {
+        const product = line.product_id;
+        const comboParent = line.combo_parent_id;
+        return {
+            uuid: line.uuid || null,
+            product_id: product && typeof product === "object" ? product.id : product,
+            qty: line.quantity !== undefined ? line.quantity : line.get_quantity(),
+            note: line.note || line.customer_note || "",
+            change_type: changeType,
+            price_unit: this._getProjectLinePriceUnit(line),
+            attribute_value_ids: (line.attribute_value_ids || []).map((value) =>
+                typeof value === "object" ? value.id : value
+            ),
+            combo_parent_uuid: comboParent && typeof comboParent === "object" ? comboParent.uuid : null,
+            sides: this._getProjectLineSides(line),
+        };
+    },
+
+    /**
+     * Precio unitario con impuestos de una línea de la orden, con la tarifa, la
+     * posición fiscal y el descuento aplicados; null si la línea no lo tiene
+     */
+    _getProjectLinePriceUnit(line) {
+        if (typeof line.get_price_with_tax !== "function") {
+            return null;
+        }
+        const qty = line.get_quantity();
+        return qty ? line.get_price_with_tax() / qty : 0;
+    },
+
+    _getProjectLineSides(line) {
+        const sides = typeof line.get_sides === "function" ? line.get_sides() : line.sides;
+        return (sides || [])
+            .map((side) => (side && typeof side === "object" ? side.name || side.product_name : side))
+            .filter((name) => typeof name === "string" && name);
+    },
+
     create_printer(config) {
         if (config.printer_type === "project") {
             const self = this;
             
-            console.log("Creando impresora de tipo proyecto con config:", config);
-            console.log("Datos completos de la impresora:", JSON.stringify(config));
-            
-            // Verificar que el proyecto esté configurado
-            const projectId = config.project_id;
-            if (!projectId) {
-                console.error("No hay proyecto configurado en la impresora:", config);
-                this.notification.add(_t("La impresora de tipo proyecto no tiene un proyecto configurado. Por favor, configure un proyecto en la impresora."), { type: "danger" });
-                
-                // Crear una impresora ficticia que muestre un mensaje de error
-                return {
-                    connection: { isOpen: true },
-                    printReceipt: function() {
-                        self.notification.add(_t("No se puede imprimir: la impresora no tiene un proyecto configurado"), { type: "danger" });
-                        return Promise.resolve(false);
-                    },
-                    printPackingReceipt: function() {
-                        self.notification.add(_t("No se puede imprimir: la impresora no tiene un proyecto configurado"), { type: "danger" });
-                        return Promise.resolve(false);
-                    },
-                    printChanges: function() {
-                        self.notification.add(_t("No se puede imprimir: la impresora no tiene un proyecto configurado"), { type: "danger" });
-                        return Promise.resolve(false);
-                    },
-                    print: function() {
-                        self.notification.add(_t("No se puede imprimir: la impresora no tiene un proyecto configurado"), { type: "danger" });
-                        return Promise.resolve(false);
-                    },
-                    isConnected: function() {
-                        return false;
-                    },
-                    openCashbox: function() {
-                        return Promise.resolve(false);
-                    },
-                    send_printing_job: function() {
-                        return Promise.resolve(false);
-                    },
-                    print_receipt: function() {
-                        return Promise.resolve(false);
-                    },
-                    print_status: function() {
-                        return { status: 'disconnected', messages: [_t("No hay proyecto configurado")] };
-                    }
-                };
-            }
-            
             // Crear un manejador especial para impresoras de tipo proyecto
             return {
                 connection: { isOpen: true },
+                isProjectPrinter: true,
+                config: config,
                 
                 // Función principal para crear la tarea
                 async createProjectTask(receipt) {
                     if (!receipt) return false;
                     
                     try {
-                        console.log("Creando tarea de proyecto para recibo:", receipt);
-                        
-                        // Obtener el ID del proyecto
-                        let projectIdValue;
-                        if (typeof projectId === 'object' && projectId !== null && projectId.id) {
-                            projectIdValue = projectId.id;
-                        } else if (typeof projectId === 'number') {
-                            projectIdValue = projectId;
-                        } else {
-                            console.error("Formato de project_id no reconocido:", projectId);
-                            self.notification.add(_t("Formato de project_id no reconocido"), { type: "danger" });
+                        const metadata = await self.getProjectMetadata();
+                        const route = metadata.printers[String(config.id)];
+                        if (!route) {
+                            self.notification.add(_t("La impresora de tipo proyecto no tiene un proyecto configurado. Por favor, configure un proyecto en la impresora."), { type: "danger" });
                             return false;
                         }
-                        
-                        console.log("Project ID a utilizar:", projectIdValue);
-                        
-                        // Preparar los datos de la orden para enviar al servidor
-                        const orderData = {
-                            project_id: projectIdValue,
+                        const data = receipt.data || {};
+                        const order = self.get_order();
+                        const orderData = Object.assign(self._prepareProjectTicketHeader(order), {
+                            project_id: route.project_id,
+                            printer_id: config.id,
+                            reprint: Boolean(data.reprint),
                             order_lines: [],
-                            note: '',
-                            name: '',
-                            is_change_order: false,
-                            is_new_order: true, // Marcar como nueva orden por defecto
-                            is_added_order: false, // Por defecto no es un pedido agregado
-                            table: null,
-                            server: null,
-                            reprint: true // Marcar como reimpresión para procesar toda la orden
-                        };
+                        });
                         
-                        // Obtener la orden actual completa
-                        const order = self.get_order();
-                        if (order) {
-                            console.log("Obteniendo datos completos de la orden actual:", order);
-                            
-                            try {
-                                // Intentar obtener el cliente
-                                if (typeof order.get_client === 'function' && order.get_client()) {
-                                    orderData.customer = {
-                                        id: order.get_client().id,
-                                        name: order.get_client().name
-                                    };
-                                }
-                                
-                                // Intentar obtener información de mesa
-                                if (typeof order.get_table === 'function' && order.get_table()) {
-                                    const table = order.get_table();
-                                    orderData.table = table.name || `Mesa ${table.id}`;
-                                    console.log("Mesa obtenida de get_table():", orderData.table);
-                                } else if (order.table) {
-                                    orderData.table = order.table.name || `Mesa ${order.table.id}`;
-                                    console.log("Mesa obtenida de order.table:", orderData.table);
-                                }
-                                
-                                // Intentar obtener información de camarero
-                                if (typeof order.get_server === 'function' && order.get_server()) {
-                                    const server = order.get_server();
-                                    orderData.server = server.name || server;
-                                    console.log("Camarero obtenido de get_server():", orderData.server);
-                                } else if (order.server) {
-                                    orderData.server = order.server.name || order.server;
-                                    console.log("Camarero obtenido de order.server:", orderData.server);
-                                } else if (typeof order.get_cashier === 'function' && order.get_cashier()) {
-                                    const cashier = order.get_cashier();
-                                    orderData.server = cashier.name || cashier;
-                                    console.log("Camarero obtenido de get_cashier():", orderData.server);
-                                } else if (self.get_cashier()) {
-                                    const cashier = self.get_cashier();
-                                    orderData.server = cashier.name || cashier.user_name || `Usuario ${cashier.id}`;
-                                    console.log("Camarero obtenido de PosStore.get_cashier():", orderData.server);
-                                }
-                                
-                                // Generar nombre de orden con formato "Order XXXXX-XXX-XXXX"
-                                if (order.name) {
-                                    // Intentar extraer el formato "Order XXXXX-XXX-XXXX"
-                                    const orderNameMatch = order.name.match(/Order\s+(\d+-\d+-\d+)/i);
-                                    if (orderNameMatch && orderNameMatch[1]) {
-                                        orderData.name = `Order ${orderNameMatch[1]}`;
-                                        if (receipt.data && receipt.data.reprint) {
-                                            orderData.name += " (Reimpresión)";
-                                        }
-                                        console.log("Nombre de orden extraído con formato Order XXXXX-XXX-XXXX:", orderData.name);
-                                    } else {
-                                        // Crear un nuevo formato basado en la fecha y hora actual
-                                        const now = new Date();
-                                        const dateStr = now.getFullYear().toString().substr(-2) + 
-                                                      (now.getMonth() + 1).toString().padStart(2, '0') + 
-                                                      now.getDate().toString().padStart(2, '0');
-                                        const timeStr = now.getHours().toString().padStart(2, '0') + 
-                                                      now.getMinutes().toString().padStart(2, '0');
-                                        const randomNum = Math.floor(1000 + Math.random() * 9000);
-                                        
-                                        orderData.name = `Order ${dateStr}-${timeStr}-${randomNum}`;
-                                        if (receipt.data && receipt.data.reprint) {
-                                            orderData.name += " (Reimpresión)";
-                                        }
-                                        console.log("Nombre de orden generado con nuevo formato:", orderData.name);
-                                    }
-                                } else {
-                                    // Crear un nuevo formato basado en la fecha y hora actual
-                                    const now = new Date();
-                                    const dateStr = now.getFullYear().toString().substr(-2) + 
-                                                  (now.getMonth() + 1).toString().padStart(2, '0') + 
-                                                  now.getDate().toString().padStart(2, '0');
-                                    const timeStr = now.getHours().toString().padStart(2, '0') + 
-                                                  now.getMinutes().toString().padStart(2, '0');
-                                    const randomNum = Math.floor(1000 + Math.random() * 9000);
-                                    
-                                    orderData.name = `Order ${dateStr}-${timeStr}-${randomNum}`;
-                                    if (receipt.data && receipt.data.reprint) {
-                                        orderData.name += " (Reimpresión)";
-                                    }
-                                    console.log("Nombre de orden generado con nuevo formato (sin nombre original):", orderData.name);
-                                }
-                                
-                                // Intentar obtener la nota general de la orden
-                                if (typeof order.get_note === 'function') {
-                                    const note = order.get_note();
-                                    if (note && note.trim() !== '') {
-                                        orderData.note = note;
-                                        console.log("Nota general obtenida con get_note():", orderData.note);
-                                    }
-                                } else if (order.note) {
-                                    orderData.note = order.note;
-                                    console.log("Nota general obtenida de order.note:", orderData.note);
-                                }
-                                
-                                // Obtener todas las líneas de la orden actual
-                                if (typeof order.get_orderlines === 'function') {
-                                    const orderlines = order.get_orderlines();
-                                    console.log("Líneas de orden encontradas:", orderlines.length);
-                                    
-                                    orderData.order_lines = [];
-                                    for (const line of orderlines) {
-                                        // Verificar que la cantidad sea positiva
-                                        let quantity = 0;
-                                        if (typeof line.get_quantity === 'function') {
-                                            quantity = line.get_quantity();
-                                        } else if (line.qty) {
-                                            quantity = line.qty;
-                                        } else if (line.quantity) {
-                                            quantity = line.quantity;
-                                        }
-                                        
-                                        if (quantity <= 0) {
-                                            console.log("Omitiendo línea con cantidad <= 0");
-                                            continue;
-                                        }
-                                        
-                                        console.log("Procesando línea:", line);
-                                        
-                                        // Obtener la nota del producto
-                                        let note = '';
-                                        if (typeof line.get_note === 'function') {
-                                            note = line.get_note() || '';
-                                            console.log("Nota obtenida con get_note():", note);
-                                        } else if (line.note) {
-                                            note = line.note;
-                                            console.log("Nota obtenida de line.note:", note);
-                                        } else if (line.customer_note) {
-                                            note = line.customer_note;
-                                            console.log("Nota obtenida de line.customer_note:", note);
-                                        } else if (line.client_note) {
-                                            note = line.client_note;
-                                            console.log("Nota obtenida de line.client_note:", note);
-                                        } else if (line.comment) {
-                                            note = line.comment;
-                                            console.log("Nota obtenida de line.comment:", note);
-                                        }
-                                        
-                                        // Obtener sides/extras si existen
-                                        let sides = [];
-                                        if (line.get_sides && typeof line.get_sides === 'function') {
-                                            sides = line.get_sides() || [];
-                                            console.log("Sides obtenidos con get_sides():", sides);
-                                        } else if (line.sides) {
-                                            sides = line.sides;
-                                            console.log("Sides obtenidos de line.sides:", sides);
-                                        }
-                                        
-                                        // Obtener atributos de combo si existen
-                                        let comboItems = [];
-                                        if (line.get_combo_items && typeof line.get_combo_items === 'function') {
-                                            comboItems = line.get_combo_items() || [];
-                                            console.log("Combo items obtenidos con get_combo_items():", comboItems);
-                                        } else if (line.combo_items) {
-                                            comboItems = line.combo_items;
-                                            console.log("Combo items obtenidos de line.combo_items:", comboItems);
-                                        }
-                                        
-                                        // Intentar obtener el producto directamente o a través de métodos
-                                        let productId, productName, price;
-                                        
-                                        if (typeof line.get_product === 'function' && line.get_product()) {
-                                            const product = line.get_product();
-                                            productId = product.id;
-                                            productName = product.display_name || product.name;
-                                            console.log("Producto obtenido con get_product():", productName);
-                                        } else if (line.product_id) {
-                                            productId = line.product_id;
-                                            productName = line.product_name || line.name || "Producto sin nombre";
-                                            console.log("Producto obtenido de line.product_id:", productName);
-                                        }
-                                        
-                                        // Obtener precio
-                                        if (typeof line.get_price_with_tax === 'function') {
-                                            price = line.get_price_with_tax();
-                                            console.log("Precio obtenido con get_price_with_tax():", price);
-                                        } else if (line.price_with_tax) {
-                                            price = line.price_with_tax;
-                                            console.log("Precio obtenido de line.price_with_tax:", price);
-                                        } else if (line.price) {
-                                            price = line.price;
-                                            console.log("Precio obtenido de line.price:", price);
-                                        } else {
-                                            price = 0;
-                                            console.log("No se pudo obtener el precio, usando 0");
-                                        }
-                                        
-                                        // Procesar sides/extras
-                                        let sidesToAdd = this._processSides(sides);
-                                        
-                                        // Procesar atributos de combo
-                                        let comboInfo = this._processComboItems(comboItems);
-                                        
-                                        // Combinar nota original con sides y combo info
-                                        let fullNote = note;
-                                        if (sidesToAdd) {
-                                            fullNote += (fullNote ? '\n' : '') + 'Extras: ' + sidesToAdd;
-                                        }
-                                        if (comboInfo) {
-                                            fullNote += (fullNote ? '\n' : '') + 'Combo: ' + comboInfo;
-                                        }
-                                        
-                                        console.log("Nota final para el producto:", fullNote);
-                                        
-                                        // Verificar si hay atributos en el nombre del producto
-                                        let fullProductName = productName;
-                                        
-                                        // Intentar extraer atributos del nombre del producto si están entre paréntesis
-                                        const attributesInName = this._extractAttributesFromName(productName);
-                                        if (attributesInName) {
-                                            console.log("Atributos encontrados en el nombre del producto:", attributesInName);
-                                        }
-                                        
-                                        // Intentar obtener atributos del producto
-                                        const productAttributes = this._getProductAttributes(line);
-                                        if (productAttributes && productAttributes.length > 0) {
-                                            console.log("Atributos obtenidos del producto:", productAttributes);
-                                            // Añadir atributos al nombre del producto si no están ya incluidos
-                                            if (!attributesInName) {
-                                                fullProductName = `${productName} (${productAttributes.join(', ')})`;
-                                            }
-                                        }
-                                        
-                                        orderData.order_lines.push({
-                                            product_id: productId,
-                                            product_name: fullProductName,
-                                            qty: quantity,
-                                            note: fullNote,
-                                            price: price,
-                                            sides: sides,
-                                            combo_items: comboItems,
-                                            attributes: productAttributes || []
-                                        });
-                                    }
-                                    
-                                    console.log("Líneas de orden procesadas:", orderData.order_lines.length);
-                                }
-                            } catch (e) {
-                                console.error("Error al obtener datos completos de la orden:", e);
-                            }
+                        if (route.incremental && data.changes) {
+                            // En modo incremental solo se envían los cambios del ticket
+                            orderData.order_lines = self._prepareProjectChangeLines(data.changes, order);
+                            orderData.is_change_order = orderData.order_lines.length > 0;
+                            orderData.is_new_order = !orderData.is_change_order;
                         }
-                        
-                        // Si no hay líneas de orden, intentar obtenerlas del recibo
-                        if (orderData.order_lines.length === 0 && receipt.data) {
-                            console.log("No se obtuvieron líneas de la orden actual, intentando obtenerlas del recibo");
-                            
-                            // Extraer información del recibo
-                            if (receipt.data.orderlines) {
-                                // Procesar todas las líneas del recibo
-                                this._processOrderLines(receipt.data.orderlines, orderData.order_lines);
-                            }
-                            
-                            // Extraer información del cliente si está disponible
-                            if (receipt.data.client) {
-                                orderData.customer = {
-                                    id: receipt.data.client.id,
-                                    name: receipt.data.client.name
-                                };
-                            }
-                            
-                            // Extraer información de mesa si está disponible
-                            this._extractTableInfo(receipt.data, orderData);
-                            
-                            // Extraer información de camarero si está disponible
-                            this._extractServerInfo(receipt.data, orderData);
-                            
-                            // Extraer notas si están disponibles
-                            this._extractNotes(receipt.data, orderData);
-                            
-                            // Extraer nombre de la orden si está disponible
-                            if (receipt.data.name) {
-                                // Intentar extraer el formato "Order XXXXX-XXX-XXXX"
-                                const orderNameMatch = receipt.data.name.match(/Order\s+(\d+-\d+-\d+)/i);
-                                if (orderNameMatch && orderNameMatch[1]) {
-                                    orderData.name = `Order ${orderNameMatch[1]}`;
-                                    if (receipt.data.reprint) {
-                                        orderData.name += " (Reimpresión)";
-                                    }
-                                    console.log("Nombre de orden extraído con formato Order XXXXX-XXX-XXXX:", orderData.name);
-                                } else {
-                                    // Crear un nuevo formato basado en la fecha y hora actual
-                                    const now = new Date();
-                                    const dateStr = now.getFullYear().toString().substr(-2) + 
-                                                  (now.getMonth() + 1).toString().padStart(2, '0') + 
-                                                  now.getDate().toString().padStart(2, '0');
-                                    const timeStr = now.getHours().toString().padStart(2, '0') + 
-                                                  now.getMinutes().toString().padStart(2, '0');
-                                    const randomNum = Math.floor(1000 + Math.random() * 9000);
-                                    
-                                    orderData.name = `Order ${dateStr}-${timeStr}-${randomNum}`;
-                                    if (receipt.data.reprint) {
-                                        orderData.name += " (Reimpresión)";
-                                    }
-                                    console.log("Nombre de orden generado con nuevo formato:", orderData.name);
-                                }
-                            } else {
-                                // Crear un nuevo formato basado en la fecha y hora actual
-                                const now = new Date();
-                                const dateStr = now.getFullYear().toString().substr(-2) + 
-                                              (now.getMonth() + 1).toString().padStart(2, '0') + 
-                                              now.getDate().toString().padStart(2, '0');
-                                const timeStr = now.getHours().toString().padStart(2, '0') + 
-                                              now.getMinutes().toString().padStart(2, '0');
-                                const randomNum = Math.floor(1000 + Math.random() * 9000);
-                                
-                                orderData.name = `Order ${dateStr}-${timeStr}-${randomNum}`;
-                                if (receipt.data && receipt.data.reprint) {
-                                    orderData.name += " (Reimpresión)";
-                                }
-                                console.log("Nombre de orden generado con nuevo formato (sin nombre en recibo):", orderData.name);
-                            }
+                        if (!orderData.order_lines.length && order) {
+                            orderData.order_lines = order.get_orderlines()
+                                .filter((line) => line.get_quantity() > 0)
+                                .map((line) => self._prepareProjectWireLine(line));
                         }
-                        
-                        // Si no hay líneas de orden, crear una línea ficticia para evitar el error de datos incompletos
-                        if (orderData.order_lines.length === 0) {
-                            console.warn("No hay productos en la orden, creando línea ficticia");
-                            orderData.order_lines.push({
-                                product_id: 0,
-                                product_name: "Producto sin especificar",
-                                qty: 1,
-                                note: "Reimpresión - No se pudieron obtener los productos",
-                                price: 0
-                            });
+                        if (!orderData.order_lines.length && data.orderlines) {
+                            // Recibo HTML sin orden: solo se conocen los nombres
+                            orderData.order_lines = data.orderlines.map((line) => ({
+                                product_id: line.product_id || 0,
+                                product_name: line.product_name,
+                                qty: line.qty || 1,
+                                note: line.note || "",
+                            }));
+                            orderData.name = orderData.name || data.name || "";
                         }
-                        
-                        console.log("Enviando datos para crear tarea (reimpresión completa):", JSON.stringify(orderData));
-                        
-                        // Llamar al endpoint para crear la tarea
-                        const result = await rpc("/pos_project_integration/create_preparation_task", {
-                            order_data: orderData
-                        });
-                        
-                        console.log("Resultado de la creación de tarea:", result);
-                        
-                        if (result.success) {
-                            self.notification.add(_t("Reimpresión completa enviada al proyecto"), { type: "success" });
-                            return true;
-                        } else {
-                            self.notification.add(result.message || _t("Error al crear la tarea de reimpresión"), { type: "warning" });
+                        if (!orderData.order_lines.length) {
+                            console.warn("Ticket de preparación sin productos");
                             return false;
                         }
+                        
+                        // Encolar el ticket: se envía en segundo plano y sobrevive a cortes de red y recargas
+                        await self.projectTicketOutbox.enqueue(orderData);
+                        return true;
                     } catch (error) {
                         console.error("Error al crear la tarea de reimpresión:", error);
                         self.notification.add(_t("Error al crear la tarea de reimpresión"), { type: "danger" });
@@ -477,256 +296,6 @@ patch(PosStore.prototype, {
                     }
                 },
                 
-                // Método auxiliar para procesar líneas de orden
-                _processOrderLines(lines, targetArray, changeType = null) {
-                    if (!lines || !Array.isArray(lines) || lines.length === 0) return;
-                    
-                    for (const line of lines) {
-                        console.log("Procesando línea de orden:", line);
-                        
-                        // Obtener cantidad correctamente
-                        let quantity = 1;
-                        if (typeof line.qty === 'number' && line.qty > 0) {
-                            quantity = line.qty;
-                            console.log("Cantidad obtenida de line.qty:", quantity);
-                        } else if (typeof line.quantity === 'number' && line.quantity > 0) {
-                            quantity = line.quantity;
-                            console.log("Cantidad obtenida de line.quantity:", quantity);
-                        } else if (typeof line.get_quantity === 'function') {
-                            try {
-                                quantity = line.get_quantity();
-                                console.log("Cantidad obtenida con get_quantity():", quantity);
-                            } catch (e) {
-                                console.error("Error al obtener cantidad con get_quantity():", e);
-                            }
-                        }
-                        
-                        // Procesar sides/extras si existen
-                        let sidesToAdd = this._processSides(line.sides);
-                        
-                        // Procesar atributos de combo si existen
-                        let comboInfo = this._processComboItems(line.combo_items);
-                        
-                        // Obtener nota del producto correctamente
-                        let productNote = '';
-                        if (typeof line.note === 'string' && line.note.trim() !== '') {
-                            productNote = line.note;
-                            console.log("Nota obtenida de line.note:", productNote);
-                        } else if (line.customer_note) {
-                            productNote = line.customer_note;
-                            console.log("Nota obtenida de line.customer_note:", productNote);
-                        } else if (line.client_note) {
-                            productNote = line.client_note;
-                            console.log("Nota obtenida de line.client_note:", productNote);
-                        } else if (line.comment) {
-                            productNote = line.comment;
-                            console.log("Nota obtenida de line.comment:", productNote);
-                        } else if (typeof line.get_note === 'function') {
-                            try {
-                                const note = line.get_note();
-                                if (note && note.trim() !== '') {
-                                    productNote = note;
-                                    console.log("Nota obtenida con get_note():", productNote);
-                                }
-                            } catch (e) {
-                                console.error("Error al obtener nota con get_note():", e);
-                            }
-                        }
-                        
-                        // Combinar nota original con sides y combo info
-                        let fullNote = productNote;
-                        if (sidesToAdd) {
-                            fullNote += (fullNote ? '\n' : '') + 'Extras: ' + sidesToAdd;
-                        }
-                        if (comboInfo) {
-                            fullNote += (fullNote ? '\n' : '') + 'Combo: ' + comboInfo;
-                        }
-                        
-                        // Verificar si hay atributos en el nombre del producto
-                        let productName = line.product_name || line.name || "Producto sin nombre";
-                        let attributes = line.attributes || [];
-                        
-                        // Intentar extraer atributos del nombre del producto si están entre paréntesis
-                        const attributesInName = this._extractAttributesFromName(productName);
-                        if (attributesInName) {
-                            console.log("Atributos encontrados en el nombre del producto:", attributesInName);
-                            // Si ya hay atributos en el nombre, añadirlos a la lista de atributos
-                            if (!attributes.includes(attributesInName)) {
-                                attributes.push(attributesInName);
-                            }
-                        } else if (attributes.length > 0) {
-                            // Si no hay atributos en el nombre pero tenemos atributos, añadirlos
-                            productName = `${productName} (${attributes.join(', ')})`;
-                        }
-                        
-                        console.log("Producto final:", productName, "Cantidad:", quantity, "Nota:", fullNote);
-                        
-                        targetArray.push({
-                            product_id: line.product_id,
-                            product_name: productName,
-                            qty: quantity,
-                            note: fullNote,
-                            price: line.price_with_tax || line.price,
-                            change_type: changeType,
-                            sides: line.sides || [],
-                            combo_items: line.combo_items || [],
-                            attributes: attributes
-                        });
-                    }
-                },
-                
-                // Método auxiliar para procesar sides/extras
-                _processSides(sides) {
-                    if (!sides || !Array.isArray(sides) || sides.length === 0) return '';
-                    
-                    console.log("Procesando sides:", sides);
-                    try {
-                        return sides.map(side => {
-                            // Manejar diferentes formatos de sides
-                            if (typeof side === 'string') {
-                                return `+ ${side}`;
-                            } else if (side && side.name) {
-                                return `+ ${side.name}`;
-                            } else if (side && side.product_name) {
-                                return `+ ${side.product_name}`;
-                            } else {
-                                console.log("Formato de side no reconocido:", side);
-                                return `+ Extra`;
-                            }
-                        }).join(', ');
-                    } catch (e) {
-                        console.error("Error al procesar sides:", e);
-                        if (typeof sides === 'string') {
-                            return sides;
-                        }
-                        return '';
-                    }
-                },
-                
-                // Método auxiliar para procesar items de combo
-                _processComboItems(comboItems) {
-                    if (!comboItems || !Array.isArray(comboItems) || comboItems.length === 0) return '';
-                    
-                    return comboItems.map(item => `${item.quantity || 1}x ${item.name}`).join(', ');
-                },
-                
-                // Método auxiliar para extraer información de mesa
-                _extractTableInfo(receiptData, orderData) {
-                    if (receiptData.table) {
-                        orderData.table = receiptData.table.name || receiptData.table;
-                        console.log("Mesa extraída del recibo:", orderData.table);
-                    } else if (receiptData.table_name) {
-                        orderData.table = receiptData.table_name;
-                        console.log("Mesa extraída de table_name:", orderData.table);
-                    }
-                },
-                
-                // Método auxiliar para extraer información de camarero
-                _extractServerInfo(receiptData, orderData) {
-                    if (receiptData.server) {
-                        orderData.server = receiptData.server.name || receiptData.server;
-                        console.log("Camarero extraído del recibo:", orderData.server);
-                    } else if (receiptData.server_name) {
-                        orderData.server = receiptData.server_name;
-                        console.log("Camarero extraído de server_name:", orderData.server);
-                    } else if (receiptData.cashier) {
-                        orderData.server = receiptData.cashier.name || receiptData.cashier;
-                        console.log("Camarero extraído de cashier:", orderData.server);
-                    } else if (receiptData.cashier_name) {
-                        orderData.server = receiptData.cashier_name;
-                        console.log("Camarero extraído de cashier_name:", orderData.server);
-                    }
-                },
-                
-                // Método auxiliar para extraer notas
-                _extractNotes(receiptData, orderData) {
-                    const noteSources = [
-                        'note', 'order_note', 'orderNote', 'comments', 
-                        'comment', 'customer_note', 'client_note'
-                    ];
-                    
-                    for (const source of noteSources) {
-                        if (receiptData[source]) {
-                            orderData.note = receiptData[source];
-                            console.log(`Nota extraída de ${source}:`, orderData.note);
-                            return;
-                        }
-                    }
-                    
-                    // Buscar en el objeto order dentro del recibo
-                    if (receiptData.order) {
-                        for (const source of noteSources) {
-                            if (receiptData.order[source]) {
-                                orderData.note = receiptData.order[source];
-                                console.log(`Nota extraída de order.${source}:`, orderData.note);
-                                return;
-                            }
-                        }
-                    }
-                },
-                
-                // Método para extraer atributos del nombre del producto
-                _extractAttributesFromName(productName) {
-                    if (!productName) return null;
-                    
-                    // Buscar texto entre paréntesis
-                    const match = productName.match(/\((.*?)\)/);
-                    if (match && match[1]) {
-                        return match[1].trim();
-                    }
-                    return null;
-                },
-                
-                // Método para obtener atributos del producto
-                _getProductAttributes(line) {
-                    try {
-                        // Intentar diferentes métodos para obtener atributos
-                        if (typeof line.get_attributes === 'function') {
-                            const attrs = line.get_attributes();
-                            if (attrs && attrs.length > 0) {
-                                return attrs.map(a => a.name || a.display_name || a.toString());
-                            }
-                        }
-                        
-                        // Buscar en propiedades comunes
-                        const attrProps = ['attributes', 'attribute_value_ids', 'attribute_values', 'variants'];
-                        for (const prop of attrProps) {
-                            if (line[prop] && Array.isArray(line[prop]) && line[prop].length > 0) {
-                                return line[prop].map(a => {
-                                    if (typeof a === 'string') return a;
-                                    return a.name || a.display_name || a.value || a.toString();
-                                });
-                            }
-                        }
-                        
-                        // Intentar obtener del producto
-                        if (typeof line.get_product === 'function' && line.get_product()) {
-                            const product = line.get_product();
-                            for (const prop of attrProps) {
-                                if (product[prop] && Array.isArray(product[prop]) && product[prop].length > 0) {
-                                    return product[prop].map(a => {
-                                        if (typeof a === 'string') return a;
-                                        return a.name || a.display_name || a.value || a.toString();
-                                    });
-                                }
-                            }
-                        }
-                        
-                        // Buscar en el full_product_name si existe
-                        if (line.full_product_name) {
-                            const attrs = this._extractAttributesFromName(line.full_product_name);
-                            if (attrs) {
-                                return attrs.split(',').map(a => a.trim());
-                            }
-                        }
-                        
-                        return null;
-                    } catch (e) {
-                        console.error("Error al obtener atributos del producto:", e);
-                        return null;
-                    }
-                },
-                
                 // Funciones requeridas por el POS
                 printReceipt: async function(receipt) {
                     console.log("Llamando a printReceipt con:", receipt);
@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+from . import test_backfill
+from . import test_http_endpoints
+from . import test_kitchen_tickets
+from . import test_pipeline_performance
+from . import test_preparation_tasks
+from . import test_project_routing
+from . import test_retention
+from . import test_task_description
+from . import test_task_jobs
+from . import test_ticket_buffer
+from . import test_ticket_numbers
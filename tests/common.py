@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+from itertools import cycle
+import time
+import uuid
+
+from odoo import Command
+from odoo.addons.point_of_sale.tests.common import TestPoSCommon
+
+# Tablas en las que escribe la creación de tareas desde el POS
+PIPELINE_TABLES = (
+    'pos_project_task_job',
+    'project_task',
+    'pos_project_ticket',
+    'pos_project_ticket_line',
+)
+
+
+class PosProjectCommon(TestPoSCommon):
+    """TPV con la integración de proyectos activa y órdenes sintéticas de cualquier tamaño"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.config = cls.basic_config
+        cls.project = cls.env['project.project'].create({'name': 'Cocina'})
+        cls.config.write({'enable_project_integration': True, 'project_id': cls.project.id})
+        cls.pos_category = cls.env['pos.category'].create({'name': 'Cocina'})
+        cls.pos_products = [
+            cls.create_product(f'Producto POS {index}', cls.categ_basic, 10.0 + index)
+            for index in range(5)
+        ]
+        for product in cls.pos_products:
+            product.pos_categ_ids = [Command.set(cls.pos_category.ids)]
+        cls.printer = cls.env['pos.printer'].create({
+            'name': 'Cocina',
+            'printer_type': 'project',
+            'project_id': cls.project.id,
+            'product_categories_ids': [Command.set(cls.pos_category.ids)],
+        })
+        cls.config.write({'is_order_printer': True, 'printer_ids': [Command.set(cls.printer.ids)]})
+        cls.Service = cls.env['pos.project.task.service'].sudo()
+
+    def create_orders(self, sizes):
+        """
+        Sincroniza desde el POS una orden pagada por cada tamaño, con ese número
+        de líneas, en la sesión abierta con ``open_new_session``
+
+        :return: recordset de ``pos.order`` en el mismo orden que ``sizes``
+        """
+        products = cycle(self.pos_products)
+        orders_data = [
+            self.create_ui_order_data([(next(products), 1) for _index in range(size)])
+            for size in sizes
+        ]
+        result = self.env['pos.order'].sync_from_ui(orders_data)
+        return self.env['pos.order'].browse([order['id'] for order in result['pos.order']])
+
+    def make_ticket(self, size=3, **values):
+        """
+        Ticket de preparación de la impresora de proyecto en el formato compacto
+        que envía el POS, con una orden y una clave de idempotencia nuevas
+        """
+        products = cycle(self.pos_products)
+        ticket = {
+            'name': 'Order 00001-001-0001',
+            'request_key': str(uuid.uuid4()),
+            'order_uid': str(uuid.uuid4()),
+            'config_id': self.config.id,
+            'printer_id': self.printer.id,
+            'is_new_order': True,
+            'order_lines': [{
+                'product_id': next(products).id,
+                'qty': 1,
+                'note': '',
+                'change_type': 'new',
+            } for _index in range(size)],
+        }
+        ticket.update(values)
+        return ticket
+
+    def count_rows(self, tables=PIPELINE_TABLES):
+        """Número de filas de cada tabla, con las escrituras pendientes ya vaciadas"""
+        self.env.flush_all()
+        self.cr.execute(' UNION ALL '.join(f"SELECT '{table}', count(*) FROM {table}" for table in tables))
+        return dict(self.cr.fetchall())
+
+    def rows_written(self, before, tables=PIPELINE_TABLES):
+        """Filas añadidas a cada tabla desde el recuento ``before``"""
+        after = self.count_rows(tables)
+        return {table: after[table] - before[table] for table in tables}
+
+    def measure(self, func):
+        """
+        Ejecuta ``func`` vaciando antes y después las escrituras pendientes
+
+        :return: tupla ``(resultado, milisegundos, consultas SQL)``
+        """
+        self.env.flush_all()
+        start, count = time.perf_counter(), self.cr.sql_log_count
+        result = func()
+        self.env.flush_all()
+        return result, (time.perf_counter() - start) * 1000, self.cr.sql_log_count - count
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+from odoo.tests import tagged
+
+from .common import PosProjectCommon
+
+
+@tagged('post_install', '-at_install')
+class TestBackfill(PosProjectCommon):
+
+    def setUp(self):
+        super().setUp()
+        self.open_new_session()
+        self.orders = self.create_orders([2, 2])
+        self.Job = self.env['pos.project.task.job'].sudo()
+        # Descartar los trabajos encolados por la sincronización, como si ya se hubieran procesado
+        self.Job.search([('order_id', 'in', self.orders.ids)]).unlink()
+        self.domain = self.env['pos.order']._get_project_backfill_domain(session_ids=self.pos_session.ids)
+
+    def test_orders_in_history_are_not_backfilled(self):
+        first, second = self.orders
+        task_id = self.Service._create_tasks_for_orders(first)[first.id]['task_id']
+        self.env['pos.project.task.history']._move_to_history(self.env['project.task'].browse(task_id))
+
+        self.assertEqual(self.Job._enqueue_domain(self.domain), 1)
+        self.assertEqual(self.Job.search([('order_id', 'in', self.orders.ids)]).order_id, second)
+
+        results = self.Service._create_tasks_for_orders(self.orders, backfill=True)
+        self.assertTrue(results[first.id]['duplicate'])
+        self.assertFalse(results[first.id]['task_id'])
+        self.assertFalse(first.project_task_ids)
+        self.assertEqual(len(second.project_task_ids), 1)
+
+    def test_wizard_jobs_create_closed_tasks(self):
+        open_stage, done_stage = self.env['project.task.type'].create([
+            {'name': 'En preparación', 'sequence': 1, 'project_ids': [self.project.id]},
+            {'name': 'Servido', 'sequence': 2, 'fold': True, 'project_ids': [self.project.id]},
+        ])
+        wizard = self.env['pos.project.task.backfill'].create({'session_ids': [self.pos_session.id]})
+        wizard.action_enqueue()
+        jobs = self.Job.search([('order_id', 'in', self.orders.ids)])
+        self.assertEqual(len(jobs), 2)
+        self.assertTrue(all(jobs.mapped('backfill')))
+
+        notifications = self.env['bus.bus'].sudo().search_count([])
+        jobs._process()
+        self.assertEqual(set(jobs.mapped('state')), {'done'})
+        self.assertEqual(self.env['bus.bus'].sudo().search_count([]), notifications)
+
+        tasks = jobs.task_id
+        self.assertEqual(tasks.stage_id, done_stage)
+        self.assertNotEqual(tasks.stage_id, open_stage)
+        if 'state' in tasks._fields:
+            self.assertEqual(set(tasks.mapped('state')), {'1_done'})
+        snapshot = self.env['project.task']._get_pos_kitchen_tickets(self.project.id)
+        self.assertFalse({ticket['id'] for ticket in snapshot['tickets']} & set(tasks.ids))
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import time
+
+from odoo.tests import HttpCase, tagged
+
+from ..tools.load_test import percentile
+from .common import PosProjectCommon
+
+_logger = logging.getLogger(__name__)
+
+
+@tagged('post_install', '-at_install', 'pos_project_performance')
+class TestHttpEndpoints(PosProjectCommon, HttpCase):
+    """
+    Endpoints JSON del módulo, uno a uno y con llamadas simultáneas. En las
+    pruebas HTTP todas las peticiones comparten el cursor de la prueba, que las
+    serializa: las llamadas simultáneas comprueban la idempotencia y la
+    unicidad de las tareas, no el paralelismo real de PostgreSQL.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.authenticate('admin', 'admin')
+
+    def _request(self, route, params):
+        start = time.perf_counter()
+        result = self.make_jsonrpc_request(f'/pos_project_integration/{route}', params)
+        return result, (time.perf_counter() - start) * 1000
+
+    def _call(self, route, params):
+        response = self._request(route, params)
+        # Los registros escritos por la petición no están en la caché de la prueba
+        self.env.invalidate_all()
+        return response
+
+    def _call_concurrently(self, calls, workers=8):
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            responses = list(executor.map(lambda call: self._request(*call), calls))
+        self.env.invalidate_all()
+        return responses
+
+    def _report(self, name, responses):
+        timings = [elapsed for _result, elapsed in responses]
+        _logger.info("%s: p50 %.1f ms, p95 %.1f ms", name, percentile(timings, 50), percentile(timings, 95))
+
+    def test_create_task(self):
+        self.open_new_session()
+        order = self.create_orders([5])
+
+        result, _elapsed = self._call('create_task', {'order_id': order.id})
+        self.assertTrue(result['success'])
+        self.assertEqual(order.project_task_ids.ids, [result['task_id']])
+
+        result, _elapsed = self._call('create_task', {'order_id': order.id})
+        self.assertTrue(result['duplicate'])
+        self.assertEqual(len(order.project_task_ids), 1)
+
+    def test_create_task_concurrent(self):
+        self.open_new_session()
+        orders = self.create_orders([5, 5, 5])
+
+        responses = self._call_concurrently([
+            ('create_task', {'order_id': order.id}) for order in orders for _index in range(5)
+        ])
+        self._report("create_task simultáneo", responses)
+        self.assertTrue(all(result['success'] for result, _elapsed in responses))
+        for order in orders:
+            self.assertEqual(len(order.project_task_ids), 1)
+
+    def test_create_preparation_task(self):
+        before = self.count_rows()
+        responses = [self._call('create_preparation_task', {'order_data': self.make_ticket(size=4)}) for _index in range(5)]
+        self._report("create_preparation_task", responses)
+
+        self.assertTrue(all(result['success'] for result, _elapsed in responses))
+        rows = self.rows_written(before)
+        self.assertEqual(rows['project_task'], 5)
+        self.assertEqual(rows['pos_project_ticket'], 5)
+        self.assertEqual(rows['pos_project_ticket_line'], 20)
+
+    def test_create_preparation_task_concurrent_replays(self):
+        # El mismo ticket reenviado varias veces a la vez crea una sola tarea
+        tickets = [self.make_ticket() for _index in range(3)]
+        before = self.count_rows()
+        responses = self._call_concurrently([
+            ('create_preparation_task', {'order_data': dict(ticket)}) for ticket in tickets for _index in range(4)
+        ])
+        self._report("create_preparation_task simultáneo", responses)
+
+        self.assertTrue(all(result['success'] for result, _elapsed in responses))
+        self.assertEqual(len({result['task_id'] for result, _elapsed in responses}), 3)
+        rows = self.rows_written(before)
+        self.assertEqual(rows['project_task'], 3)
+        self.assertEqual(rows['pos_project_ticket'], 3)
+
+    def test_create_preparation_tasks_batch(self):
+        before = self.count_rows()
+        orders_data = [self.make_ticket(size=2) for _index in range(8)] + [None]
+        result, elapsed = self._call('create_preparation_tasks', {'orders_data': orders_data})
+        self._report("create_preparation_tasks (8 tickets)", [(result, elapsed)])
+
+        self.assertEqual(len(result['results']), 9)
+        self.assertTrue(all(item['success'] for item in result['results'][:8]))
+        self.assertFalse(result['results'][8]['success'])
+        rows = self.rows_written(before)
+        self.assertEqual(rows['project_task'], 8)
+        self.assertEqual(rows['pos_project_ticket_line'], 16)
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+from odoo.tests import new_test_user, tagged
+
+from .common import PosProjectCommon
+
+
+@tagged('post_install', '-at_install')
+class TestKitchenTickets(PosProjectCommon):
+
+    def setUp(self):
+        super().setUp()
+        results = self.Service._create_tasks_for_tickets([self.make_ticket(size=2) for _index in range(5)])
+        self.tasks = self.env['project.task'].browse([result['task_id'] for result in results])
+        self.Task = self.env['project.task']
+
+    def _read_all_pages(self, Task, limit):
+        """Recorre las páginas del cursor desde la instantánea inicial"""
+        pages = [Task._get_pos_kitchen_tickets(self.project.id, limit=limit)]
+        while pages[-1]['has_more']:
+            pages.append(Task._get_pos_kitchen_tickets(self.project.id, cursor=pages[-1]['cursor'], limit=limit))
+        return pages
+
+    def test_cursor_pages_across_equal_write_dates(self):
+        self.env.flush_all()
+        # Todas las tareas se crean en la misma transacción, con el mismo write_date
+        self.assertEqual(len(set(self.tasks.mapped('write_date'))), 1)
+
+        pages = self._read_all_pages(self.Task, limit=2)
+        self.assertEqual([len(page['tickets']) for page in pages], [2, 2, 1])
+        ids = [ticket['id'] for page in pages for ticket in page['tickets']]
+        self.assertEqual(ids, sorted(self.tasks.ids))
+        self.assertTrue(all(ticket['open'] for page in pages for ticket in page['tickets']))
+
+        # El último cursor no devuelve nada más hasta que cambia alguna tarea
+        last = self.Task._get_pos_kitchen_tickets(self.project.id, cursor=pages[-1]['cursor'], limit=2)
+        self.assertEqual(last['tickets'], [])
+        self.assertEqual(last['cursor'], pages[-1]['cursor'])
+        self.assertFalse(last['has_more'])
+
+    def test_malformed_cursor(self):
+        for cursor in ('garbage', 'no-es-una-fecha|5', f"{self.tasks[0].write_date.isoformat()}|abc", '|'):
+            with self.assertRaises(ValueError):
+                self.Task._get_pos_kitchen_tickets(self.project.id, cursor=cursor)
+
+    def test_tasks_of_inaccessible_project_are_filtered(self):
+        self.project.privacy_visibility = 'followers'
+        user = new_test_user(self.env, login='pantalla_cocina', groups='base.group_user,project.group_project_user')
+        Task = self.Task.with_user(user)
+
+        pages = self._read_all_pages(Task, limit=2)
+        self.assertEqual([page['tickets'] for page in pages], [[], [], []])
+        # El cursor avanza aunque el usuario no pueda ver las tareas
+        self.assertTrue(pages[-1]['cursor'])
+
+        self.project.message_subscribe(partner_ids=user.partner_id.ids)
+        pages = self._read_all_pages(Task, limit=2)
+        self.assertEqual([ticket['id'] for page in pages for ticket in page['tickets']], sorted(self.tasks.ids))
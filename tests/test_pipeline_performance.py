@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+import logging
+
+from odoo.tests import tagged
+
+from ..tools.load_test import percentile
+from .common import PosProjectCommon
+
+_logger = logging.getLogger(__name__)
+
+
+@tagged('post_install', '-at_install', 'pos_project_performance')
+class TestPipelinePerformance(PosProjectCommon):
+    """
+    Latencia, consultas SQL y filas escritas de la creación de tareas. Las
+    latencias solo se informan en el log; las pruebas comprueban que las
+    consultas no crecen con el número de líneas y las filas escritas por ticket.
+    """
+
+    def _report(self, name, timings, queries):
+        _logger.info(
+            "%s: p50 %.1f ms, p95 %.1f ms, %s consultas",
+            name, percentile(timings, 50), percentile(timings, 95), queries,
+        )
+
+    def test_process_order_only_enqueues(self):
+        self.open_new_session()
+        before = self.count_rows()
+        timings = []
+        for size in (5, 50):
+            for _run in range(5):
+                _orders, elapsed, _queries = self.measure(lambda: self.create_orders([size]))
+                timings.append(elapsed)
+        self._report("Sincronización de órdenes", timings, '-')
+
+        # La sincronización solo encola un trabajo por orden; la tarea se crea fuera de ella
+        rows = self.rows_written(before)
+        self.assertEqual(rows['pos_project_task_job'], 10)
+        self.assertEqual(rows['project_task'], 0)
+
+    def test_order_task_queries_independent_of_lines(self):
+        self.open_new_session()
+        Job = self.env['pos.project.task.job'].sudo()
+        # Primera tarea del TPV: crea la secuencia de tickets de la estación
+        warmup = self.create_orders([1])
+        Job.search([('order_id', '=', warmup.id)])._process()
+
+        queries = {}
+        for size in (5, 50):
+            order = self.create_orders([size])
+            job = Job.search([('order_id', '=', order.id)])
+            before = self.count_rows()
+            _result, elapsed, queries[size] = self.measure(job._process)
+            self._report(f"Tarea de una orden de {size} líneas", [elapsed], queries[size])
+            self.assertEqual(job.state, 'done')
+            self.assertEqual(self.rows_written(before)['project_task'], 1)
+            self.assertEqual(order.project_task_ids, job.task_id)
+        self.assertEqual(queries[5], queries[50])
+
+    def test_preparation_queries_independent_of_lines(self):
+        self.Service._create_tasks_for_tickets([self.make_ticket()])
+
+        queries = {}
+        for size in (5, 50):
+            timings = []
+            for _run in range(10):
+                _results, elapsed, queries[size] = self.measure(
+                    lambda: self.Service._create_tasks_for_tickets([self.make_ticket(size=size)])
+                )
+                timings.append(elapsed)
+            self._report(f"Ticket de preparación de {size} líneas", timings, queries[size])
+        self.assertEqual(queries[5], queries[50])
+
+    def test_preparation_rows_per_ticket(self):
+        self.Service._create_tasks_for_tickets([self.make_ticket()])
+
+        before = self.count_rows()
+        tickets = [self.make_ticket(size=4) for _index in range(10)]
+        results, elapsed, queries = self.measure(lambda: self.Service._create_tasks_for_tickets(tickets))
+        self._report("Lote de 10 tickets de preparación", [elapsed], queries)
+
+        self.assertTrue(all(result['success'] for result in results))
+        rows = self.rows_written(before)
+        self.assertEqual(rows['project_task'], 10)
+        self.assertEqual(rows['pos_project_ticket'], 10)
+        self.assertEqual(rows['pos_project_ticket_line'], 40)
+        self.assertEqual(rows['pos_project_task_job'], 0)
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+from odoo import Command
+from odoo.tests import tagged
+
+from ..tools import metrics
+from .common import PosProjectCommon
+
+
+@tagged('post_install', '-at_install')
+class TestPreparationTasks(PosProjectCommon):
+
+    def test_invalid_tickets_do_not_fail_the_batch(self):
+        fan_out = self.make_ticket(fan_out=True, printer_id=False)
+        results = self.Service._create_tasks_for_tickets([None, self.make_ticket(), 'ticket', fan_out, {}])
+
+        self.assertEqual(len(results), 5)
+        for index in (0, 2, 4):
+            self.assertFalse(results[index]['success'])
+        self.assertTrue(results[1]['success'])
+        self.assertTrue(results[1]['task_id'])
+        self.assertTrue(results[3]['success'])
+        self.assertEqual(len(results[3]['task_ids']), 1)
+
+        tasks = self.env['project.task'].browse([results[1]['task_id'], results[3]['task_id']])
+        self.assertEqual(tasks.project_id, self.project)
+        self.assertEqual(tasks.pos_printer_id, self.printer)
+
+    def test_incremental_ticket_appends_to_existing_task(self):
+        self.printer.project_incremental_tasks = True
+        first = self.make_ticket(size=2)
+        change = self.make_ticket(
+            size=1, order_uid=first['order_uid'], is_new_order=False, is_change_order=True,
+        )
+        Task = self.env['project.task']
+        key = Task._pos_station_task_key(first['order_uid'], self.printer.id)
+
+        first_result = self.Service._create_tasks_for_tickets([first])[0]
+        self.assertTrue(first_result['success'])
+        task = Task.browse(first_result['task_id'])
+        self.assertEqual(task.pos_task_key, key)
+
+        change_result = self.Service._create_tasks_for_tickets([change])[0]
+        self.assertTrue(change_result['success'])
+        self.assertTrue(change_result.get('updated'))
+        self.assertEqual(change_result['task_id'], task.id)
+        self.assertEqual(Task.search_count([('pos_task_key', '=', key)]), 1)
+
+        tickets = self.env['pos.project.ticket'].search([('task_id', '=', task.id)])
+        self.assertEqual(len(tickets), 2)
+        self.assertEqual(len(tickets.line_ids), 3)
+        self.assertEqual(tickets.filtered(lambda ticket: ticket.kind == 'change').line_ids.mapped('change_type'), ['new'])
+
+        # Sin modo incremental, un nuevo ticket de la misma orden crea otra tarea
+        self.printer.project_incremental_tasks = False
+        other = self.make_ticket(size=1, order_uid=first['order_uid'], is_new_order=False, is_change_order=True)
+        other_result = self.Service._create_tasks_for_tickets([other])[0]
+        self.assertTrue(other_result['success'])
+        self.assertNotEqual(other_result['task_id'], task.id)
+
+    def test_fan_out_full_order_for_non_incremental_stations(self):
+        bar = self.env['pos.printer'].create({
+            'name': 'Barra',
+            'printer_type': 'project',
+            'project_id': self.project.id,
+            'project_incremental_tasks': True,
+            'product_categories_ids': [Command.set(self.pos_category.ids)],
+        })
+        self.config.printer_ids = [Command.link(bar.id)]
+        first_product, second_product, third_product = self.pos_products[:3]
+
+        def line(product, qty, uuid, change_type=None, change_qty=None):
+            values = {'uuid': uuid, 'product_id': product.id, 'qty': qty, 'note': '', 'change_type': change_type}
+            if change_type:
+                values['change_qty'] = qty if change_qty is None else change_qty
+            return values
+
+        first = self.make_ticket(fan_out=True, printer_id=False, order_lines=[
+            line(first_product, 1, 'line-1', 'new'),
+            line(second_product, 2, 'line-2', 'new'),
+        ])
+        # Segunda ronda: una unidad más de la segunda línea y un producto nuevo
+        second = self.make_ticket(
+            fan_out=True, printer_id=False, order_uid=first['order_uid'],
+            is_new_order=False, is_change_order=True, is_added_order=True,
+            order_lines=[
+                line(first_product, 1, 'line-1'),
+                line(second_product, 3, 'line-2', 'new', change_qty=1),
+                line(third_product, 1, 'line-3', 'new'),
+            ],
+        )
+        first_result, second_result = [self.Service._create_tasks_for_tickets([ticket])[0] for ticket in (first, second)]
+        self.assertTrue(first_result['success'])
+        self.assertTrue(second_result['success'])
+        self.assertEqual(len(first_result['task_ids']), 2)
+        self.assertEqual(len(second_result['task_ids']), 2)
+
+        Ticket = self.env['pos.project.ticket']
+        kitchen_tickets = Ticket.search([('printer_id', '=', self.printer.id), ('order_uuid', '=', first['order_uid'])])
+        bar_tickets = Ticket.search([('printer_id', '=', bar.id), ('order_uuid', '=', first['order_uid'])])
+        self.assertEqual(len(kitchen_tickets), 2)
+        self.assertEqual(len(bar_tickets), 2)
+
+        # La estación normal recibe la orden completa en una tarea nueva, sin marcas de cambio
+        kitchen_second = kitchen_tickets.sorted('id')[-1]
+        self.assertEqual(kitchen_second.kind, 'new')
+        self.assertEqual(len(kitchen_tickets.task_id), 2)
+        self.assertEqual(
+            sorted((ticket_line.product_id.id, ticket_line.qty) for ticket_line in kitchen_second.line_ids),
+            sorted([(first_product.id, 1), (second_product.id, 3), (third_product.id, 1)]),
+        )
+        self.assertFalse(any(kitchen_second.line_ids.mapped('change_type')))
+
+        # La estación incremental solo recibe los cambios, en su tarea existente
+        bar_second = bar_tickets.sorted('id')[-1]
+        self.assertEqual(len(bar_tickets.task_id), 1)
+        self.assertEqual(
+            sorted((ticket_line.product_id.id, ticket_line.qty) for ticket_line in bar_second.line_ids),
+            sorted([(second_product.id, 1), (third_product.id, 1)]),
+        )
+        self.assertEqual(set(bar_second.line_ids.mapped('change_type')), {'new'})
+
+    def test_stages_recorded_once_per_request(self):
+        def counts():
+            timers = metrics.snapshot()['timers']
+            return {stage: timers.get(stage, {}).get('count', 0) for stage in ('parse', 'create', 'link')}
+
+        before = counts()
+        results = self.Service._create_tasks_for_tickets([self.make_ticket(), self.make_ticket()])
+        self.assertTrue(all(result['success'] for result in results))
+        after = counts()
+        self.assertEqual({stage: after[stage] - before[stage] for stage in after}, {'parse': 1, 'create': 1, 'link': 1})
+
+    def test_fast_tasks_write_no_mail_rows(self):
+        mail_tables = ('mail_message', 'mail_followers')
+        self.Service._create_tasks_for_tickets([self.make_ticket()])
+
+        # Modo normal: la creación deja mensajes y seguidores en el chatter
+        before = self.count_rows(mail_tables)
+        result = self.Service._create_tasks_for_tickets([self.make_ticket()])[0]
+        self.assertTrue(result['success'])
+        rows = self.rows_written(before, mail_tables)
+        self.assertTrue(rows['mail_message'] or rows['mail_followers'])
+
+        # Modo rápido de la impresora
+        self.printer.project_fast_tasks = True
+        before = self.count_rows(mail_tables)
+        results = self.Service._create_tasks_for_tickets([self.make_ticket(), self.make_ticket(size=5)])
+        self.assertTrue(all(result['success'] for result in results))
+        self.assertEqual(self.rows_written(before, mail_tables), {'mail_message': 0, 'mail_followers': 0})
+
+        # Modo rápido del TPV, también para las tareas de las órdenes
+        self.printer.project_fast_tasks = False
+        self.config.project_fast_tasks = True
+        self.open_new_session()
+        orders = self.create_orders([2, 3])
+        jobs = self.env['pos.project.task.job'].sudo().search([('order_id', 'in', orders.ids)])
+        before = self.count_rows(mail_tables)
+        self.Service._create_tasks_for_tickets([self.make_ticket()])
+        jobs._process()
+        self.assertEqual(set(jobs.mapped('state')), {'done'})
+        self.assertEqual(len(jobs.task_id), 2)
+        self.assertEqual(self.rows_written(before, mail_tables), {'mail_message': 0, 'mail_followers': 0})
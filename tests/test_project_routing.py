@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+from odoo.tests import tagged
+
+from .common import PosProjectCommon
+
+
+@tagged('post_install', '-at_install')
+class TestProjectRouting(PosProjectCommon):
+
+    def test_reparented_category_changes_routing(self):
+        category = self.env['pos.category'].create({'name': 'Postres'})
+        self.assertNotIn(str(category.id), self.config._get_project_routing()['categories'])
+
+        category.parent_id = self.pos_category
+        self.assertEqual(self.config._get_project_routing()['categories'][str(category.id)], (self.printer.id,))
+
+        category.parent_id = False
+        self.assertNotIn(str(category.id), self.config._get_project_routing()['categories'])
+
+    def test_only_routing_changes_invalidate_routing(self):
+        version = self.config.project_routing_version
+        self.printer.name = 'Cocina caliente'
+        self.assertEqual(self.config.project_routing_version, version)
+        self.env['pos.printer'].create({'name': 'Barra'})
+        self.assertEqual(self.config.project_routing_version, version)
+
+        self.printer.project_incremental_tasks = True
+        self.assertNotEqual(self.config.project_routing_version, version)
+        self.assertTrue(self.config._get_project_printer_route(self.printer.id)['incremental'])
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+from datetime import timedelta
+from unittest.mock import patch
+
+from odoo import fields
+from odoo.tests import tagged
+
+from .common import PosProjectCommon
+
+
+@tagged('post_install', '-at_install')
+class TestRetention(PosProjectCommon):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.other_project = cls.env['project.project'].create({'name': 'Barra'})
+        cls.done_stage = cls.env['project.task.type'].create({
+            'name': 'Servido',
+            'fold': True,
+            'project_ids': [cls.project.id, cls.other_project.id],
+        })
+        # Dos TPV comparten el proyecto de cocina; el de barra tiene su propio proyecto
+        cls.config.write({'project_task_retention_days': 10, 'project_task_retention_mode': 'history'})
+        cls.env['pos.config'].create([{
+            'name': 'Terraza',
+            'enable_project_integration': True,
+            'project_id': cls.project.id,
+            'project_task_retention_days': 30,
+            'project_task_retention_mode': 'archive',
+        }, {
+            'name': 'Barra',
+            'enable_project_integration': True,
+            'project_id': cls.other_project.id,
+            'project_task_retention_days': 5,
+            'project_task_retention_mode': 'history',
+        }])
+
+    def _create_task(self, project, closed_days_ago=None, closed=True):
+        """Tarea de preparación del proyecto, cerrada (o no) hace ``closed_days_ago`` días"""
+        result = self.Service._create_tasks_for_tickets([self.make_ticket(size=2, project_id=project.id)])[0]
+        task = self.env['project.task'].browse(result['task_id'])
+        if closed:
+            task.stage_id = self.done_stage
+        if closed_days_ago is not None:
+            self.env.flush_all()
+            self.cr.execute(
+                "UPDATE project_task SET date_last_stage_update = %s WHERE id = %s",
+                (fields.Datetime.now() - timedelta(days=closed_days_ago), task.id),
+            )
+            task.invalidate_recordset(['date_last_stage_update'])
+        return task
+
+    def test_retention_policies(self):
+        policies = self.env['pos.project.task.history']._get_retention_policies()
+        # Proyecto compartido: el mayor número de días y el archivado antes que el histórico
+        self.assertEqual(policies[self.project.id], (30, 'archive'))
+        self.assertEqual(policies[self.other_project.id], (5, 'history'))
+
+    def test_cron_applies_each_project_policy(self):
+        kitchen_old = self._create_task(self.project, closed_days_ago=40)
+        kitchen_recent = self._create_task(self.project, closed_days_ago=20)
+        kitchen_open = self._create_task(self.project, closed_days_ago=40, closed=False)
+        bar_old = self._create_task(self.other_project, closed_days_ago=10)
+        bar_recent = self._create_task(self.other_project, closed_days_ago=2)
+        bar_ref = bar_old.id
+
+        History = self.env['pos.project.task.history']
+        Task = type(self.env['project.task'])
+        unlink = Task.unlink
+        history_before_unlink = []
+
+        def _unlink(tasks):
+            history_before_unlink.append(History.search_count([('task_ref', 'in', tasks.ids)]))
+            return unlink(tasks)
+
+        with patch.object(Task, 'unlink', _unlink):
+            processed = History._cron_apply_retention(auto_commit=False)
+        self.assertEqual(processed, 2)
+        # La fila del histórico ya existía al eliminar la tarea
+        self.assertEqual(history_before_unlink, [1])
+
+        # Cocina: retención de 30 días archivando
+        self.assertFalse(kitchen_old.active)
+        self.assertTrue(kitchen_recent.active)
+        self.assertTrue(kitchen_open.active)
+        self.assertFalse(History.search_count([('task_ref', 'in', (kitchen_old | kitchen_recent | kitchen_open).ids)]))
+
+        # Barra: retención de 5 días moviendo al histórico
+        self.assertFalse(bar_old.exists())
+        self.assertTrue(bar_recent.exists())
+        history = History.search([('task_ref', '=', bar_ref)])
+        self.assertEqual(len(history), 1)
+        self.assertEqual(history.project_id, self.other_project)
+        self.assertEqual(history.stage_name, self.done_stage.name)
+        self.assertEqual(len(history.summary.splitlines()), 2)
+
+    def test_closed_states_count_as_closed(self):
+        if 'state' not in self.env['project.task']._fields:
+            self.skipTest("project.task no tiene estado en esta versión")
+        task = self._create_task(self.other_project, closed=False)
+        task.state = '1_canceled'
+        self.env.flush_all()
+        self.cr.execute(
+            "UPDATE project_task SET date_last_stage_update = %s WHERE id = %s",
+            (fields.Datetime.now() - timedelta(days=10), task.id),
+        )
+        task_ref = task.id
+        self.env['pos.project.task.history']._cron_apply_retention(auto_commit=False)
+        self.assertFalse(task.exists())
+        self.assertTrue(self.env['pos.project.task.history'].search_count([('task_ref', '=', task_ref)]))
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+from odoo import Command
+from odoo.tests import tagged
+
+from .common import PosProjectCommon
+
+
+@tagged('post_install', '-at_install')
+class TestTaskDescription(PosProjectCommon):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.sale_tax = cls.env['account.tax'].create({
+            'name': 'IVA 21%',
+            'amount': 21.0,
+            'amount_type': 'percent',
+            'type_tax_use': 'sale',
+        })
+        for product in cls.pos_products:
+            product.taxes_id = [Command.set(cls.sale_tax.ids)]
+
+    def _count_queries(self, orders):
+        self.env.flush_all()
+        self.env.invalidate_all()
+        start = self.cr.sql_log_count
+        orders._prepare_task_descriptions()
+        return self.cr.sql_log_count - start
+
+    def test_query_count_independent_of_lines(self):
+        self.open_new_session()
+        small, large = self.create_orders([5, 500])
+        # Las etiquetas traducidas se resuelven una vez por idioma en la caché del registro
+        small._prepare_task_descriptions()
+
+        expected = self._count_queries(small)
+        self.assertEqual(self._count_queries(large), expected)
+
+        self.env.invalidate_all()
+        with self.assertQueryCount(expected):
+            descriptions = large._prepare_task_descriptions()
+        self.assertEqual(descriptions[large.id].count('<tr>'), 500)
+
+    def test_query_count_independent_of_orders(self):
+        self.open_new_session()
+        orders = self.create_orders([5, 500, 50])
+        orders[0]._prepare_task_descriptions()
+
+        expected = self._count_queries(orders[0])
+        self.assertEqual(self._count_queries(orders), expected)
+
+        self.env.invalidate_all()
+        with self.assertQueryCount(expected):
+            descriptions = orders._prepare_task_descriptions()
+        self.assertEqual(set(descriptions), set(orders.ids))
+        for order, size in zip(orders, (5, 500, 50)):
+            self.assertEqual(descriptions[order.id].count('<tr>'), size)
+            self.assertIn(order.name, descriptions[order.id])
+
+    def test_compact_ticket_query_count_independent_of_products(self):
+        products = self.pos_products + [
+            self.create_product(f'Producto con impuestos {index}', self.categ_basic, 3.0 + index)
+            for index in range(10)
+        ]
+        for product in products:
+            product.taxes_id = [Command.set(self.sale_tax.ids)]
+        Ticket = self.env['pos.project.ticket']
+
+        def make_ticket(count):
+            return self.make_ticket(order_lines=[{
+                'product_id': product.id,
+                'qty': 2,
+                'note': '',
+                'change_type': 'new',
+                'price_unit': 12.1,
+                'sides': ['Patatas', 'Ensalada'],
+            } for product in products[:count]])
+
+        def count_queries(tickets):
+            self.env.flush_all()
+            self.env.invalidate_all()
+            start = self.cr.sql_log_count
+            Ticket._resolve_order_data(tickets)
+            return self.cr.sql_log_count - start
+
+        expected = count_queries([make_ticket(2)])
+        tickets = [make_ticket(len(products)), make_ticket(5)]
+        self.assertEqual(count_queries(tickets), expected)
+
+        # El precio es el que envía el POS, con impuestos y la tarifa de la orden, y se conservan los extras
+        lines = tickets[0]['order_lines']
+        self.assertEqual(len(lines), len(products))
+        for line, product in zip(lines, products):
+            self.assertEqual(line['product_id'], product.id)
+            self.assertAlmostEqual(line['price'], 24.2)
+            self.assertEqual(line['sides'], ['Patatas', 'Ensalada'])
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+from unittest.mock import patch
+
+from odoo.tests import tagged
+
+from .common import PosProjectCommon
+
+
+@tagged('post_install', '-at_install')
+class TestTaskJobs(PosProjectCommon):
+
+    def setUp(self):
+        super().setUp()
+        self.open_new_session()
+        self.Job = self.env['pos.project.task.job'].sudo()
+
+    def test_poisoned_job_does_not_fail_its_batch(self):
+        orders = self.create_orders([2, 2, 2])
+        jobs = self.Job.search([('order_id', 'in', orders.ids)])
+        self.assertEqual(len(jobs), 3)
+        poisoned = jobs.filtered(lambda job: job.order_id == orders[1])
+
+        Service = type(self.env['pos.project.task.service'])
+        prepare_vals = Service._prepare_order_task_vals
+
+        def _prepare_order_task_vals(service, values, *args, **kwargs):
+            if values['id'] == poisoned.order_id.id:
+                raise ValueError("Orden envenenada")
+            return prepare_vals(service, values, *args, **kwargs)
+
+        with patch.object(Service, '_prepare_order_task_vals', _prepare_order_task_vals):
+            jobs._process()
+
+        healthy = jobs - poisoned
+        self.assertEqual(set(healthy.mapped('state')), {'done'})
+        self.assertEqual(healthy.mapped('attempts'), [1, 1])
+        self.assertEqual(len(healthy.task_id), 2)
+        self.assertEqual(poisoned.state, 'failed')
+        self.assertEqual(poisoned.attempts, 1)
+        self.assertIn("Orden envenenada", poisoned.last_error)
+        self.assertFalse(poisoned.task_id)
+        self.assertFalse(poisoned.order_id.project_task_ids)
+
+    def test_job_links_preparation_tasks_sent_before_sync(self):
+        order_data = self.create_ui_order_data([(self.pos_products[0], 1)])
+        result = self.Service._create_tasks_for_tickets([self.make_ticket(order_uid=order_data['uuid'])])[0]
+        self.assertTrue(result['success'])
+        task = self.env['project.task'].browse(result['task_id'])
+        self.assertFalse(task.pos_order_id)
+
+        # La sincronización no toca las tareas de preparación: las vincula la cola
+        synced = self.env['pos.order'].sync_from_ui([order_data])
+        order = self.env['pos.order'].browse(synced['pos.order'][0]['id'])
+        self.assertFalse(task.pos_order_id)
+
+        # Sin proyecto por defecto el trabajo solo vincula las tareas de preparación
+        self.config.project_id = False
+        job = self.Job.search([('order_id', '=', order.id)])
+        self.assertEqual(len(job), 1)
+        job._process()
+        self.assertEqual(task.pos_order_id, order)
+        self.assertEqual(job.state, 'done')
+        self.assertFalse(job.task_id)
+        self.assertEqual(order.project_task_ids, task)
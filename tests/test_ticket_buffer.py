@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+from datetime import timedelta
+
+from odoo import Command, fields
+from odoo.tests import tagged
+
+from .common import PosProjectCommon
+
+
+@tagged('post_install', '-at_install')
+class TestTicketBuffer(PosProjectCommon):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.printer.project_incremental_tasks = True
+        cls.config.project_coalesce_seconds = 30
+        cls.Buffer = cls.env['pos.project.ticket.buffer'].sudo()
+
+    def _change_ticket(self, order_uid, size=2):
+        return self.make_ticket(size=size, order_uid=order_uid, is_new_order=False, is_change_order=True)
+
+    def test_parked_tickets_are_not_rendered(self):
+        first = self.make_ticket()
+        task_id = self.Service._create_tasks_for_tickets([first])[0]['task_id']
+        results = self.Service._create_tasks_for_tickets([
+            self._change_ticket(first['order_uid']), self._change_ticket(first['order_uid']),
+        ])
+        self.assertTrue(all(result.get('buffered') for result in results))
+
+        self.assertEqual(self.Buffer._flush(force=True), 1)
+        task = self.env['project.task'].browse(task_id)
+        # Ticket inicial, dos tickets apartados y el ticket agrupado
+        self.assertEqual(len(task.pos_ticket_ids), 4)
+        task.invalidate_recordset(['pos_ticket_html'])
+        self.assertEqual(task.pos_ticket_html.count('Cambios'), 1)
+
+        kitchen = task._get_pos_kitchen_data()[0]
+        self.assertEqual(kitchen['order_name'], first['name'])
+        self.assertEqual(len(kitchen['lines']), len(task.pos_ticket_line_ids))
+
+    def test_flush_keeps_sender_and_own_keys(self):
+        waiter = self.env['res.users'].create({
+            'name': 'Camarero',
+            'login': 'pos_project_waiter',
+            'groups_id': [Command.set([
+                self.env.ref('point_of_sale.group_pos_user').id,
+                self.env.ref('project.group_project_user').id,
+            ])],
+        })
+        Service = self.env['pos.project.task.service'].with_user(waiter).sudo()
+        other_order, own_order = self.make_ticket(), self.make_ticket()
+        Service._create_tasks_for_tickets([self._change_ticket(other_order['order_uid'])])
+        Service._create_tasks_for_tickets([self._change_ticket(own_order['order_uid'])])
+        buffers = self.Buffer.search([])
+        self.assertEqual(buffers.user_id, waiter)
+        buffers.write({'flush_after': fields.Datetime.now() - timedelta(minutes=1)})
+
+        # Un ticket de otra orden no emite grupos ajenos
+        self.Service._create_tasks_for_tickets([self.make_ticket()])
+        self.assertEqual(len(self.Buffer.search([])), 2)
+
+        # Un ticket nuevo de la misma orden emite antes su grupo vencido
+        results = self.Service._create_tasks_for_tickets([self._change_ticket(own_order['order_uid'])])
+        self.assertTrue(results[0]['buffered'])
+        remaining = self.Buffer.search([])
+        self.assertEqual(len(remaining), 2)
+        self.assertIn(other_order['order_uid'], remaining[0].buffer_key + remaining[1].buffer_key)
+
+        # La acción planificada emite el resto en nombre del camarero
+        self.Buffer._cron_flush()
+        task_key = self.env['project.task']._pos_station_task_key(other_order['order_uid'], self.printer.id)
+        task = self.env['project.task'].search([('pos_task_key', '=', task_key)])
+        self.assertEqual(len(task), 1)
+        assignee = task._get_pos_task_capabilities()['assignee_field']
+        self.assertIn(waiter, task[assignee])
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+from odoo import Command
+from odoo.tests import tagged
+
+from .common import PosProjectCommon
+
+
+@tagged('post_install', '-at_install')
+class TestTicketNumbers(PosProjectCommon):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.bar = cls.env['pos.printer'].create({
+            'name': 'Barra',
+            'printer_type': 'project',
+            'project_id': cls.project.id,
+        })
+        cls.config.printer_ids = [Command.link(cls.bar.id)]
+
+    def _serial(self, number):
+        """Parte numérica de un número de ticket ("250317-0042" -> 42)"""
+        return int(number.rpartition('-')[2])
+
+    def test_batch_numbers_are_consecutive_per_station(self):
+        tickets = [
+            self.make_ticket(printer_id=printer.id)
+            for printer in (self.printer, self.bar, self.printer, self.printer, self.bar)
+        ]
+        results = self.Service._create_tasks_for_tickets(tickets)
+        self.assertTrue(all(result['success'] for result in results))
+
+        Task = self.env['project.task']
+        tasks = [Task.browse(result['task_id']) for result in results]
+        self.assertTrue(self.printer.project_sequence_id)
+        self.assertTrue(self.bar.project_sequence_id)
+        self.assertNotEqual(self.printer.project_sequence_id, self.bar.project_sequence_id)
+
+        # Cada estación numera sus tickets sin huecos y en el orden del lote
+        kitchen = [self._serial(tasks[index].pos_ticket_number) for index in (0, 2, 3)]
+        bar = [self._serial(tasks[index].pos_ticket_number) for index in (1, 4)]
+        self.assertEqual(kitchen, list(range(kitchen[0], kitchen[0] + 3)))
+        self.assertEqual(bar, list(range(bar[0], bar[0] + 2)))
+
+        # El siguiente lote continúa la secuencia de cada estación
+        next_result = self.Service._create_tasks_for_tickets([self.make_ticket(printer_id=self.bar.id)])[0]
+        self.assertEqual(self._serial(Task.browse(next_result['task_id']).pos_ticket_number), bar[-1] + 1)
+
+    def test_next_sequence_numbers_in_one_query(self):
+        sequence = self.Service._get_station_sequence(self.printer)
+        first = self.Service._next_sequence_numbers(sequence, 1)
+        with self.assertQueryCount(1):
+            numbers = self.Service._next_sequence_numbers(sequence, 50)
+        serials = [self._serial(number) for number in first + numbers]
+        self.assertEqual(serials, list(range(serials[0], serials[0] + 51)))
+        self.assertEqual(self.Service._next_sequence_numbers(sequence, 0), [])
+
+    def test_name_search_by_order_reference(self):
+        ticket = self.make_ticket(name='Order 00042-001-0007')
+        task = self.env['project.task'].browse(self.Service._create_tasks_for_tickets([ticket])[0]['task_id'])
+        self.assertEqual(task.pos_order_reference, '00042-001-0007')
+        other = self.env['project.task'].browse(self.Service._create_tasks_for_tickets([self.make_ticket()])[0]['task_id'])
+
+        Task = self.env['project.task']
+        for name in ('Order 00042-001-0007', '00042-001-0007', 'order 00042-001-0007 (Agregado)'):
+            self.assertEqual([task_id for task_id, _name in Task.name_search(name)], [task.id], name)
+        self.assertEqual([task_id for task_id, _name in Task.name_search(task.pos_ticket_number)], [task.id])
+        self.assertEqual(
+            Task.search([('pos_reference_search', '!=', 'Order 00042-001-0007'), ('id', 'in', (task | other).ids)]),
+            other,
+        )
+        # Sin tarea con esa referencia, la búsqueda sigue por el nombre
+        self.assertFalse(Task.name_search('Order 99999-999-9999'))
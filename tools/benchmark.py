@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+"""
+Micro-benchmarks del módulo.
+
+Uso desde ``odoo-bin shell``::
+
+    from odoo.addons.pos_project_integration.tools import benchmark
+    benchmark.benchmark_render()
+    benchmark.benchmark_pipeline(env)
+    benchmark.benchmark_fast_tasks(env)
+
+La carga concurrente de los endpoints HTTP se mide con ``tools/load_test.py``.
+Las mismas medidas, con comprobaciones de consultas y filas escritas, se
+ejecutan en las pruebas del módulo (etiqueta ``pos_project_performance``).
+"""
+
+from datetime import datetime
+import time
+import timeit
+
+from . import task_description
+from .load_test import percentile, synthetic_ticket
+
+# Tablas en las que escribe la creación de tareas de una orden
+PIPELINE_TABLES = (
+    'pos_project_task_job',
+    'project_task',
+    'mail_message',
+    'mail_followers',
+)
+
+# Tablas de mail en las que escribe la creación de una tarea
+MAIL_TABLES = (
+    'mail_message',
+    'mail_followers',
+    'mail_tracking_value',
+    'mail_mail',
+)
+
+DEFAULT_SIZES = (5, 50, 500)
+
+
+def _synthetic_order(size):
+    return {
+        'name': 'Order 00001-001-0001',
+        'table': 'T1',
+        'user': 'Camarero',
+        'customer': 'Cliente',
+        'note': 'Sin prisa',
+        'date_order': datetime(2025, 3, 17, 12, 30),
+        'amount_total': 12.5 * size,
+        'lines': [{
+            'product_name': f'Producto {index}',
+            'qty': index % 3 + 1,
+            'price_subtotal_incl': 12.5,
+            'note': 'Sin cebolla\nBien hecho' if index % 4 == 0 else '',
+        } for index in range(size)],
+    }
+
+
+def benchmark_render(sizes=DEFAULT_SIZES, number=200, labels=task_description.DEFAULT_LABELS, verbose=True):
+    """
+    Mide el tiempo de renderizado por orden de cada plantilla
+
+    :param sizes: número de líneas de las órdenes sintéticas
+    :param number: repeticiones por medida
+    :return: diccionario ``{(plantilla, líneas): milisegundos por orden}``
+    """
+    now = datetime(2025, 3, 17, 12, 30)
+    results = {}
+    for size in sizes:
+        order = _synthetic_order(size)
+        ticket = synthetic_ticket(size)
+        cases = (
+            ('order', lambda: task_description.render_order(order, labels)),
+            ('preparation', lambda: task_description.render_preparation(ticket, labels, now)),
+        )
+        for layout, render in cases:
+            best = min(timeit.repeat(render, number=number, repeat=3))
+            results[(layout, size)] = best / number * 1000
+
+    if verbose:
+        print(f"{'plantilla':<12} {'líneas':>7} {'ms/orden':>10}")
+        for (layout, size), elapsed in results.items():
+            print(f"{layout:<12} {size:>7} {elapsed:>10.3f}")
+    return results
+
+
+def _count_rows(cr, tables):
+    cr.execute(' UNION ALL '.join(f"SELECT '{table}', count(*) FROM {table}" for table in tables))
+    return dict(cr.fetchall())
+
+
+def _create_synthetic_order(env, session, product, size):
+    lines = [{
+        'product_id': product.id,
+        'full_product_name': f'Producto {index}',
+        'qty': index % 3 + 1,
+        'price_unit': 12.5,
+        'price_subtotal': 12.5 * (index % 3 + 1),
+        'price_subtotal_incl': 12.5 * (index % 3 + 1),
+    } for index in range(size)]
+    amount = sum(line['price_subtotal_incl'] for line in lines)
+    return env['pos.order'].create({
+        'session_id': session.id,
+        'lines': [(0, 0, line) for line in lines],
+        'amount_tax': 0.0,
+        'amount_total': amount,
+        'amount_paid': amount,
+        'amount_return': 0.0,
+    })
+
+
+def benchmark_pipeline(env, sizes=DEFAULT_SIZES, runs=20, verbose=True):
+    """
+    Mide la creación de la tarea de órdenes sintéticas: encolado desde la
+    orden (lo que añade el módulo a ``_process_order``) y procesamiento del
+    trabajo (descripción, creación de la tarea y vínculo con la orden).
+
+    Necesita una sesión abierta de un punto de venta con proyecto. Todo se
+    ejecuta en la transacción actual, que se deshace al terminar.
+
+    :param env: entorno de Odoo, por ejemplo el de ``odoo-bin shell``
+    :param sizes: número de líneas de las órdenes sintéticas
+    :param runs: órdenes por tamaño
+    :return: diccionario ``{(etapa, líneas): métricas}`` con ``p50_ms``,
+             ``p95_ms`` y ``queries`` por orden de cada etapa, y ``rows``, las
+             filas escritas por orden entre las dos etapas
+    """
+    session = env['pos.session'].search([('state', '=', 'opened')]).filtered(
+        lambda session: session.config_id._get_project_routing()['default_project_id']
+    )[:1]
+    product = env['product.product'].search([('available_in_pos', '=', True)], limit=1)
+    if not session or not product:
+        raise ValueError("Se necesita una sesión abierta de un punto de venta con proyecto y un producto disponible en el POS")
+
+    Job = env['pos.project.task.job'].sudo()
+    results = {}
+    try:
+        for size in sizes:
+            timings = {'enqueue': [], 'process': []}
+            queries = {'enqueue': 0, 'process': 0}
+            rows_before = _count_rows(env.cr, PIPELINE_TABLES)
+            for _run in range(runs):
+                order = _create_synthetic_order(env, session, product, size)
+                env.flush_all()
+
+                start, count = time.perf_counter(), env.cr.sql_log_count
+                job = Job._enqueue(order)
+                env.flush_all()
+                timings['enqueue'].append((time.perf_counter() - start) * 1000)
+                queries['enqueue'] += env.cr.sql_log_count - count
+
+                start, count = time.perf_counter(), env.cr.sql_log_count
+                job._process()
+                env.flush_all()
+                timings['process'].append((time.perf_counter() - start) * 1000)
+                queries['process'] += env.cr.sql_log_count - count
+            rows_after = _count_rows(env.cr, PIPELINE_TABLES)
+            rows = sum(rows_after[table] - rows_before[table] for table in PIPELINE_TABLES)
+            for stage, values in timings.items():
+                results[(stage, size)] = {
+                    'p50_ms': percentile(values, 50),
+                    'p95_ms': percentile(values, 95),
+                    'queries': queries[stage] / runs,
+                    'rows': rows / runs,
+                }
+    finally:
+        env.cr.rollback()
+        env.invalidate_all()
+
+    if verbose:
+        print(f"{'etapa':<8} {'líneas':>7} {'p50 ms':>9} {'p95 ms':>9} {'consultas':>10} {'filas':>7}")
+        for (stage, size), metrics in results.items():
+            print(f"{stage:<8} {size:>7} {metrics['p50_ms']:>9.2f} {metrics['p95_ms']:>9.2f} "
+                  f"{metrics['queries']:>10.1f} {metrics['rows']:>7.1f}")
+    return results
+
+
+def benchmark_fast_tasks(env, runs=50, verbose=True):
+    """
+    Compara las consultas SQL por ticket al crear tareas de preparación con y
+    sin el modo rápido, una a una como en el endpoint ``create_preparation_task``.
+
+    Necesita un punto de venta con proyecto. Todo se ejecuta en la transacción
+    actual, que se deshace al terminar.
+
+    :param env: entorno de Odoo, por ejemplo el de ``odoo-bin shell``
+    :param runs: tareas por modo
+    :return: diccionario ``{modo: métricas}`` con ``p50_ms``, ``queries`` y
+             ``rows``, las filas de mail escritas, por ticket
+    """
+    config = env['pos.config'].search([]).filtered(
+        lambda config: config._get_project_routing()['default_project_id']
+    )[:1]
+    if not config:
+        raise ValueError("Se necesita un punto de venta con proyecto")
+    project_id = config._get_project_routing()['default_project_id']
+    partner = env['res.partner'].search([], limit=1)
+
+    Task = env['project.task'].sudo()
+    results = {}
+    try:
+        for mode, fast in (('normal', False), ('rápido', True)):
+            timings = []
+            queries = 0
+            rows_before = _count_rows(env.cr, MAIL_TABLES)
+            for index in range(runs):
+                vals = {
+                    'name': f'Order 00001-001-{index:04d}',
+                    'project_id': project_id,
+                    'partner_id': partner.id,
+                    'description': '<p>1x Producto</p>',
+                }
+                vals.update(Task._pos_assignee_vals(env.user))
+                env.flush_all()
+                start, count = time.perf_counter(), env.cr.sql_log_count
+                Task._with_pos_fast_context(fast).create(vals)
+                env.flush_all()
+                timings.append((time.perf_counter() - start) * 1000)
+                queries += env.cr.sql_log_count - count
+            rows_after = _count_rows(env.cr, MAIL_TABLES)
+            results[mode] = {
+                'p50_ms': percentile(timings, 50),
+                'queries': queries / runs,
+                'rows': sum(rows_after[table] - rows_before[table] for table in MAIL_TABLES) / runs,
+            }
+    finally:
+        env.cr.rollback()
+        env.invalidate_all()
+
+    if verbose:
+        print(f"{'modo':<8} {'p50 ms':>9} {'consultas':>10} {'filas mail':>11}")
+        for mode, metrics in results.items():
+            print(f"{mode:<8} {metrics['p50_ms']:>9.2f} {metrics['queries']:>10.1f} {metrics['rows']:>11.1f}")
+    return results
@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+"""
+Prueba de carga HTTP de los endpoints del módulo contra un servidor Odoo.
+
+Solo usa la biblioteca estándar, por lo que se ejecuta fuera de Odoo::
+
+    python3 tools/load_test.py --url http://localhost:8069 --db pos \\
+        --login admin --password admin --config-id 1 --printer-id 3 \\
+        --requests 500 --concurrency 20 --lines 8
+
+Modos (``--endpoint``):
+
+- ``preparation``: un ticket por llamada a ``create_preparation_task``
+- ``preparation-batch``: lotes de ``--batch-size`` tickets a ``create_preparation_tasks``
+- ``task``: ``create_task`` sobre las órdenes de ``--order-ids``
+- ``stress``: ``--requests`` llamadas simultáneas a ``create_task`` por cada
+  orden de ``--order-ids`` y otras tantas a ``create_preparation_task`` por
+  cada una de ``--stress-orders`` órdenes sintéticas en la impresora (en modo
+  incremental) de ``--printer-id``; comprueba que cada orden y estación
+  termina con una sola tarea
+
+Informa de la latencia p50/p95/p99, el rendimiento y los errores.
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import http.cookiejar
+import itertools
+import json
+import math
+import random
+import threading
+import time
+import urllib.request
+import uuid
+
+
+def percentile(values, pct):
+    """Percentil por rango más cercano de una lista de valores"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def synthetic_ticket(size, change_order=True):
+    """Ticket de preparación sintético con ``size`` líneas"""
+    change_types = ('new', 'cancelled', 'note_only', None)
+    return {
+        'name': 'Order 00001-001-0001',
+        'customer': {'id': 1, 'name': 'Cliente'},
+        'table': 'T1',
+        'server': 'Camarero',
+        'note': 'Alergia: frutos secos',
+        'is_change_order': change_order,
+        'order_lines': [{
+            'product_id': index,
+            'product_name': f'Producto {index}',
+            'qty': index % 3 + 1,
+            'price': 12.5,
+            'note': 'Sin cebolla\nExtras: + Queso' if index % 4 == 0 else '',
+            'change_type': change_types[index % len(change_types)],
+            'sides': [{'name': 'Patatas'}] if index % 5 == 0 else [],
+            'combo_items': [{'name': 'Bebida', 'quantity': 1}] if index % 7 == 0 else [],
+            'attributes': ['Grande'] if index % 2 else [],
+        } for index in range(size)],
+    }
+
+
+class Client:
+    """Cliente JSON-RPC con la sesión compartida entre hilos"""
+
+    def __init__(self, url, db, login, password, timeout=30):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+        result = self.call('/web/session/authenticate', {'db': db, 'login': login, 'password': password})
+        if not result.get('uid'):
+            raise SystemExit(f"No se pudo iniciar sesión como {login!r}")
+
+    def call(self, path, params):
+        payload = json.dumps({'jsonrpc': '2.0', 'method': 'call', 'params': params}).encode()
+        req = urllib.request.Request(self.url + path, data=payload, headers={'Content-Type': 'application/json'})
+        with self.opener.open(req, timeout=self.timeout) as response:
+            body = json.load(response)
+        if body.get('error'):
+            raise RuntimeError(body['error'].get('data', {}).get('message') or body['error'].get('message'))
+        return body['result']
+
+
+def _prepare_ticket(args, sequence):
+    """Ticket en el formato compacto que envía el POS"""
+    ticket = synthetic_ticket(args.lines)
+    product_ids = itertools.cycle(args.product_ids or [0])
+    ticket['order_lines'] = [{
+        'product_id': next(product_ids),
+        'product_name': line['product_name'],
+        'qty': line['qty'],
+        'note': line['note'],
+        'change_type': line['change_type'],
+    } for line in ticket['order_lines']]
+    ticket.update({
+        'name': f'Order {sequence:05d}-001-0001',
+        'request_key': str(uuid.uuid4()),
+        'order_uid': str(uuid.uuid4()),
+        'config_id': args.config_id,
+        'printer_id': args.printer_id,
+        'project_id': args.project_id,
+    })
+    return ticket
+
+
+def _build_calls(args):
+    """
+    Genera las llamadas ``(ruta, parámetros, tickets por llamada, grupo)`` de
+    la prueba. Las llamadas de un mismo grupo deben acabar en la misma tarea.
+    """
+    sequence = itertools.count(1)
+    if args.endpoint == 'stress':
+        calls = []
+        for order_id in args.order_ids:
+            calls += [
+                ('/pos_project_integration/create_task', {'order_id': order_id}, 1, f'order:{order_id}')
+            ] * args.requests
+        for _order in range(args.stress_orders):
+            order_uid = str(uuid.uuid4())
+            for _index in range(args.requests):
+                ticket = _prepare_ticket(args, next(sequence))
+                ticket['order_uid'] = order_uid
+                calls.append((
+                    '/pos_project_integration/create_preparation_task', {'order_data': ticket}, 1,
+                    f'station:{order_uid}:{args.printer_id}',
+                ))
+        # Intercalar las llamadas para que las de un mismo grupo coincidan en el tiempo
+        random.shuffle(calls)
+        yield from calls
+    elif args.endpoint == 'task':
+        order_ids = itertools.cycle(args.order_ids)
+        for _index in range(args.requests):
+            yield '/pos_project_integration/create_task', {'order_id': next(order_ids), 'project_id': args.project_id}, 1, None
+    elif args.endpoint == 'preparation-batch':
+        for _index in range(args.requests):
+            batch = [_prepare_ticket(args, next(sequence)) for _ticket in range(args.batch_size)]
+            yield '/pos_project_integration/create_preparation_tasks', {'orders_data': batch}, len(batch), None
+    else:
+        for _index in range(args.requests):
+            yield '/pos_project_integration/create_preparation_task', {'order_data': _prepare_ticket(args, next(sequence))}, 1, None
+
+
+def run(args):
+    client = Client(args.url, args.db, args.login, args.password)
+    latencies = []
+    errors = []
+    tasks_by_group = {}
+    lock = threading.Lock()
+
+    def send(call):
+        path, params, _tickets, group = call
+        start = time.perf_counter()
+        task_ids = set()
+        try:
+            result = client.call(path, params)
+            results = result.get('results') or [result]
+            failed = [item.get('message') for item in results if not item.get('success')]
+            task_ids = {item['task_id'] for item in results if item.get('success') and item.get('task_id')}
+        except Exception as e:  # noqa: BLE001 - se cuentan todos los errores de la prueba
+            failed = [str(e)]
+        elapsed = (time.perf_counter() - start) * 1000
+        with lock:
+            latencies.append(elapsed)
+            errors.extend(failed)
+            if group:
+                tasks_by_group.setdefault(group, set()).update(task_ids)
+
+    calls = list(_build_calls(args))
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(send, calls))
+    wall = time.perf_counter() - start
+
+    tickets = sum(call[2] for call in calls)
+    report = {
+        'requests': len(calls),
+        'tickets': tickets,
+        'errors': len(errors),
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+        'max_ms': max(latencies, default=0.0),
+        'tickets_per_second': tickets / wall if wall else 0.0,
+    }
+    print(f"{args.endpoint}: {report['requests']} llamadas, {report['tickets']} tickets, "
+          f"concurrencia {args.concurrency}, {report['errors']} errores")
+    print(f"p50 {report['p50_ms']:.1f} ms | p95 {report['p95_ms']:.1f} ms | "
+          f"p99 {report['p99_ms']:.1f} ms | máx {report['max_ms']:.1f} ms | "
+          f"{report['tickets_per_second']:.1f} tickets/s")
+    for message, count in sorted(_count(errors).items(), key=lambda item: -item[1])[:5]:
+        print(f"  {count} x {message}")
+    if tasks_by_group:
+        duplicated = {group: ids for group, ids in tasks_by_group.items() if len(ids) > 1}
+        report['duplicated_groups'] = len(duplicated)
+        print(f"{len(tasks_by_group)} órdenes/estaciones, {len(duplicated)} con más de una tarea")
+        for group, ids in list(duplicated.items())[:5]:
+            print(f"  {group}: tareas {sorted(ids)}")
+    return report
+
+
+def _count(messages):
+    counts = {}
+    for message in messages:
+        counts[message] = counts.get(message, 0) + 1
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:8069')
+    parser.add_argument('--db', required=True)
+    parser.add_argument('--login', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--endpoint', choices=('preparation', 'preparation-batch', 'task', 'stress'), default='preparation')
+    parser.add_argument('--requests', type=int, default=200, help='número de llamadas (por orden en el modo stress)')
+    parser.add_argument('--concurrency', type=int, default=10, help='llamadas simultáneas')
+    parser.add_argument('--lines', type=int, default=5, help='líneas por ticket')
+    parser.add_argument('--batch-size', type=int, default=20, help='tickets por llamada en preparation-batch')
+    parser.add_argument('--config-id', type=int, help='pos.config de los tickets')
+    parser.add_argument('--printer-id', type=int, help='impresora de preparación de los tickets')
+    parser.add_argument('--project-id', type=int, help='proyecto explícito, si no se usa la ruta de la impresora')
+    parser.add_argument('--product-ids', type=int, nargs='+', default=[], help='productos de las líneas de los tickets')
+    parser.add_argument('--order-ids', type=int, nargs='+', default=[], help='órdenes para los modos task y stress')
+    parser.add_argument('--stress-orders', type=int, default=5, help='órdenes sintéticas de preparación en el modo stress')
+    args = parser.parse_args(argv)
+    if args.endpoint == 'task' and not args.order_ids:
+        parser.error('--order-ids es obligatorio en el modo task')
+    if args.endpoint == 'stress' and args.stress_orders and not (args.config_id and args.printer_id):
+        parser.error('--config-id y --printer-id son obligatorios para las órdenes de preparación del modo stress')
+    run(args)
+
+
+if __name__ == '__main__':
+    main()
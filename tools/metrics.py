@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+"""
+Métricas en memoria de la creación de tareas desde el POS.
+
+Cada proceso de Odoo lleva sus propias métricas: con varios workers, cada
+consulta al endpoint devuelve las del worker que la atiende, identificado por
+``pid``, igual que hace Prometheus al rastrear varios procesos.
+
+Etapas medidas (``timer``):
+
+- ``parse``: lectura de los tickets recibidos y resolución de su formato
+  compacto, una vez por petición
+- ``render``: renderizado de las descripciones HTML
+- ``create``: validación de los tickets y creación de las tareas
+- ``link``: vínculo de los tickets y sus líneas con las tareas
+
+Contadores (``increment``): ``success``, ``failure`` y ``retry`` por punto de
+venta e impresora.
+"""
+
+from contextlib import contextmanager
+import logging
+import os
+import random
+import threading
+import time
+
+# Límites superiores de los intervalos del histograma de tiempos, en segundos
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+RESULTS = ('success', 'failure', 'retry')
+# Fracción de peticiones cuyo contenido se registra en DEBUG
+DEBUG_SAMPLE_RATE = 0.01
+
+_lock = threading.Lock()
+_timers = {}
+_counters = {}
+
+
+def observe(stage, seconds):
+    """Registra la duración de una etapa"""
+    with _lock:
+        timer = _timers.get(stage)
+        if timer is None:
+            timer = _timers[stage] = {'count': 0, 'sum': 0.0, 'max': 0.0, 'buckets': [0] * len(BUCKETS)}
+        timer['count'] += 1
+        timer['sum'] += seconds
+        timer['max'] = max(timer['max'], seconds)
+        for index, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                timer['buckets'][index] += 1
+                break
+
+
+@contextmanager
+def timer(stage):
+    """Mide la duración del bloque como una etapa, también si falla"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start)
+
+
+def increment(result, config_id=None, printer_id=None, value=1):
+    """Cuenta tareas por resultado, punto de venta e impresora"""
+    key = (result, config_id or 0, printer_id or 0)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def snapshot():
+    """
+    Copia de las métricas actuales del proceso
+
+    :return: diccionario con ``pid``, ``timers`` y ``counters``
+    """
+    with _lock:
+        return {
+            'pid': os.getpid(),
+            'timers': {
+                stage: {
+                    'count': timer['count'],
+                    'sum_seconds': timer['sum'],
+                    'max_seconds': timer['max'],
+                    'avg_seconds': timer['sum'] / timer['count'] if timer['count'] else 0.0,
+                    'buckets': dict(zip(BUCKETS, timer['buckets'])),
+                }
+                for stage, timer in _timers.items()
+            },
+            'counters': [
+                {'result': result, 'config_id': config_id, 'printer_id': printer_id, 'value': value}
+                for (result, config_id, printer_id), value in sorted(_counters.items())
+            ],
+        }
+
+
+def to_prometheus():
+    """Métricas del proceso en el formato de texto de Prometheus"""
+    data = snapshot()
+    pid = data['pid']
+    out = [
+        '# HELP pos_project_stage_seconds Duración de las etapas de creación de tareas desde el POS',
+        '# TYPE pos_project_stage_seconds histogram',
+    ]
+    for stage, timer in sorted(data['timers'].items()):
+        cumulative = 0
+        for bound, count in timer['buckets'].items():
+            cumulative += count
+            out.append(f'pos_project_stage_seconds_bucket{{pid="{pid}",stage="{stage}",le="{bound}"}} {cumulative}')
+        out.append(f'pos_project_stage_seconds_bucket{{pid="{pid}",stage="{stage}",le="+Inf"}} {timer["count"]}')
+        out.append(f'pos_project_stage_seconds_sum{{pid="{pid}",stage="{stage}"}} {timer["sum_seconds"]}')
+        out.append(f'pos_project_stage_seconds_count{{pid="{pid}",stage="{stage}"}} {timer["count"]}')
+    out += [
+        '# HELP pos_project_tasks_total Tareas procesadas desde el POS por resultado',
+        '# TYPE pos_project_tasks_total counter',
+    ]
+    for counter in data['counters']:
+        out.append(
+            f'pos_project_tasks_total{{pid="{pid}",result="{counter["result"]}",'
+            f'config_id="{counter["config_id"]}",printer_id="{counter["printer_id"]}"}} {counter["value"]}'
+        )
+    return '\n'.join(out) + '\n'
+
+
+def reset():
+    """Vacía las métricas del proceso"""
+    with _lock:
+        _timers.clear()
+        _counters.clear()
+
+
+def debug_sampled(logger, msg, *args, rate=DEBUG_SAMPLE_RATE):
+    """Registra en DEBUG solo una muestra de las llamadas, sin formatear el resto"""
+    if logger.isEnabledFor(logging.DEBUG) and random.random() < rate:
+        logger.debug(msg, *args)
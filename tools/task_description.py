@@ -0,0 +1,352 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+"""
+Renderizado HTML de las descripciones de tareas creadas desde el POS.
+
+Todas las rutas de creación de tareas (órdenes finalizadas, tickets de
+preparación) usan este módulo. Las plantillas se construyen una sola vez al
+importar el módulo, las etiquetas se traducen una vez por idioma y la salida se
+genera con una única unión de lista, de modo que el coste es lineal en el
+número de líneas.
+
+Los renderizadores reciben diccionarios planos, no registros, y no dependen del
+ORM.
+"""
+
+from datetime import datetime
+
+from markupsafe import Markup, escape
+
+
+def _build_labels(_):
+    return {
+        'order': _("Pedido"),
+        'table': _("Mesa"),
+        'served_by': _("Atendido por"),
+        'waiter': _("Camarero"),
+        'customer': _("Cliente"),
+        'general_note': _("Nota general"),
+        'products': _("Productos"),
+        'product': _("Producto"),
+        'quantity': _("Cantidad"),
+        'price': _("Precio"),
+        'notes': _("Notas"),
+        'total': _("Total"),
+        'no_name': _("Sin nombre"),
+        'no_notes': _("Sin notas"),
+        'extras': _("Extras"),
+        'combo': _("Combo"),
+        'created_on': _("Creado el %(date)s a las %(time)s"),
+        'order_created': _("Orden creada"),
+        'type': _("Tipo"),
+        'type_change': _("Cambio en el pedido"),
+        'type_added': _("Pedido agregado"),
+        'type_new': _("Nuevo pedido"),
+        'changes': _("Cambios"),
+    }
+
+
+DEFAULT_LABELS = _build_labels(lambda source: source)
+
+
+def build_labels(env):
+    """Etiquetas traducidas al idioma del entorno"""
+    return _build_labels(env._)
+
+
+def get_labels(env):
+    """
+    Devuelve las etiquetas traducidas al idioma del entorno, resueltas una vez
+    por idioma en la caché del registro (ver
+    ``project.task._get_pos_description_labels``)
+    """
+    return env['project.task']._get_pos_description_labels(env.lang or 'en_US')
+
+
+def format_qty(qty):
+    """Muestra la cantidad sin decimales cuando es entera"""
+    try:
+        qty = float(qty)
+    except (ValueError, TypeError):
+        return "1"
+    return f"{qty:.0f}" if qty == int(qty) else f"{qty:.2f}"
+
+
+def _nl2br(text):
+    return escape(text).replace('\n', Markup('<br/>'))
+
+
+# ---------------------------------------------------------------------------
+# Órdenes finalizadas
+# ---------------------------------------------------------------------------
+
+_ORDER_CELL = "border: 1px solid #ddd; padding: 8px;"
+_ORDER_HEADER_ROW = "<tr style='background-color: #f2f2f2;'>"
+
+_ORDER_TABLE_OPEN = (
+    "<h4>{products}:</h4>"
+    "<table width='100%' style='border-collapse: collapse;'>"
+    + _ORDER_HEADER_ROW +
+    f"<th style='{_ORDER_CELL} text-align: left;'>{{product}}</th>"
+    f"<th style='{_ORDER_CELL} text-align: center;'>{{quantity}}</th>"
+    f"<th style='{_ORDER_CELL} text-align: right;'>{{price}}</th>"
+    f"<th style='{_ORDER_CELL} text-align: left;'>{{notes}}</th>"
+    "</tr>"
+)
+_ORDER_LINE = (
+    "<tr>"
+    f"<td style='{_ORDER_CELL}'>{{product}}</td>"
+    f"<td style='{_ORDER_CELL} text-align: center;'>{{qty}}</td>"
+    f"<td style='{_ORDER_CELL} text-align: right;'>{{price:.2f}}</td>"
+    f"<td style='{_ORDER_CELL}'>{{note}}</td>"
+    "</tr>"
+)
+_ORDER_TABLE_CLOSE = (
+    _ORDER_HEADER_ROW +
+    f"<td colspan='2' style='{_ORDER_CELL} text-align: right;'><strong>{{total}}:</strong></td>"
+    f"<td style='{_ORDER_CELL} text-align: right;'><strong>{{amount:.2f}}</strong></td>"
+    f"<td style='{_ORDER_CELL}'></td>"
+    "</tr>"
+    "</table>"
+)
+_ORDER_FIELD = "<p><strong>{label}:</strong> {value}</p>"
+
+
+def render_order(data, labels=DEFAULT_LABELS):
+    """
+    Renderiza la descripción de una orden finalizada
+
+    :param data: diccionario con las claves ``name``, ``table``, ``user``,
+                 ``customer``, ``note``, ``date_order``, ``amount_total`` y
+                 ``lines`` (``product_name``, ``qty``, ``price_subtotal_incl``,
+                 ``note``)
+    :param labels: etiquetas traducidas, ver :func:`get_labels`
+    :return: String con la descripción HTML
+    """
+    parts = [f"<h3>{labels['order']}: {escape(data['name'])}</h3>"]
+    append = parts.append
+
+    for key, label in (('table', 'table'), ('user', 'served_by'), ('customer', 'customer'), ('note', 'general_note')):
+        if data.get(key):
+            append(_ORDER_FIELD.format(label=labels[label], value=escape(data[key])))
+
+    lines = data.get('lines')
+    if lines:
+        append(_ORDER_TABLE_OPEN.format(**labels))
+        for line in lines:
+            append(_ORDER_LINE.format(
+                product=escape(line['product_name']),
+                qty=format_qty(line['qty']),
+                price=line['price_subtotal_incl'] or 0.0,
+                note=_nl2br(line['note']) if line.get('note') else '',
+            ))
+        append(_ORDER_TABLE_CLOSE.format(total=labels['total'], amount=data.get('amount_total') or 0.0))
+
+    date_order = data.get('date_order')
+    if date_order:
+        created_on = labels['created_on'] % {
+            'date': date_order.strftime('%d/%m/%Y'),
+            'time': date_order.strftime('%H:%M:%S'),
+        }
+        append(f"<p><em>{created_on}</em></p>")
+
+    return "".join(parts)
+
+
+# ---------------------------------------------------------------------------
+# Tickets de preparación
+# ---------------------------------------------------------------------------
+
+_PREP_CELL = "padding: 8px; border: 1px solid #dee2e6;"
+_PREP_BOX = "margin-bottom: 15px; padding: 10px; border-radius: 5px;"
+_PREP_TITLE = "margin-top: 0;"
+
+_PREP_ROW_STYLES = {
+    'new': 'background-color: #d4edda;',  # Verde claro para nuevos
+    'cancelled': 'background-color: #f8d7da;',  # Rojo claro para cancelados
+    'note_only': 'background-color: #fff3cd;',  # Amarillo claro para solo notas
+}
+_PREP_NOTE_COLORS = (
+    ('Extras:', '#3498db'),
+    ('Combo:', '#9b59b6'),
+)
+_PREP_NOTE_DEFAULT_COLOR = '#e74c3c'
+
+_PREP_OPEN = '<div style="font-family: Arial, sans-serif; max-width: 800px;">'
+_PREP_CUSTOMER = (
+    f'<div style="{_PREP_BOX} background-color: #f8f9fa;">'
+    f'<h3 style="{_PREP_TITLE} color: #495057;">{{label}}: {{name}}</h3>'
+    '</div>'
+)
+_PREP_INFO = f'<div style="{_PREP_BOX} background-color: #e9ecef;">{{info}}</div>'
+_PREP_NOTE = (
+    f'<div style="{_PREP_BOX} background-color: #fff3cd;">'
+    f'<h3 style="{_PREP_TITLE} color: #856404;">{{label}}:</h3>'
+    '<p style="margin-bottom: 0;">{note}</p>'
+    '</div>'
+)
+_PREP_TABLE_OPEN = (
+    '<div style="margin-bottom: 15px;">'
+    f'<h3 style="{_PREP_TITLE} color: #495057;">{{products}}:</h3>'
+    '<table style="width: 100%; border-collapse: collapse;">'
+    '<thead>'
+    '<tr style="background-color: #6c757d; color: white;">'
+    f'<th style="padding: 8px; text-align: left; border: 1px solid #dee2e6;">{{product}}</th>'
+    f'<th style="padding: 8px; text-align: center; border: 1px solid #dee2e6;">{{quantity}}</th>'
+    f'<th style="padding: 8px; text-align: left; border: 1px solid #dee2e6;">{{notes}}</th>'
+    '</tr>'
+    '</thead>'
+    '<tbody>'
+)
+_PREP_TABLE_CLOSE = '</tbody></table></div>'
+_PREP_CHANGES_OPEN = (
+    '<div style="margin-top: 20px; padding-top: 10px; border-top: 2px dashed #6c757d;">'
+    f'<h3 style="{_PREP_TITLE} color: #495057;">{{label}} {{time}}</h3>'
+)
+_PREP_PRODUCT = f'<td style="{_PREP_CELL}"><strong>{{name}}</strong>'
+_PREP_PRICE = '<br/><span style="font-size: 0.8em; color: #6c757d;">${price:.2f}</span>'
+_PREP_ATTRIBUTES = '<div style="font-size: 0.9em; color: #17a2b8; margin-top: 3px;">{attributes}</div>'
+_PREP_QTY = f'<td style="padding: 8px; text-align: center; border: 1px solid #dee2e6; font-weight: bold; font-size: 1.2em;">{{qty}}</td>'
+_PREP_NOTE_LINE = '<div style="color: {color}; font-weight: bold;">{text}</div>'
+_PREP_NOTE_SECTION = '<div style="margin-top: 5px; color: {color}; font-weight: bold;"><strong>{label}:</strong> {items}</div>'
+_PREP_NO_NOTES = '<span style="color: #6c757d;">{label}</span>'
+_PREP_FOOTER = (
+    '<div style="font-size: 0.8em; color: #6c757d; margin-top: 20px; padding-top: 10px; border-top: 1px solid #dee2e6;">'
+    '{created_label}: {created} | {type_label}: {type}'
+    '</div>'
+)
+
+
+def _side_names(sides):
+    for side in sides:
+        if isinstance(side, str):
+            yield side
+        elif isinstance(side, dict) and (side.get('name') or side.get('product_name')):
+            yield side.get('name') or side['product_name']
+
+
+def _combo_names(combo_items):
+    for item in combo_items:
+        if isinstance(item, str):
+            yield item
+        elif isinstance(item, dict) and item.get('name'):
+            yield f"{item.get('quantity', 1)}x {item['name']}"
+
+
+def _render_preparation_line(line, labels, append):
+    append(f'<tr style="{_PREP_ROW_STYLES.get(line.get("change_type"), "")}">')
+
+    # Producto con precio y atributos
+    product_name = line.get('product_name') or labels['no_name']
+    append(_PREP_PRODUCT.format(name=escape(product_name)))
+    price = line.get('price') or 0
+    if price > 0:
+        append(_PREP_PRICE.format(price=price))
+    attributes = line.get('attributes')
+    if attributes and '(' not in product_name:
+        append(_PREP_ATTRIBUTES.format(attributes=escape(", ".join(attributes))))
+    append('</td>')
+
+    append(_PREP_QTY.format(qty=format_qty(line.get('qty', 1))))
+
+    # Notas, extras y combos
+    note = line.get('note') or ''
+    sides = line.get('sides') or []
+    combo_items = line.get('combo_items') or []
+    append(f'<td style="{_PREP_CELL}">')
+    for note_line in note.split('\n'):
+        if not note_line.strip():
+            continue
+        color = next((c for prefix, c in _PREP_NOTE_COLORS if note_line.startswith(prefix)), _PREP_NOTE_DEFAULT_COLOR)
+        append(_PREP_NOTE_LINE.format(color=color, text=escape(note_line)))
+    if sides and 'Extras:' not in note:
+        items = ', '.join(_side_names(sides)) if isinstance(sides, list) else str(sides)
+        append(_PREP_NOTE_SECTION.format(color='#3498db', label=labels['extras'], items=escape(items)))
+    if combo_items and 'Combo:' not in note:
+        items = ', '.join(_combo_names(combo_items)) if isinstance(combo_items, list) else str(combo_items)
+        append(_PREP_NOTE_SECTION.format(color='#9b59b6', label=labels['combo'], items=escape(items)))
+    if not note and not sides and not combo_items:
+        append(_PREP_NO_NOTES.format(label=labels['no_notes']))
+    append('</td></tr>')
+
+
+def render_preparation(data, labels=DEFAULT_LABELS, now=None):
+    """
+    Renderiza la descripción de un ticket de preparación
+
+    :param data: diccionario ``order_data`` enviado por el POS
+    :param labels: etiquetas traducidas, ver :func:`get_labels`
+    :param now: fecha de creación a mostrar, por defecto la actual
+    :return: String con la descripción HTML
+    """
+    parts = [_PREP_OPEN]
+    append = parts.append
+
+    if data.get('customer'):
+        append(_PREP_CUSTOMER.format(
+            label=labels['customer'],
+            name=escape(data['customer'].get('name') or labels['no_name']),
+        ))
+
+    info = []
+    if data.get('table'):
+        info.append(f"<strong>{labels['table']}:</strong> {escape(data['table'])}")
+    if data.get('server'):
+        info.append(f"<strong>{labels['waiter']}:</strong> {escape(data['server'])}")
+    if info:
+        append(_PREP_INFO.format(info=' | '.join(info)))
+
+    note = data.get('note')
+    if note and note.strip():
+        append(_PREP_NOTE.format(label=labels['general_note'], note=_nl2br(note)))
+
+    append(_PREP_TABLE_OPEN.format(**labels))
+    for line in data.get('order_lines') or []:
+        _render_preparation_line(line, labels, append)
+    append(_PREP_TABLE_CLOSE)
+
+    if data.get('is_change_order'):
+        order_type = labels['type_change']
+    elif data.get('is_added_order'):
+        order_type = labels['type_added']
+    else:
+        order_type = labels['type_new']
+    append(_PREP_FOOTER.format(
+        created_label=labels['order_created'],
+        created=(now or datetime.now()).strftime("%d/%m/%Y %H:%M:%S"),
+        type_label=labels['type'],
+        type=order_type,
+    ))
+
+    append('</div>')
+    return ''.join(parts)
+
+
+def render_preparation_changes(data, labels=DEFAULT_LABELS, now=None):
+    """
+    Renderiza la sección que se añade a una tarea existente con los cambios de
+    un ticket: líneas nuevas, canceladas y con solo cambios de nota.
+
+    :param data: diccionario ``order_data`` enviado por el POS
+    :param labels: etiquetas traducidas, ver :func:`get_labels`
+    :param now: fecha del cambio a mostrar, por defecto la actual
+    :return: String con la sección HTML
+    """
+    parts = [_PREP_CHANGES_OPEN.format(
+        label=labels['changes'],
+        time=(now or datetime.now()).strftime("%d/%m/%Y %H:%M:%S"),
+    )]
+    append = parts.append
+
+    note = data.get('note')
+    if note and note.strip():
+        append(_PREP_NOTE.format(label=labels['general_note'], note=_nl2br(note)))
+
+    append(_PREP_TABLE_OPEN.format(**labels))
+    for line in data.get('order_lines') or []:
+        if line.get('change_type') in _PREP_ROW_STYLES:
+            _render_preparation_line(line, labels, append)
+    append(_PREP_TABLE_CLOSE)
+
+    append('</div>')
+    return ''.join(parts)
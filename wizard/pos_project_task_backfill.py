@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+from odoo import _, api, fields, models
+from odoo.exceptions import UserError
+
+
+class PosProjectTaskBackfill(models.TransientModel):
+    _name = 'pos.project.task.backfill'
+    _description = 'Generar tareas de proyecto de órdenes anteriores'
+
+    config_ids = fields.Many2many(
+        'pos.config', string='Puntos de Venta',
+        domain=[('enable_project_integration', '=', True)],
+        help="Vacío para todos los TPV con la integración activa",
+    )
+    session_ids = fields.Many2many('pos.session', string='Sesiones')
+    date_from = fields.Datetime(string='Desde')
+    date_to = fields.Datetime(string='Hasta')
+
+    @api.model
+    def default_get(self, fields_list):
+        res = super().default_get(fields_list)
+        if self.env.context.get('active_model') == 'pos.session' and 'session_ids' in fields_list:
+            res['session_ids'] = [fields.Command.set(self.env.context.get('active_ids', []))]
+        return res
+
+    def action_enqueue(self):
+        """
+        Encola las órdenes sin tarea en la cola de tareas, que las procesa por
+        lotes en segundo plano; la petición no espera a que se creen.
+        """
+        self.ensure_one()
+        if self.date_from and self.date_to and self.date_from > self.date_to:
+            raise UserError(_("La fecha inicial debe ser anterior a la final."))
+        domain = self.env['pos.order']._get_project_backfill_domain(
+            self.config_ids.ids, self.session_ids.ids, self.date_from, self.date_to,
+        )
+        count = self.env['pos.project.task.job'].sudo()._enqueue_domain(domain, backfill=True)
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'type': 'success' if count else 'warning',
+                'message': _("%s órdenes encoladas para crear sus tareas.", count) if count
+                else _("No hay órdenes sin tarea en la selección."),
+                'next': {'type': 'ir.actions.act_window_close'},
+            },
+        }